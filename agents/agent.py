@@ -1,27 +1,236 @@
 from google.adk.apps import App
 from google.adk.agents import Agent
-from agents.history_agent import get_character_images
+from agents.history_agent import get_character_images, get_character_images_async
 from agents.story_agent import create_story
 from agents.script_agent import create_script
-from agents.image_agent import create_images
-from agents.video_agent import create_video
+import asyncio
+import dataclasses
+import threading
+from collections.abc import Sequence
+from google import genai
+from concurrent.futures import ThreadPoolExecutor, wait
+from agents.image_agent import IMAGE_CLIENT_KEY, MAX_IMAGE_WORKERS, image_client, image_client_async, scene_image_tasks, submit_scene_images
+from agents.video_agent import MAX_CONCURRENT_OPERATIONS, OUTPUT_MODES, VIDEO_CLIENT_KEY, render_progressive, render_progressive_async, render_scenes, render_scenes_async, stitch_clips, stitch_clips_async, video_client, video_client_async
+from agents.utils.aio import cancel_and_wait
+from agents.utils.artifacts import ArtifactStore
+from agents.utils.clients import clients
+from agents.utils.manifest import RunManifest, digest_file
+from agents.utils.ratelimit import rate_limiter
+from agents.utils.stitching import Rendition
+from agents.utils.telemetry import FAMILY, RUN_ID, stage_span
+from agents.utils.workspace import Workspace, collect_garbage
 
-def generate_family_story_video(family_name: str) -> str:
-    """Generates a family story video for the given family name."""
-    print(f"Starting video generation for the {family_name} family...")
+# Warm-up probes are model calls like any other and share a rate limit.
+MODELS_LIST_BUCKET = "genai:models.list"
+rate_limiter.configure(MODELS_LIST_BUCKET, rpm=60, burst=2)
+
+def warm_up_clients(probe: bool = True) -> None:
+    """Creates the shared image and video clients before the first run.
+
+    With probe, each client also lists one model, which refreshes its
+    credentials and opens a connection ahead of real traffic.
+    """
+    timings = clients.warm_up([IMAGE_CLIENT_KEY, VIDEO_CLIENT_KEY], rate_limiter.wrap(MODELS_LIST_BUCKET, _list_one_model) if probe else None)
+    for (project, location, _), seconds in timings.items():
+        print(f"Warmed up client for {project}/{location} in {seconds:.2f}s")
+
+def _list_one_model(client: genai.Client) -> None:
+    next(iter(client.models.list(config={"page_size": 1})), None)
+
+def collect_workspaces() -> None:
+    """Removes the workspaces of earlier runs that exceed the age or size quota."""
+    result = collect_garbage()
+    if result["removed"]:
+        print(f"Removed {len(result['removed'])} idle workspaces, freeing {result['freed_bytes'] // (1024 * 1024)} MiB")
+
+class SharedResources:
+    """Clients and concurrency limits shared by the family runs of a process.
+
+    Runs given the same resources draw their image calls from one executor
+    and their Veo operations from one pool of slots, so both limits hold
+    across all of them rather than per family. Creating them also reclaims
+    disk from idle workspaces of earlier runs.
+    """
+
+    def __init__(self, max_image_workers: int = MAX_IMAGE_WORKERS, max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS) -> None:
+        collect_workspaces()
+        self.image_client = image_client()
+        self.video_client = video_client()
+        self.image_executor = ThreadPoolExecutor(max_workers=max(1, max_image_workers), thread_name_prefix="image")
+        self.max_concurrent_operations = max(1, max_concurrent_operations)
+        self.operation_slots = threading.BoundedSemaphore(self.max_concurrent_operations)
+
+    def close(self) -> None:
+        self.image_executor.shutdown(wait=True)
+
+    def __enter__(self) -> "SharedResources":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+def generate_family_story_video(family_name: str, run_id: str | None = None, incremental: bool = True, output_mode: str = "mp4", ladder: Sequence[Rendition] = ()) -> str:
+    """Generates a family story video for the given family name.
+
+    Every stage checkpoints its outputs in a run manifest. Passing the id of
+    an earlier run resumes it, skipping the stages and scenes that already
+    completed. Otherwise a new run is started; when incremental, it builds on
+    the family's latest run and only re-renders the scenes whose inputs
+    changed before re-stitching. With output_mode "hls", scenes are published
+    to an HLS playlist as they finish instead of being stitched at the end.
+    With a ladder, the stitched video is also encoded into each of its
+    renditions, written next to it.
+    """
+    with SharedResources() as resources:
+        return run_family_story_video(family_name, run_id, incremental, output_mode, resources, ladder)
+
+def run_family_story_video(family_name: str, run_id: str | None, incremental: bool, output_mode: str, resources: SharedResources, ladder: Sequence[Rendition] = ()) -> str:
+    """Runs generate_family_story_video with shared clients and limits.
+
+    Each run writes its files into its own workspace, named after the run
+    id, so any number of runs may proceed concurrently.
+    """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {output_mode!r}; expected one of {OUTPUT_MODES}")
+    with stage_span("run", **{FAMILY: family_name}) as span:
+        manifest = _open_manifest(family_name, run_id, incremental)
+        span.set_attribute(RUN_ID, manifest.run_id)
+        base_workspace = _pin_base_workspace(manifest)
+        try:
+            with Workspace.open(manifest.run_id) as workspace:
+                return _run_stages(manifest, output_mode, resources, workspace, ladder)
+        finally:
+            if base_workspace is not None:
+                base_workspace.close()
+
+def _run_stages(manifest: RunManifest, output_mode: str, resources: SharedResources, workspace: Workspace, ladder: Sequence[Rendition]) -> str:
+    family_name = manifest.family_name
 
     # Run agents
-    character_data = get_character_images(family_name)
-    story = create_story({"records": character_data["characters"]})
-    script = create_script(story)
-    images = create_images(script, character_data)
-    video_path = create_video(story, script, images)
+    character_data = manifest.run_stage("get_character_images", [family_name], get_character_images, family_name)
+    story = manifest.run_stage("create_story", [character_data], create_story, {"records": character_data["characters"]})
+    script = manifest.run_stage("create_script", [story], create_script, story)
 
+    # Pipeline the image and video stages per scene: each scene's Veo job
+    # starts as soon as its start image exists, while later scenes' images
+    # are still being generated.
+    print("Creating images and video...")
+    # Scene images travel from the image stage to Veo in memory.
+    artifacts = ArtifactStore(workspace.artifacts_dir)
+    with stage_span("render_scenes"):
+        start_images, pending_images = submit_scene_images(resources.image_client, script, character_data, workspace.images_dir, resources.image_executor, manifest=manifest, artifacts=artifacts)
+        try:
+            if output_mode == "hls":
+                video_path = render_progressive(resources.video_client, script, start_images, workspace.videos_dir, resources.max_concurrent_operations, manifest=manifest, operation_slots=resources.operation_slots, artifacts=artifacts)
+            else:
+                video_clips = render_scenes(resources.video_client, script, start_images, workspace.videos_dir, resources.max_concurrent_operations, manifest=manifest, operation_slots=resources.operation_slots, artifacts=artifacts)
+        except BaseException:
+            # After a failure, drop the images that have not started yet.
+            for future in pending_images:
+                future.cancel()
+            raise
+        finally:
+            # The executor is shared with other runs; the images still
+            # generating must finish before the workspace they write to is
+            # released.
+            wait(pending_images)
+    if output_mode != "hls":
+        clip_digests = [digest_file(clip_path) for clip_path in video_clips]
+        video_path = manifest.run_stage("stitch_clips", _stitch_inputs(clip_digests, ladder), stitch_clips, video_clips, workspace.videos_dir, ladder, output_is_file=True)
+
+    _report(manifest)
+    return video_path
+
+async def generate_family_story_video_async(family_name: str, run_id: str | None = None, incremental: bool = True, output_mode: str = "mp4") -> str:
+    """Generates a family story video for the given family name.
+
+    Behaves like generate_family_story_video, but every stage runs on the
+    caller's event loop: model calls go through the async genai clients,
+    the MCP server is queried with httpx and ffmpeg runs as asyncio
+    subprocesses, while file and manifest I/O is moved to worker threads.
+    """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {output_mode!r}; expected one of {OUTPUT_MODES}")
+    with stage_span("run", **{FAMILY: family_name}) as span:
+        await asyncio.to_thread(collect_workspaces)
+        manifest = await asyncio.to_thread(_open_manifest, family_name, run_id, incremental)
+        span.set_attribute(RUN_ID, manifest.run_id)
+        base_workspace = await asyncio.to_thread(_pin_base_workspace, manifest)
+        workspace = await asyncio.to_thread(Workspace.open, manifest.run_id)
+        try:
+            return await _run_stages_async(manifest, output_mode, workspace)
+        finally:
+            workspace.close()
+            if base_workspace is not None:
+                base_workspace.close()
+
+async def _run_stages_async(manifest: RunManifest, output_mode: str, workspace: Workspace) -> str:
+    family_name = manifest.family_name
+
+    # Run agents
+    character_data = await manifest.run_stage_async("get_character_images", [family_name], get_character_images_async, family_name)
+    story = await asyncio.to_thread(manifest.run_stage, "create_story", [character_data], create_story, {"records": character_data["characters"]})
+    script = await asyncio.to_thread(manifest.run_stage, "create_script", [story], create_script, story)
+
+    print("Creating images and video...")
+    artifacts = ArtifactStore(workspace.artifacts_dir)
+    with stage_span("render_scenes"):
+        start_images, pending_images = await scene_image_tasks(await image_client_async(), script, character_data, workspace.images_dir, MAX_IMAGE_WORKERS, manifest=manifest, artifacts=artifacts)
+        try:
+            if output_mode == "hls":
+                video_path = await render_progressive_async(await video_client_async(), script, start_images, workspace.videos_dir, MAX_CONCURRENT_OPERATIONS, manifest=manifest, artifacts=artifacts)
+            else:
+                video_clips = await render_scenes_async(await video_client_async(), script, start_images, workspace.videos_dir, MAX_CONCURRENT_OPERATIONS, manifest=manifest, artifacts=artifacts)
+            await asyncio.gather(*pending_images)
+        finally:
+            # After a failure, stop the images still generating before the
+            # workspace they write to is released.
+            await cancel_and_wait([*start_images, *pending_images])
+    if output_mode != "hls":
+        clip_digests = await asyncio.to_thread(lambda: [digest_file(clip_path) for clip_path in video_clips])
+        video_path = await manifest.run_stage_async("stitch_clips", clip_digests, stitch_clips_async, video_clips, workspace.videos_dir, output_is_file=True)
+
+    _report(manifest)
     return video_path
 
+def _stitch_inputs(clip_digests: list[str], ladder: Sequence[Rendition]) -> list:
+    # Without a ladder the inputs stay those of runs that predate it.
+    return [*clip_digests, *(dataclasses.asdict(rendition) for rendition in ladder)]
+
+def _open_manifest(family_name: str, run_id: str | None, incremental: bool) -> RunManifest:
+    if run_id:
+        manifest = RunManifest.load(run_id)
+        print(f"Resuming run {run_id} for the {manifest.family_name} family...")
+    else:
+        base = RunManifest.latest(family_name) if incremental else None
+        manifest = RunManifest.create(family_name, base=base)
+        print(f"Starting video generation for the {family_name} family (run {manifest.run_id})...")
+    return manifest
+
+def _pin_base_workspace(manifest: RunManifest) -> Workspace | None:
+    """Opens the workspace of the run manifest builds on, if it still exists.
+
+    Reused scenes are linked from there into the new run's workspace, so it
+    is held open for the run to keep collect_garbage from removing it.
+    """
+    base_run_id = manifest.data.get("base_run_id")
+    if not base_run_id:
+        return None
+    try:
+        return Workspace.open(base_run_id, create=False)
+    except FileNotFoundError:
+        return None
+
+def _report(manifest: RunManifest) -> None:
+    report = manifest.build_report()
+    print(f"Rebuilt {report['scenes_rebuilt']} scene stages and reused {report['scenes_reused']}, saving {report['model_calls_saved']} of {report['model_calls'] + report['model_calls_saved']} model calls")
+    for bucket, state in rate_limiter.snapshot().items():
+        if state["acquired"]:
+            print(f"Rate limit {bucket}: {state['acquired']} calls, waited {state['total_wait_seconds']:.1f}s in total (max {state['max_wait_seconds']:.1f}s)")
+
 root_agent = Agent(
     name="MainAgent",
-    tools=[generate_family_story_video],
+    tools=[generate_family_story_video_async],
 )
 
 app = App(name="adk-demo", root_agent=root_agent)
@@ -0,0 +1,122 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.agent import SharedResources, run_family_story_video
+from agents.image_agent import MAX_IMAGE_WORKERS
+from agents.utils.cache import atomic_write
+from agents.utils.ratelimit import rate_limiter
+from agents.utils.stitching import Rendition
+from agents.video_agent import MAX_CONCURRENT_OPERATIONS
+
+MAX_CONCURRENT_FAMILIES = 4
+
+
+def read_family_names(path: str) -> list[str]:
+    """Reads family names from a text or JSON Lines file.
+
+    Each non-empty line is either a JSON object with a "family_name" key, a
+    JSON string, or a bare family name. Duplicates are dropped, keeping the
+    first occurrence.
+    """
+    names = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                entry = line
+            if isinstance(entry, dict):
+                entry = entry.get("family_name")
+            if not isinstance(entry, str) or not entry:
+                raise ValueError(f"{path}:{line_number}: no family name in {line!r}")
+            if entry not in names:
+                names.append(entry)
+    return names
+
+
+def _run_family(
+    family_name: str, incremental: bool, output_mode: str, resources: SharedResources, ladder: Sequence[Rendition]
+) -> dict:
+    start = time.monotonic()
+    try:
+        video_path = run_family_story_video(family_name, None, incremental, output_mode, resources, ladder)
+    except Exception as e:
+        print(f"Video generation failed for the {family_name} family: {e}")
+        return {
+            "family_name": family_name,
+            "status": "failed",
+            "error": f"{type(e).__name__}: {e}",
+            "seconds": round(time.monotonic() - start, 3),
+        }
+    return {
+        "family_name": family_name,
+        "status": "succeeded" if video_path else "failed",
+        "video_path": video_path,
+        "seconds": round(time.monotonic() - start, 3),
+    }
+
+
+def run_batch(
+    family_names: list[str],
+    summary_path: str,
+    max_families: int = MAX_CONCURRENT_FAMILIES,
+    incremental: bool = True,
+    output_mode: str = "mp4",
+    max_image_workers: int = MAX_IMAGE_WORKERS,
+    max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS,
+    ladder: Sequence[Rendition] = (),
+) -> dict:
+    """Generates videos for many families concurrently.
+
+    Up to max_families runs proceed at once, sharing one set of clients,
+    one image executor of max_image_workers and max_concurrent_operations
+    Veo slots across all of them. Each family's run writes into its own
+    workspace. A failing family does not stop the others. With a ladder,
+    each family's video is also encoded into its renditions.
+
+    Returns:
+        The summary written to summary_path: per-family status, video path
+        or error and latency, batch totals and the model rate-limit waits
+    """
+    start = time.monotonic()
+    with SharedResources(max_image_workers, max_concurrent_operations) as resources:
+        with ThreadPoolExecutor(max_workers=max(1, max_families), thread_name_prefix="family") as executor:
+            futures = [
+                executor.submit(_run_family, family_name, incremental, output_mode, resources, ladder)
+                for family_name in family_names
+            ]
+            results = [future.result() for future in futures]
+
+    succeeded = [result for result in results if result["status"] == "succeeded"]
+    summary = {
+        "families": results,
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "wall_seconds": round(time.monotonic() - start, 3),
+        "max_families": max_families,
+        "max_image_workers": max_image_workers,
+        "max_concurrent_operations": max_concurrent_operations,
+        "rate_limits": rate_limiter.snapshot(),
+    }
+    with atomic_write(summary_path) as f:
+        f.write(json.dumps(summary, indent=2).encode())
+    return summary
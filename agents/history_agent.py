@@ -1,10 +1,28 @@
 from google.adk import Agent
+import httpx
 import requests
+from opentelemetry import trace
+from agents.utils.telemetry import BYTES_IN
+
+MCP_URL = "http://localhost:8000/mcp"
 
 def get_character_images(family_name: str) -> dict:
     """Fetches character image URLs and metadata from the MCP server."""
     print(f"Fetching character images and metadata for {family_name}...")
-    response = requests.get(f"http://localhost:8000/mcp?family_name={family_name}")
+    response = requests.get(MCP_URL, params={"family_name": family_name})
+    trace.get_current_span().set_attribute(BYTES_IN, len(response.content))
+    if response.status_code == 200:
+        return {"characters": response.json()}
+    else:
+        return {"error": f"Failed to fetch character images: {response.status_code}"}
+
+async def get_character_images_async(family_name: str) -> dict:
+    """Fetches character image URLs and metadata from the MCP server without blocking the event loop."""
+    print(f"Fetching character images and metadata for {family_name}...")
+    # The server analyzes every image with Gemini before it answers.
+    async with httpx.AsyncClient(timeout=120.0) as http:
+        response = await http.get(MCP_URL, params={"family_name": family_name})
+    trace.get_current_span().set_attribute(BYTES_IN, len(response.content))
     if response.status_code == 200:
         return {"characters": response.json()}
     else:
@@ -12,5 +30,5 @@ def get_character_images(family_name: str) -> dict:
 
 character_image_agent = Agent(
     name="CharacterImageAgent",
-    tools=[get_character_images],
-)
\ No newline at end of file
+    tools=[get_character_images_async],
+)
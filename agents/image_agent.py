@@ -1,83 +1,433 @@
 from google.adk import Agent
+import asyncio
 import os
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from functools import partial
 from google import genai
 from google.genai.types import GenerateContentConfig, Part
+from opentelemetry import trace
 from urllib.parse import urlparse
+from agents.utils.artifacts import ArtifactStore
+from agents.utils.cache import ContentCache, atomic_write, cache_key, digest
+from agents.utils.clients import get_async_client, get_client
+from agents.utils.hedging import HedgePolicy, hedged, hedged_async
+from agents.utils.manifest import RunManifest, hash_inputs
+from agents.utils.ratelimit import rate_limiter
+from agents.utils.references import prepare_reference
+from agents.utils.retry import circuit_breakers, retry, retry_async
+from agents.utils.telemetry import BYTES_IN, BYTES_OUT, CACHE_HIT, IMAGE, MODEL, QUEUE_WAIT_SECONDS, bind_context, scene_span
+from agents.utils.validation import InvalidImageError, validate_image, validate_image_async
+from agents.utils.workspace import Workspace, link_file
 
-def create_images(script: dict, character_images: dict) -> dict:
-    """Creates start and ending images for each scene using character references."""
-    print("Creating images...")
-    images_dir = "/usr/local/google/home/mlad/adk-demo/images"
+PROJECT_ID = "mlad-argo"
+IMAGE_MODEL = "gemini-2.5-flash-image-preview"
+IMAGE_CLIENT_KEY = (PROJECT_ID, "global", True)
+MAX_IMAGE_WORKERS = 8
+IMAGE_RPM = 60
+IMAGE_BUCKET = f"{IMAGE_MODEL}:generate_content"
+IMAGE_CACHE_DIR = "/usr/local/google/home/mlad/adk-demo/cache/images"
+IMAGE_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+STYLE_SUFFIX = ", in the style of a vintage photograph, with a warm, sepia-toned palette, cinematic, photorealistic, the characters are looking away from the camera, their faces are not clearly visible, detailed environment."
+
+image_cache = ContentCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+# Opt-in: set IMAGE_HEDGING to a JSON object of HedgePolicy arguments ("{}"
+# for the defaults) to duplicate image requests stuck in the latency tail.
+image_hedging = HedgePolicy.from_environment("IMAGE_HEDGING")
+# Leave room for hedged duplicates next to a full set of workers.
+rate_limiter.configure(IMAGE_BUCKET, rpm=IMAGE_RPM, concurrency=MAX_IMAGE_WORKERS + (image_hedging.max_in_flight if image_hedging else 0))
+
+def _image_config() -> GenerateContentConfig:
+    return GenerateContentConfig(
+        response_modalities=["TEXT", "IMAGE"],
+    )
+
+def image_cache_key(character_parts: list, prompt: str, config: GenerateContentConfig) -> str:
+    """Content address of an image request: model, prompt, references and config."""
+    reference_digests = [digest(part.inline_data.data) for part in character_parts]
+    return cache_key(IMAGE_MODEL, prompt, *reference_digests, config.model_dump_json(exclude_none=True))
+
+def generate_image(client: genai.Client, character_parts: list, prompt: str, output_path: str) -> bytes | None:
+    """Generates a single image for the prompt and writes it to output_path.
+
+    Identical requests are served from the on-disk image cache without
+    calling the model. With image_hedging set, a request that is slow
+    compared to recent ones is sent a second time and the first response
+    is used. Responses that are not a decodable image of at least
+    MIN_IMAGE_EDGE pixels are retried with backoff, unless the image
+    model's circuit breaker is open.
+
+    Returns:
+        The image bytes, or None if no valid image was generated, in which
+        case nothing is left at output_path
+    """
+    config = _image_config()
+    key = image_cache_key(character_parts, prompt, config)
+    span = _trace_request(character_parts, prompt)
+    cached = _cached_image(key, output_path)
+    if cached is not None:
+        span.set_attribute(CACHE_HIT, True)
+        return cached
+
+    contents = character_parts + [prompt]
+
+    def attempt():
+        with rate_limiter.limit(IMAGE_BUCKET) as waited:
+            span.set_attribute(QUEUE_WAIT_SECONDS, waited)
+            return client.models.generate_content(
+                model=IMAGE_MODEL,
+                contents=contents,
+                config=config,
+            )
+
+    def valid_image() -> bytes:
+        data = _image_data(hedged(image_hedging, attempt))
+        validate_image(data)
+        return data
+
+    try:
+        data = retry(valid_image, circuit_breakers.get(IMAGE_MODEL))
+        span.set_attribute(BYTES_OUT, len(data))
+        _save_image(key, data, output_path)
+        return data
+    except Exception as e:
+        _discard_image(prompt, output_path, e)
+        return None
+
+async def generate_image_async(client: genai.Client, character_parts: list, prompt: str, output_path: str) -> bytes | None:
+    """Like generate_image, but awaits the model through client.aio."""
+    config = _image_config()
+    key = image_cache_key(character_parts, prompt, config)
+    span = _trace_request(character_parts, prompt)
+    cached = await asyncio.to_thread(_cached_image, key, output_path)
+    if cached is not None:
+        span.set_attribute(CACHE_HIT, True)
+        return cached
+
+    contents = character_parts + [prompt]
+
+    async def attempt():
+        async with rate_limiter.limit_async(IMAGE_BUCKET) as waited:
+            span.set_attribute(QUEUE_WAIT_SECONDS, waited)
+            return await client.aio.models.generate_content(
+                model=IMAGE_MODEL,
+                contents=contents,
+                config=config,
+            )
+
+    async def valid_image() -> bytes:
+        data = _image_data(await hedged_async(image_hedging, attempt))
+        await validate_image_async(data)
+        return data
+
+    try:
+        data = await retry_async(valid_image, circuit_breakers.get(IMAGE_MODEL))
+        span.set_attribute(BYTES_OUT, len(data))
+        await asyncio.to_thread(_save_image, key, data, output_path)
+        return data
+    except Exception as e:
+        await asyncio.to_thread(_discard_image, prompt, output_path, e)
+        return None
+
+def _trace_request(character_parts: list, prompt: str) -> trace.Span:
+    """Describes an image request on the current (scene) span and returns it."""
+    span = trace.get_current_span()
+    span.set_attribute(MODEL, IMAGE_MODEL)
+    span.set_attribute(BYTES_IN, sum(len(part.inline_data.data) for part in character_parts) + len(prompt.encode()))
+    span.set_attribute(CACHE_HIT, False)
+    return span
+
+def _scene_image(client: genai.Client, entry: dict, image: str, character_parts: list, prompt: str, artifacts: ArtifactStore) -> bool:
+    """Runs generate_image within a span for the start or end image of entry.
+
+    The generated bytes are added to artifacts and their handle stored in
+    entry under "start_image" or "end_image", so later stages need not read
+    the file back.
+    """
+    with scene_span("create_images", entry["scene_number"], **{IMAGE: image}) as scene:
+        data = generate_image(client, character_parts, prompt, entry[f"{image}_image_path"])
+        return _add_scene_image(scene, entry, image, data, artifacts)
+
+async def _scene_image_async(client: genai.Client, entry: dict, image: str, character_parts: list, prompt: str, artifacts: ArtifactStore) -> bool:
+    with scene_span("create_images", entry["scene_number"], **{IMAGE: image}) as scene:
+        data = await generate_image_async(client, character_parts, prompt, entry[f"{image}_image_path"])
+        # Adding to the store may spill the image to disk.
+        return await asyncio.to_thread(_add_scene_image, scene, entry, image, data, artifacts)
+
+def _add_scene_image(scene, entry: dict, image: str, data: bytes | None, artifacts: ArtifactStore) -> bool:
+    if data is None:
+        scene.fail("image generation failed")
+        return False
+    entry[f"{image}_image"] = artifacts.put(data, path=entry[f"{image}_image_path"])
+    return True
+
+def _image_data(response) -> bytes:
+    if response.candidates and response.candidates[0].content.parts:
+        for part in response.candidates[0].content.parts:
+            if part.inline_data:
+                return part.inline_data.data
+    raise Exception("No image data in response")
+
+def _cached_image(key: str, output_path: str) -> bytes | None:
+    """Writes the cached image for key to output_path and returns it, or None on a miss.
+
+    Cached entries that are not valid images count as misses.
+    """
+    data = image_cache.get(key)
+    if data is None:
+        return None
+    try:
+        validate_image(data)
+    except InvalidImageError as e:
+        print(f"Ignoring cached image {key}: {e}")
+        return None
+    with atomic_write(output_path) as f:
+        f.write(data)
+    return data
+
+def _save_image(key: str, data: bytes, output_path: str) -> None:
+    with atomic_write(output_path) as f:
+        f.write(data)
+    image_cache.put(key, data)
+
+def _discard_image(prompt: str, output_path: str, error: Exception) -> None:
+    # Remove any image left by an earlier run, so no later stage mistakes
+    # it for this one.
+    print(f"Failed to generate image for prompt '{prompt}': {error}")
+    try:
+        os.remove(output_path)
+    except FileNotFoundError:
+        pass
+
+def _character_parts(base_prompt: str, character_images: dict, artifacts: ArtifactStore) -> list[Part]:
+    """Returns the reference images of the characters mentioned in the prompt.
+
+    Each reference file is read once per store, however many scenes use it,
+    and sent as a compact copy downsized by prepare_reference.
+    """
+    character_parts = []
+    if "characters" in character_images:
+        for character in character_images["characters"]:
+            if character["name"] in base_prompt:
+                image_path = urlparse(character["image_url"]).path
+                reference = prepare_reference(artifacts, artifacts.load(image_path))
+                character_parts.append(artifacts.part(reference))
+    return character_parts
+
+def image_client() -> genai.Client:
+    return get_client(*IMAGE_CLIENT_KEY)
+
+async def image_client_async() -> genai.Client:
+    return await get_async_client(*IMAGE_CLIENT_KEY)
+
+def submit_scene_images(client: genai.Client, script: dict, character_images: dict, images_dir: str, executor: Executor, manifest: RunManifest | None = None, artifacts: ArtifactStore | None = None) -> tuple[list[Future], list[Future]]:
+    """Schedules the start and ending images of every scene on executor.
+
+    Returns one future per scene that resolves to the scene's image entry as
+    soon as its start image has been written, and the executor jobs that
+    write into images_dir, ending images included. The caller must wait for
+    (or cancel) the jobs before the run finishes; a scene is checkpointed by
+    its ending image's job. Start images are queued ahead of ending images, and
+    output paths only depend on the scene number. With a manifest, scenes
+    whose inputs (prompts, reference images, model and config) are unchanged
+    since they were last completed are skipped, and newly completed scenes
+    are checkpointed. Reference and generated images are added to artifacts
+    (a fresh in-memory store if omitted), and each entry carries the handles
+    of its images next to their paths.
+    """
+    artifacts = artifacts if artifacts is not None else ArtifactStore()
+    scene_futures = []
+    image_futures = []
+    end_jobs = []
+    for entry, job in _plan_scene_images(script, character_images, images_dir, manifest, artifacts):
+        scene_future: Future[dict] = Future()
+        if job is None:
+            scene_future.set_result(entry)
+            scene_futures.append(scene_future)
+            continue
+        character_parts, before_prompt, after_prompt, inputs_hash = job
+        start_future = executor.submit(bind_context(_scene_image), client, entry, "start", character_parts, before_prompt, artifacts)
+        start_future.add_done_callback(partial(_resolve_scene, scene_future, entry))
+        scene_futures.append(scene_future)
+        image_futures.append(start_future)
+        end_jobs.append((character_parts, after_prompt, entry, inputs_hash, start_future))
+
+    for character_parts, after_prompt, entry, inputs_hash, start_future in end_jobs:
+        image_futures.append(executor.submit(bind_context(_scene_end_image), client, entry, character_parts, after_prompt, artifacts, start_future, manifest, inputs_hash))
+    return scene_futures, image_futures
+
+async def scene_image_tasks(client: genai.Client, script: dict, character_images: dict, images_dir: str, max_workers: int = MAX_IMAGE_WORKERS, manifest: RunManifest | None = None, artifacts: ArtifactStore | None = None) -> tuple[list[asyncio.Task], list[asyncio.Task]]:
+    """Async counterpart of submit_scene_images.
+
+    Returns one task per scene that resolves to the scene's image entry once
+    its start image has been written, and the tasks still generating ending
+    images, which the caller must await before the run finishes. At most
+    max_workers requests are in flight, and start images are started ahead
+    of ending images.
+    """
+    artifacts = artifacts if artifacts is not None else ArtifactStore()
+    slots = asyncio.Semaphore(max(1, max_workers))
+
+    async def generate(entry: dict, image: str, character_parts: list, prompt: str) -> bool:
+        async with slots:
+            return await _scene_image_async(client, entry, image, character_parts, prompt, artifacts)
+
+    async def ready(entry: dict) -> dict:
+        return entry
+
+    async def start_image(entry: dict, start: asyncio.Task) -> dict:
+        await start
+        return entry
+
+    async def end_image(entry: dict, inputs_hash: str, start: asyncio.Task, end: asyncio.Task) -> None:
+        results = await asyncio.gather(start, end, return_exceptions=True)
+        # Only checkpoint scenes whose images were all generated successfully.
+        if manifest is not None and all(result is True for result in results):
+            await asyncio.to_thread(manifest.record_scene, "create_images", entry["scene_number"], inputs_hash, entry, files=[entry["start_image_path"], entry["end_image_path"]])
+
+    # Planning reads the reference images and the manifest from disk.
+    plan = await asyncio.to_thread(list, _plan_scene_images(script, character_images, images_dir, manifest, artifacts))
+    scene_tasks = []
+    end_jobs = []
+    for entry, job in plan:
+        if job is None:
+            scene_tasks.append(asyncio.create_task(ready(entry)))
+            continue
+        character_parts, before_prompt, after_prompt, inputs_hash = job
+        start = asyncio.create_task(generate(entry, "start", character_parts, before_prompt))
+        scene_tasks.append(asyncio.create_task(start_image(entry, start)))
+        end_jobs.append((character_parts, after_prompt, entry, inputs_hash, start))
+
+    pending = []
+    for character_parts, after_prompt, entry, inputs_hash, start in end_jobs:
+        end = asyncio.create_task(generate(entry, "end", character_parts, after_prompt))
+        pending.append(asyncio.create_task(end_image(entry, inputs_hash, start, end)))
+    return scene_tasks, pending
+
+def _plan_scene_images(script: dict, character_images: dict, images_dir: str, manifest: RunManifest | None, artifacts: ArtifactStore):
+    """Yields (entry, job) per scene; job is None when there is nothing to generate.
+
+    A job is (character_parts, before_prompt, after_prompt, inputs_hash).
+    """
     if not os.path.exists(images_dir):
         os.makedirs(images_dir)
 
-    PROJECT_ID = "mlad-argo"
-    client = genai.Client(vertexai=True, project=PROJECT_ID, location="global")
-
-    image_paths = []
     for scene in script["script"]:
         if scene["scene_number"] == 1:
             # For the first scene, use the base images directly
             start_image_path = urlparse(character_images["characters"][0]["image_url"]).path
             end_image_path = urlparse(character_images["characters"][1]["image_url"]).path
-        else:
-            base_prompt = scene["description"].replace("Narrator: ", "") # Remove narrator prefix for image prompt
-            style_suffix = ", in the style of a vintage photograph, with a warm, sepia-toned palette, cinematic, photorealistic, the characters are looking away from the camera, their faces are not clearly visible, detailed environment."
-            
-            before_prompt = f"Before the action: {base_prompt}{style_suffix}"
-            after_prompt = f"After the action: {base_prompt}{style_suffix}"
-
-            if scene["scene_number"] == 4:
-                after_prompt = f"A wedding picture of John and Jane{style_suffix}"
-
-            character_parts = []
-            if "characters" in character_images:
-                for character in character_images["characters"]:
-                    if character["name"] in base_prompt:
-                        image_path = urlparse(character["image_url"]).path
-                        with open(image_path, "rb") as f:
-                            character_image_data = f.read()
-                        character_parts.append(Part.from_bytes(data=character_image_data, mime_type="image/jpeg"))
-
-            def generate_image(prompt, output_path):
-                contents = character_parts + [prompt]
-                try:
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash-image-preview",
-                        contents=contents,
-                        config=GenerateContentConfig(
-                            response_modalities=["TEXT", "IMAGE"],
-                        ),
-                    )
-                    if response.candidates and response.candidates[0].content.parts:
-                        for part in response.candidates[0].content.parts:
-                            if part.inline_data:
-                                with open(output_path, "wb") as f:
-                                    f.write(part.inline_data.data)
-                                return True
-                    raise Exception("No image data in response")
-                except Exception as e:
-                    print(f"Failed to generate image for prompt '{prompt}': {e}")
-                    with open(output_path, "w") as f:
-                        f.write("Placeholder: Image generation failed.")
-                    return False
-
-            start_image_path = os.path.join(images_dir, f"scene_{scene['scene_number']}_start.png")
-            end_image_path = os.path.join(images_dir, f"scene_{scene['scene_number']}_end.png")
-
-            generate_image(before_prompt, start_image_path)
-            generate_image(after_prompt, end_image_path)
-
-        image_paths.append(
-            {
+            yield {
                 "scene_number": scene["scene_number"],
                 "start_image_path": start_image_path,
-                "end_image_path": end_image_path
-            }
-        )
+                "end_image_path": end_image_path,
+                "start_image": artifacts.load(start_image_path),
+                "end_image": artifacts.load(end_image_path),
+            }, None
+            continue
+
+        base_prompt = scene["description"].replace("Narrator: ", "") # Remove narrator prefix for image prompt
+
+        before_prompt = f"Before the action: {base_prompt}{STYLE_SUFFIX}"
+        after_prompt = f"After the action: {base_prompt}{STYLE_SUFFIX}"
+
+        if scene["scene_number"] == 4:
+            after_prompt = f"A wedding picture of John and Jane{STYLE_SUFFIX}"
+
+        character_parts = _character_parts(base_prompt, character_images, artifacts)
+
+        entry = {
+            "scene_number": scene["scene_number"],
+            "start_image_path": os.path.join(images_dir, f"scene_{scene['scene_number']}_start.png"),
+            "end_image_path": os.path.join(images_dir, f"scene_{scene['scene_number']}_end.png")
+        }
+        config = _image_config()
+        inputs_hash = hash_inputs(image_cache_key(character_parts, before_prompt, config), image_cache_key(character_parts, after_prompt, config))
+        recorded = manifest.scene("create_images", scene["scene_number"], inputs_hash) if manifest is not None else None
+        if manifest is not None and recorded is not None and _adopt_scene_images(manifest, entry, recorded, inputs_hash, artifacts):
+            print(f"Skipping images for scene {scene['scene_number']}: inputs unchanged")
+            manifest.note_scene("create_images", scene["scene_number"], reused=True, model_calls=2)
+            yield entry, None
+            continue
+        if manifest is not None:
+            manifest.note_scene("create_images", scene["scene_number"], reused=False, model_calls=2)
+        yield entry, (character_parts, before_prompt, after_prompt, inputs_hash)
+
+def _adopt_scene_images(manifest: RunManifest, entry: dict, recorded: dict, inputs_hash: str, artifacts: ArtifactStore) -> bool:
+    """Links a scene's recorded images to the paths in entry and checkpoints them there.
+
+    Recorded images usually live in the workspace of the run this one builds
+    on. Linking them into this run's workspace keeps them usable after that
+    workspace is garbage-collected. Returns False if they have vanished.
+    """
+    try:
+        for image in ("start", "end"):
+            path = link_file(recorded[f"{image}_image_path"], entry[f"{image}_image_path"])
+            entry[f"{image}_image"] = artifacts.load(path)
+    except FileNotFoundError:
+        return False
+    manifest.record_scene("create_images", entry["scene_number"], inputs_hash, entry, files=[entry["start_image_path"], entry["end_image_path"]])
+    return True
+
+def _scene_end_image(client: genai.Client, entry: dict, character_parts: list, prompt: str, artifacts: ArtifactStore, start_future: Future, manifest: RunManifest | None, inputs_hash: str) -> bool:
+    generated = _scene_image(client, entry, "end", character_parts, prompt, artifacts)
+    # Start images are queued first, so the start job has already been
+    # picked up by a worker and this cannot deadlock the executor.
+    wait([start_future])
+    # Only checkpoint scenes whose images were all generated successfully.
+    if manifest is not None and generated and not start_future.cancelled() and start_future.exception() is None and start_future.result():
+        manifest.record_scene("create_images", entry["scene_number"], inputs_hash, entry, files=[entry["start_image_path"], entry["end_image_path"]])
+    return generated
+
+def _resolve_scene(scene_future: Future, entry: dict, start_future: Future) -> None:
+    # A failed run cancels the image jobs it no longer needs.
+    if start_future.cancelled():
+        scene_future.cancel()
+    elif start_future.exception() is not None:
+        scene_future.set_exception(start_future.exception())
+    else:
+        scene_future.set_result(entry)
+
+def create_images(script: dict, character_images: dict, max_workers: int = MAX_IMAGE_WORKERS) -> dict:
+    """Creates start and ending images for each scene using character references.
+
+    Scenes after the first are independent of each other, so their images are
+    generated in parallel by up to max_workers threads. Each call writes into
+    a fresh workspace, so concurrent calls never overwrite each other.
+    """
+    print("Creating images...")
+    with Workspace.open() as workspace, ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        scene_futures, _ = submit_scene_images(image_client(), script, character_images, workspace.images_dir, executor)
+    # Leaving the executor block waits for the ending images as well.
+    image_paths = [future.result() for future in scene_futures]
+
+    stats = image_cache.stats()
+    print(f"Image cache: {stats['hits']} hits, {stats['misses']} misses")
+    if image_hedging is not None:
+        hedging = image_hedging.stats()
+        print(f"Image hedging: {hedging['hedges']} duplicate requests for {hedging['calls']} calls, {hedging['hedge_wins']} won")
+
     return {"images": image_paths}
 
+async def create_images_async(script: dict, character_images: dict, max_workers: int = MAX_IMAGE_WORKERS) -> dict:
+    """Like create_images, but generates the images on the event loop."""
+    print("Creating images...")
+    workspace = await asyncio.to_thread(Workspace.open)
+    try:
+        scene_tasks, pending = await scene_image_tasks(await image_client_async(), script, character_images, workspace.images_dir, max_workers)
+        image_paths = await asyncio.gather(*scene_tasks)
+        await asyncio.gather(*pending)
+    finally:
+        workspace.close()
+
+    stats = image_cache.stats()
+    print(f"Image cache: {stats['hits']} hits, {stats['misses']} misses")
+    if image_hedging is not None:
+        hedging = image_hedging.stats()
+        print(f"Image hedging: {hedging['hedges']} duplicate requests for {hedging['calls']} calls, {hedging['hedge_wins']} won")
+
+    return {"images": list(image_paths)}
+
 image_agent = Agent(
     name="ImageAgent",
-    tools=[create_images],
-)
\ No newline at end of file
+    tools=[create_images_async],
+)
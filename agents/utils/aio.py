@@ -0,0 +1,63 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextvars
+import threading
+from collections.abc import Callable, Coroutine, Iterable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+def run_sync(coroutine_factory: Callable[[], Coroutine[Any, Any, T]]) -> T:
+    """Runs a coroutine to completion from synchronous code.
+
+    Uses a fresh event loop, in a helper thread if the calling thread is
+    already running one (e.g. a sync tool invoked from the ADK event loop).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine_factory())
+
+    result: list[T] = []
+    error: list[BaseException] = []
+    # Carry the caller's context (e.g. the current trace span) over.
+    context = contextvars.copy_context()
+
+    def target() -> None:
+        try:
+            result.append(context.run(asyncio.run, coroutine_factory()))
+        except BaseException as e:
+            error.append(e)
+
+    thread = threading.Thread(target=target, name="run-sync")
+    thread.start()
+    thread.join()
+    if error:
+        raise error[0]
+    return result[0]
+
+
+async def cancel_and_wait(tasks: Iterable[asyncio.Future]) -> None:
+    """Cancels tasks that are still running and waits until every task has finished.
+
+    Errors of the tasks are discarded, so a caller can use this in a finally
+    block without masking its own exception.
+    """
+    tasks = list(tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,190 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from google.genai.types import Image, Part
+
+from agents.utils.cache import atomic_write, digest
+
+# Bytes an ArtifactStore keeps in memory before it spills to disk.
+DEFAULT_MAX_MEMORY_BYTES = 256 * 1024 * 1024
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def sniff_mime_type(data: bytes) -> str:
+    """Returns the mime type of data judging by its leading bytes."""
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp":
+        return "video/mp4"
+    return DEFAULT_MIME_TYPE
+
+
+@dataclass
+class _Artifact:
+    mime_type: str
+    size: int
+    data: bytes | None
+    path: str | None
+
+
+class ArtifactStore:
+    """Run-scoped store of the images and other blobs stages hand each other.
+
+    Artifacts are addressed by handles, the hex SHA-256 digest of their
+    bytes, so handles are stable across processes and can be recorded in
+    the run manifest. Bytes are kept in memory up to max_memory_bytes;
+    beyond that an artifact is only remembered by the file it came from,
+    or spilled to spill_dir if it has none, and read back on demand.
+    """
+
+    def __init__(self, spill_dir: str | None = None, max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES) -> None:
+        self.spill_dir = spill_dir
+        self.max_memory_bytes = max_memory_bytes
+        self._artifacts: dict[str, _Artifact] = {}
+        # (path, mtime_ns, size) -> handle, so each file is read once.
+        self._loaded: dict[tuple[str, int, int], str] = {}
+        # (handle, transform name) -> handle of the derived artifact.
+        self._derived: dict[tuple[str, str], str] = {}
+        self._memory_bytes = 0
+        self._disk_reads = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, handle: object) -> bool:
+        with self._lock:
+            return handle in self._artifacts
+
+    def put(self, data: bytes, mime_type: str | None = None, path: str | None = None) -> str:
+        """Adds data and returns its handle.
+
+        Args:
+            data: The artifact's bytes
+            mime_type: Defaults to the type sniffed from data
+            path: A file already holding exactly these bytes, which serves
+                as the artifact's disk copy
+        """
+        handle = digest(data)
+        spill_path = None
+        with self._lock:
+            artifact = self._artifacts.get(handle)
+            if artifact is not None:
+                if artifact.path is None and path is not None:
+                    artifact.path = path
+                return handle
+            keep = self._memory_bytes + len(data) <= self.max_memory_bytes
+            if not keep and path is None:
+                if self.spill_dir is None:
+                    keep = True  # Nowhere to spill to.
+                else:
+                    path = spill_path = os.path.join(self.spill_dir, handle)
+            self._artifacts[handle] = _Artifact(
+                mime_type or sniff_mime_type(data), len(data), data if keep else None, path
+            )
+            if keep:
+                self._memory_bytes += len(data)
+        if spill_path is not None:
+            with atomic_write(spill_path) as f:
+                f.write(data)
+        return handle
+
+    def load(self, path: str, mime_type: str | None = None) -> str:
+        """Returns the handle of the file at path, reading it only the first time.
+
+        A file that changed since it was loaded is read again.
+        """
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            handle = self._loaded.get(key)
+        if handle is not None and handle in self:
+            return handle
+        with open(path, "rb") as f:
+            data = f.read()
+        handle = self.put(data, mime_type, path)
+        with self._lock:
+            self._disk_reads += 1
+            self._loaded[key] = handle
+        return handle
+
+    def derive(self, handle: str, name: str, transform: Callable[[bytes], bytes]) -> str:
+        """Returns the handle of transform applied to an artifact's bytes.
+
+        The result is computed once per store for every (handle, name)
+        pair, so name must identify the transform and its parameters.
+        """
+        key = (handle, name)
+        with self._lock:
+            derived = self._derived.get(key)
+        if derived is not None:
+            return derived
+        derived = self.put(transform(self.get(handle)))
+        with self._lock:
+            self._derived[key] = derived
+        return derived
+
+    def get(self, handle: str) -> bytes:
+        """Returns the bytes of an artifact.
+
+        Raises:
+            KeyError: If handle is not in the store
+        """
+        with self._lock:
+            artifact = self._artifacts[handle]
+            if artifact.data is not None:
+                return artifact.data
+            self._disk_reads += 1
+        with open(artifact.path, "rb") as f:  # type: ignore[arg-type]
+            return f.read()
+
+    def mime_type(self, handle: str) -> str:
+        with self._lock:
+            return self._artifacts[handle].mime_type
+
+    def part(self, handle: str) -> Part:
+        """Returns the artifact as a content part for a model request."""
+        return Part.from_bytes(data=self.get(handle), mime_type=self.mime_type(handle))
+
+    def image(self, handle: str | None, path: str) -> Image:
+        """Returns the artifact as an Image, e.g. a Veo start frame.
+
+        Falls back to loading path if handle is unknown to this store, such
+        as a handle recorded by an earlier run.
+        """
+        if handle is None or handle not in self:
+            handle = self.load(path)
+        return Image(image_bytes=self.get(handle), mime_type=self.mime_type(handle))
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of artifacts, bytes held in memory and disk reads."""
+        with self._lock:
+            return {
+                "artifacts": len(self._artifacts),
+                "memory_bytes": self._memory_bytes,
+                "spilled": sum(1 for a in self._artifacts.values() if a.data is None),
+                "disk_reads": self._disk_reads,
+            }
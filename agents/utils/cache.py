@@ -0,0 +1,184 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import BinaryIO
+
+
+def digest(data: bytes) -> str:
+    """Returns the hex SHA-256 digest of data."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(*parts: str | bytes) -> str:
+    """Builds a content address from an ordered list of key parts.
+
+    Every part is length-prefixed before hashing, so ("ab", "c") and
+    ("a", "bc") produce different keys.
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        data = part.encode() if isinstance(part, str) else part
+        hasher.update(len(data).to_bytes(8, "big"))
+        hasher.update(data)
+    return hasher.hexdigest()
+
+
+@contextmanager
+def atomic_write(path: str) -> Iterator[BinaryIO]:
+    """Writes to a temporary file next to path and renames it into place.
+
+    Readers never observe a partially written file; if the body raises, the
+    temporary file is removed and path is left untouched.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """Yields a temporary path next to path for a tool to write, then renames it into place.
+
+    Like atomic_write, for files written by another program such as ffmpeg;
+    the temporary path keeps path's extension so the output format can
+    still be inferred from it.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class ContentCache:
+    """A persistent, size-bounded, content-addressed store on local disk.
+
+    Entries are files named by their key. Reads refresh the file's mtime, so
+    eviction removes the least recently used entries first once the total
+    size exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        """
+        Args:
+            directory: Root directory of the cache; created on first write
+            max_bytes: Total size the cache is trimmed back to after a write
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str) -> str:
+        """Returns the path the entry for key is (or would be) stored at."""
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the cached bytes for key, or None on a miss."""
+        path = self._lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:  # Evicted by a concurrent writer.
+            return None
+
+    def get_file(self, key: str, destination: str) -> bool:
+        """Copies the entry for key to destination; returns False on a miss."""
+        path = self._lookup(key)
+        if path is None:
+            return False
+        try:
+            with open(path, "rb") as src, atomic_write(destination) as f:
+                shutil.copyfileobj(src, f)
+        except FileNotFoundError:  # Evicted by a concurrent writer.
+            return False
+        return True
+
+    def put(self, key: str, data: bytes) -> None:
+        """Stores data under key and evicts old entries if over quota."""
+        with atomic_write(self.path_for(key)) as f:
+            f.write(data)
+        self.evict()
+
+    def put_file(self, key: str, source: str) -> None:
+        """Copies the file at source into the cache under key."""
+        with atomic_write(self.path_for(key)) as f, open(source, "rb") as src:
+            shutil.copyfileobj(src, f)
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cache fits its quota."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> dict[str, int]:
+        """Returns the hit and miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _lookup(self, key: str) -> str | None:
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
@@ -0,0 +1,146 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+import weakref
+from collections.abc import Callable, Iterable
+
+import google.cloud.storage as storage
+from google import genai
+
+ClientKey = tuple[str | None, str | None, bool]
+
+
+class ClientRegistry:
+    """Hands out one shared genai client per (project, location, vertexai).
+
+    Constructing a client repeats credential discovery and opens a fresh
+    connection pool, so tools and server requests should fetch clients from
+    here instead. Clients are created lazily on first use.
+
+    The sync surface of a client from get may be used from any thread. Its
+    async surface (`client.aio`) is bound to the event loop that first uses
+    it, so coroutines take their client from get_async instead, which keeps
+    a separate client per event loop.
+    """
+
+    def __init__(self, factory: Callable[..., genai.Client] = genai.Client) -> None:
+        self._factory = factory
+        self._clients: dict[ClientKey, genai.Client] = {}
+        self._loop_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[ClientKey, genai.Client]
+        ] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(
+        self, project: str | None = None, location: str | None = None, vertexai: bool = True
+    ) -> genai.Client:
+        key = (project, location, vertexai)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            # Another thread may have created it while we waited for the lock.
+            client = self._clients.get(key)
+            if client is None:
+                client = self._factory(vertexai=vertexai, project=project, location=location)
+                self._clients[key] = client
+        return client
+
+    async def get_async(
+        self, project: str | None = None, location: str | None = None, vertexai: bool = True
+    ) -> genai.Client:
+        """Returns the shared client for the running event loop, for use through `.aio`.
+
+        Clients of a loop are dropped along with the loop.
+        """
+        key = (project, location, vertexai)
+        loop = asyncio.get_running_loop()
+        client = self._loop_clients.get(loop, {}).get(key)
+        if client is not None:
+            return client
+        # Credential discovery blocks, so keep it off the loop. Should two
+        # coroutines race to create the client, the first one stored wins.
+        created = await asyncio.to_thread(
+            self._factory, vertexai=vertexai, project=project, location=location
+        )
+        with self._lock:
+            return self._loop_clients.setdefault(loop, {}).setdefault(key, created)
+
+    def warm_up(
+        self,
+        keys: Iterable[ClientKey],
+        probe: Callable[[genai.Client], object] | None = None,
+    ) -> dict[ClientKey, float]:
+        """Creates the clients for keys ahead of the first request.
+
+        Args:
+            keys: (project, location, vertexai) of every client to create
+            probe: Optional cheap call made with each client, so credentials
+                are refreshed and a connection is open before real traffic
+
+        Returns:
+            Seconds spent warming each client. A failing probe is reported
+            and skipped, since warm-up must never prevent startup.
+        """
+        timings = {}
+        for key in keys:
+            start = time.perf_counter()
+            client = self.get(*key)
+            if probe is not None:
+                try:
+                    probe(client)
+                except Exception as e:
+                    print(f"Warm-up probe failed for client {key}: {e}")
+            timings[key] = time.perf_counter() - start
+        return timings
+
+    def clear(self) -> None:
+        """Closes and forgets every client, e.g. after credentials rotate.
+
+        Clients of event loops are forgotten but not closed, since that has
+        to happen on their own loop.
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._loop_clients.clear()
+        for client in clients:
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
+
+
+clients = ClientRegistry()
+get_client = clients.get
+get_async_client = clients.get_async
+
+
+_storage_clients: dict[str | None, storage.Client] = {}
+_storage_lock = threading.Lock()
+
+
+def get_storage_client(project: str | None = None) -> storage.Client:
+    """Returns the process-wide Cloud Storage client for project.
+
+    Like genai clients, storage clients are costly to construct and safe to
+    share across threads, so every download reuses the same one.
+    """
+    with _storage_lock:
+        client = _storage_clients.get(project)
+        if client is None:
+            client = _storage_clients[project] = storage.Client(project=project)
+        return client
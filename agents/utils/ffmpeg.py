@@ -0,0 +1,188 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+from agents.utils.telemetry import QUEUE_WAIT_SECONDS, RENDER_SECONDS, tracer
+
+T = TypeVar("T", int, float)
+
+FFMPEG = "ffmpeg"
+FFPROBE = "ffprobe"
+DEFAULT_TIMEOUT_SECONDS = 600.0
+MAX_CONCURRENT_ENCODES = os.cpu_count() or 1
+
+# Shared by every event loop and thread in the process, so concurrent
+# stitches for several families never run more encodes than there are cores.
+_encode_slots = threading.BoundedSemaphore(MAX_CONCURRENT_ENCODES)
+
+
+class FFmpegError(Exception):
+    """An ffmpeg or ffprobe job failed or missed its deadline."""
+
+    def __init__(self, argv: list[str], message: str, stderr: str = "") -> None:
+        super().__init__(f"{message}: {' '.join(argv)}\n{stderr[-2000:]}")
+        self.argv = argv
+        self.stderr = stderr
+
+
+@dataclass
+class FFmpegProgress:
+    """One block of ffmpeg `-progress` output."""
+
+    frame: int | None
+    fps: float | None
+    out_time_seconds: float | None
+    speed: str | None
+    done: bool
+    fields: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_fields(cls, fields: dict[str, str]) -> "FFmpegProgress":
+        def number(key: str, cast: Callable[[str], T]) -> T | None:
+            try:
+                return cast(fields[key])
+            except (KeyError, ValueError):
+                return None
+
+        # ffmpeg reports microseconds in both out_time_us and out_time_ms.
+        out_time_us = number("out_time_us", int)
+        if out_time_us is None:
+            out_time_us = number("out_time_ms", int)
+        return cls(
+            frame=number("frame", int),
+            fps=number("fps", float),
+            out_time_seconds=out_time_us / 1_000_000 if out_time_us is not None else None,
+            speed=fields.get("speed", "").strip() or None,
+            done=fields.get("progress") == "end",
+            fields=fields,
+        )
+
+
+async def run_ffmpeg(
+    argv: list[str],
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    on_progress: Callable[[FFmpegProgress], None] | None = None,
+    encode: bool = True,
+) -> str:
+    """Runs an ffmpeg or ffprobe job without blocking the event loop.
+
+    Args:
+        argv: The full command, starting with the executable
+        timeout: Seconds the job may run before it is killed
+        on_progress: Called with every progress block ffmpeg reports; requires
+            argv to be an ffmpeg command
+        encode: Whether the job takes one of the process-wide encode slots;
+            probes and stream copies are cheap enough to skip the limit
+
+    Returns:
+        The job's stdout when no progress callback is given
+
+    Raises:
+        FFmpegError: If the job exits non-zero or times out
+    """
+    if on_progress is not None:
+        argv = [argv[0], "-nostats", "-progress", "pipe:1", *argv[1:]]
+    with tracer.start_as_current_span(
+        os.path.basename(argv[0]), attributes={"ffmpeg.encode": encode}
+    ) as span:
+        queued_at = time.monotonic()
+        if encode:
+            await _acquire_encode_slot()
+        started_at = time.monotonic()
+        span.set_attribute(QUEUE_WAIT_SECONDS, started_at - queued_at)
+        try:
+            return await _run(argv, timeout, on_progress)
+        finally:
+            span.set_attribute(RENDER_SECONDS, time.monotonic() - started_at)
+            if encode:
+                _encode_slots.release()
+
+
+async def _acquire_encode_slot() -> None:
+    # Poll rather than block a worker thread, so a cancelled waiter can
+    # never acquire a slot after it has gone away.
+    delay = 0.01
+    while not _encode_slots.acquire(blocking=False):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+async def _run(
+    argv: list[str],
+    timeout: float,
+    on_progress: Callable[[FFmpegProgress], None] | None,
+) -> str:
+    process = await asyncio.create_subprocess_exec(
+        *argv,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    async def communicate() -> tuple[str, bytes]:
+        stdout, stderr = await asyncio.gather(
+            _read_stdout(process.stdout, on_progress),
+            process.stderr.read(),  # type: ignore[union-attr]
+        )
+        await process.wait()
+        return stdout, stderr
+
+    try:
+        stdout, stderr = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError as e:
+        await _kill(process)
+        raise FFmpegError(argv, f"timed out after {timeout:.0f}s") from e
+    except asyncio.CancelledError:
+        await _kill(process)
+        raise
+
+    stderr_text = stderr.decode(errors="replace")
+    if process.returncode != 0:
+        raise FFmpegError(argv, f"exited with code {process.returncode}", stderr_text)
+    return stdout
+
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        process.kill()
+    await process.wait()
+
+
+async def _read_stdout(
+    stream: asyncio.StreamReader | None,
+    on_progress: Callable[[FFmpegProgress], None] | None,
+) -> str:
+    if stream is None:
+        return ""
+    if on_progress is None:
+        return (await stream.read()).decode(errors="replace")
+
+    fields: dict[str, str] = {}
+    async for raw_line in stream:
+        key, _, value = raw_line.decode(errors="replace").strip().partition("=")
+        if not key:
+            continue
+        fields[key] = value
+        # Every progress block ends with a `progress=continue|end` line.
+        if key == "progress":
+            on_progress(FFmpegProgress.from_fields(fields))
+            fields = {}
+    return ""
@@ -0,0 +1,284 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, TypeVar
+
+from opentelemetry import trace
+
+from agents.utils.telemetry import HEDGED, bind_context
+
+T = TypeVar("T")
+
+DEFAULT_PERCENTILE = 95
+# Extra calls allowed, as a fraction of all calls made through a policy.
+DEFAULT_MAX_EXTRA_FRACTION = 0.05
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_MAX_IN_FLIGHT = 2
+DEFAULT_WINDOW = 200
+# Never hedge sooner than this, however fast recent calls were.
+DEFAULT_MIN_DELAY_SECONDS = 0.5
+MAX_HEDGE_THREADS = 32
+
+# Runs the attempts of sync hedged calls, so the caller can wait on both.
+_hedge_threads = ThreadPoolExecutor(max_workers=MAX_HEDGE_THREADS, thread_name_prefix="hedge")
+
+
+# Allowed values of each HedgePolicy setting: (type, check, description).
+_SETTING_RANGES: dict[str, tuple[type, Callable[[Any], bool], str]] = {
+    "percentile": (float, lambda v: 0 < v < 100, "a number between 0 and 100"),
+    "max_extra_fraction": (float, lambda v: 0 <= v <= 1, "a number between 0 and 1"),
+    "min_samples": (int, lambda v: v >= 1, "a positive integer"),
+    "window": (int, lambda v: v >= 1, "a positive integer"),
+    "min_delay_seconds": (float, lambda v: v >= 0, "a non-negative number"),
+    "max_in_flight": (int, lambda v: v >= 1, "a positive integer"),
+}
+
+
+def _settings_error(settings: dict[str, Any]) -> str | None:
+    for name, setting in settings.items():
+        kind, check, description = _SETTING_RANGES[name]
+        allowed = int if kind is int else int | float
+        if not isinstance(setting, allowed) or isinstance(setting, bool) or not check(setting):
+            return f"{name} must be {description}, got {setting!r}"
+    return None
+
+
+class HedgePolicy:
+    """When to send a duplicate of a slow model call, learned from recent latencies.
+
+    A call still running after the given percentile of the last window
+    successful calls gets one duplicate, and whichever returns first wins.
+    Nothing is hedged until min_samples latencies are known, and duplicates
+    are capped at max_extra_fraction of all calls made through the policy,
+    so a slow endpoint never sees more than that much extra load, and at
+    max_in_flight at a time; a duplicate stays in flight until both it and
+    the call it duplicates have finished, since the loser keeps its rate
+    limit slot until then. Duplicates share the caller's rate limits, so
+    a limit sized exactly for the callers should allow max_in_flight more
+    concurrent calls, or duplicates would just queue behind them.
+    """
+
+    def __init__(
+        self,
+        percentile: float = DEFAULT_PERCENTILE,
+        max_extra_fraction: float = DEFAULT_MAX_EXTRA_FRACTION,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        window: int = DEFAULT_WINDOW,
+        min_delay_seconds: float = DEFAULT_MIN_DELAY_SECONDS,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    ) -> None:
+        self.percentile = percentile
+        self.max_extra_fraction = max_extra_fraction
+        self.min_samples = min_samples
+        self.min_delay_seconds = min_delay_seconds
+        self.max_in_flight = max_in_flight
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._calls = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, variable: str) -> "HedgePolicy | None":
+        """Returns the policy configured by a JSON object in variable, or None if unset.
+
+        The object's keys are the constructor's arguments, e.g.
+        {"percentile": 90, "max_extra_fraction": 0.1}; "{}" enables
+        hedging with the defaults. Unknown keys are reported and ignored,
+        and a value that is not valid JSON or holds an out-of-range
+        setting is reported and leaves hedging off.
+        """
+        value = os.environ.get(variable)
+        if not value:
+            return None
+        try:
+            settings = json.loads(value)
+        except json.JSONDecodeError as e:
+            print(f"Ignoring {variable}, which is not valid JSON: {e}")
+            return None
+        if not isinstance(settings, dict):
+            print(f"Ignoring {variable}: expected an object of hedging settings, got {value!r}")
+            return None
+        unknown = set(settings) - set(_SETTING_RANGES)
+        if unknown:
+            print(f"Ignoring unknown {variable} settings {sorted(unknown)}")
+            settings = {name: setting for name, setting in settings.items() if name not in unknown}
+        error = _settings_error(settings)
+        if error is not None:
+            print(f"Ignoring {variable}, hedging stays off: {error}")
+            return None
+        return cls(**settings)
+
+    def delay(self) -> float | None:
+        """Returns how long a call may run before it is hedged, or None while still learning."""
+        with self._lock:
+            if not self._latencies or len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1))
+        return max(self.min_delay_seconds, ordered[index])
+
+    def start_call(self) -> None:
+        with self._lock:
+            self._calls += 1
+
+    def try_hedge(self) -> bool:
+        """Takes one duplicate call from the budget; returns False if it is spent.
+
+        Every successful call must be followed by end_hedge once both the
+        duplicate and the call it duplicates have finished.
+        """
+        with self._lock:
+            if self._hedges + 1 > self.max_extra_fraction * self._calls or self._in_flight >= self.max_in_flight:
+                return False
+            self._hedges += 1
+            self._in_flight += 1
+            return True
+
+    def end_hedge(self, *_: object) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def record(self, seconds: float, hedge_won: bool = False) -> None:
+        """Records the latency of a successful attempt."""
+        with self._lock:
+            self._latencies.append(seconds)
+            if hedge_won:
+                self._hedge_wins += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the calls made, duplicates sent and won, and the current delay."""
+        delay = self.delay()
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "delay_seconds": round(delay, 3) if delay is not None else None,
+            }
+
+
+async def hedged_async(policy: HedgePolicy | None, attempt: Callable[[], Awaitable[T]]) -> T:
+    """Awaits attempt(), starting a second attempt if the first is slow.
+
+    The first attempt to succeed wins and the other is cancelled. If one
+    attempt fails while the other is still running, the other is awaited;
+    if both fail, the first error is raised. attempt should acquire its own
+    rate limit slot, so a duplicate is limited like any other call. Without
+    a policy, attempt() is simply awaited.
+    """
+    if policy is None:
+        return await attempt()
+    policy.start_call()
+    started = {}
+
+    def launch(hedge: bool) -> asyncio.Task:
+        task = asyncio.ensure_future(attempt())
+        started[task] = (time.monotonic(), hedge)
+        return task
+
+    tasks = {launch(False)}
+    errors: list[BaseException] = []
+    try:
+        delay = policy.delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and policy.try_hedge():
+                trace.get_current_span().set_attribute(HEDGED, True)
+                tasks.add(launch(True))
+                _end_hedge_when_done(policy, tasks)
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    started_at, hedge = started[task]
+                    policy.record(time.monotonic() - started_at, hedge_won=hedge)
+                    return task.result()
+                errors.append(error)
+        raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def hedged(policy: HedgePolicy | None, attempt: Callable[[], T]) -> T:
+    """Sync counterpart of hedged_async.
+
+    Attempts run on a shared thread pool. A blocking call cannot be
+    interrupted, so the losing attempt runs to completion in the background,
+    holding its rate limit slot and thread, and its result is discarded.
+    Until it finishes the duplicate counts against the policy's
+    max_in_flight, which bounds how many such losers can pile up.
+    """
+    if policy is None:
+        return attempt()
+    policy.start_call()
+    started: dict[Future, tuple[float, bool]] = {}
+
+    def launch(hedge: bool) -> Future:
+        future = _hedge_threads.submit(bind_context(attempt))
+        started[future] = (time.monotonic(), hedge)
+        return future
+
+    futures = {launch(False)}
+    errors: list[BaseException] = []
+    try:
+        delay = policy.delay()
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done and policy.try_hedge():
+                trace.get_current_span().set_attribute(HEDGED, True)
+                futures.add(launch(True))
+                _end_hedge_when_done(policy, futures)
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    started_at, hedge = started[future]
+                    policy.record(time.monotonic() - started_at, hedge_won=hedge)
+                    return future.result()
+                errors.append(error)
+        raise errors[0]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _end_hedge_when_done(policy: HedgePolicy, attempts: set[Any]) -> None:
+    """Calls policy.end_hedge once every attempt of a hedged call is done."""
+    remaining = len(attempts)
+    lock = threading.Lock()
+
+    def attempt_done(_: object) -> None:
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        policy.end_hedge()
+
+    for attempt in list(attempts):
+        attempt.add_done_callback(attempt_done)
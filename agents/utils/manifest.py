@@ -0,0 +1,274 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import copy
+import datetime
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from agents.utils.cache import atomic_write, cache_key
+from agents.utils.telemetry import REUSED, stage_span
+
+RUNS_DIR = "/usr/local/google/home/mlad/adk-demo/runs"
+
+
+def hash_inputs(*inputs: Any) -> str:
+    """Hashes JSON-serializable stage inputs into a stable digest."""
+    return cache_key(*(json.dumps(value, sort_keys=True, default=str) for value in inputs))
+
+
+def digest_file(path: str, buffer_size: int = 1024 * 1024) -> str:
+    """Returns the hex SHA-256 digest of a file without loading it whole."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(buffer_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class RunManifest:
+    """Checkpoints the outputs of each pipeline stage and scene of one run.
+
+    The manifest lives at `<runs_dir>/<run_id>/manifest.json` and is rewritten
+    atomically after every recorded stage or scene, so a run that fails
+    halfway can be resumed. A record is only reused when its inputs hash
+    matches and every file it lists still exists unchanged.
+    """
+
+    def __init__(self, path: str, data: dict[str, Any]) -> None:
+        self.path = path
+        self.data = data
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    @property
+    def run_id(self) -> str:
+        return self.data["run_id"]
+
+    @property
+    def family_name(self) -> str:
+        return self.data["family_name"]
+
+    @classmethod
+    def create(
+        cls,
+        family_name: str,
+        runs_dir: str | None = None,
+        base: "RunManifest | None" = None,
+    ) -> "RunManifest":
+        """Starts a new run for family_name.
+
+        Args:
+            family_name: Family the run generates a video for
+            runs_dir: Directory holding one subdirectory per run; defaults
+                to RUNS_DIR
+            base: An earlier run to build incrementally on; its scene records
+                are carried over, so scenes whose inputs are unchanged are
+                reused instead of rebuilt
+        """
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        run_id = f"{family_name.lower()}-{timestamp}-{uuid.uuid4().hex[:6]}"
+        manifest = cls(
+            os.path.join(runs_dir or RUNS_DIR, run_id, "manifest.json"),
+            {
+                "run_id": run_id,
+                "family_name": family_name,
+                "created_at": datetime.datetime.now().isoformat(),
+                "base_run_id": base.run_id if base is not None else None,
+                "stages": {},
+                "scenes": copy.deepcopy(base.data["scenes"]) if base is not None else {},
+                "build": {},
+            },
+        )
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def latest(cls, family_name: str, runs_dir: str | None = None) -> "RunManifest | None":
+        """Returns the most recently created run for family_name, if any."""
+        runs_dir = runs_dir or RUNS_DIR
+        latest = None
+        if not os.path.isdir(runs_dir):
+            return None
+        for run_id in os.listdir(runs_dir):
+            try:
+                manifest = cls.load(run_id, runs_dir)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            if manifest.family_name != family_name:
+                continue
+            if latest is None or manifest.data["created_at"] > latest.data["created_at"]:
+                latest = manifest
+        return latest
+
+    @classmethod
+    def load(cls, run_id: str, runs_dir: str | None = None) -> "RunManifest":
+        """Loads the manifest of an earlier run.
+
+        Raises:
+            FileNotFoundError: If no run with this id exists
+        """
+        path = os.path.join(runs_dir or RUNS_DIR, run_id, "manifest.json")
+        with open(path) as f:
+            return cls(path, json.load(f))
+
+    def save(self) -> None:
+        # Serialize whole saves so a stale snapshot never replaces a newer one.
+        with self._save_lock:
+            with self._lock:
+                payload = json.dumps(self.data, indent=2).encode()
+            with atomic_write(self.path) as f:
+                f.write(payload)
+
+    def stage(self, name: str, inputs_hash: str) -> Any | None:
+        """Returns the recorded outputs of a stage, or None if it must run."""
+        with self._lock:
+            record = self.data["stages"].get(name)
+        return self._reusable(record, inputs_hash)
+
+    def record_stage(
+        self, name: str, inputs_hash: str, outputs: Any, files: list[str] = []
+    ) -> None:
+        with self._lock:
+            self.data["stages"][name] = self._record(inputs_hash, outputs, files)
+        self.save()
+
+    def scene(self, stage: str, scene_number: int, inputs_hash: str) -> Any | None:
+        """Returns the recorded outputs of one scene of a stage, or None."""
+        with self._lock:
+            record = self.data["scenes"].get(stage, {}).get(str(scene_number))
+        return self._reusable(record, inputs_hash)
+
+    def record_scene(
+        self,
+        stage: str,
+        scene_number: int,
+        inputs_hash: str,
+        outputs: Any,
+        files: list[str] = [],
+    ) -> None:
+        with self._lock:
+            scenes = self.data["scenes"].setdefault(stage, {})
+            scenes[str(scene_number)] = self._record(inputs_hash, outputs, files)
+        self.save()
+
+    def note_scene(
+        self, stage: str, scene_number: int, reused: bool, model_calls: int
+    ) -> None:
+        """Records whether a scene was reused or rebuilt, and its model calls."""
+        with self._lock:
+            build = self.data.setdefault("build", {}).setdefault(stage, {})
+            build[str(scene_number)] = {"reused": reused, "model_calls": model_calls}
+        self.save()
+
+    def build_report(self) -> dict[str, int]:
+        """Summarizes how many scenes and model calls the run rebuilt or saved."""
+        report = {
+            "scenes_rebuilt": 0,
+            "scenes_reused": 0,
+            "model_calls": 0,
+            "model_calls_saved": 0,
+        }
+        with self._lock:
+            for scenes in self.data.get("build", {}).values():
+                for note in scenes.values():
+                    if note["reused"]:
+                        report["scenes_reused"] += 1
+                        report["model_calls_saved"] += note["model_calls"]
+                    else:
+                        report["scenes_rebuilt"] += 1
+                        report["model_calls"] += note["model_calls"]
+        return report
+
+    def run_stage(
+        self,
+        name: str,
+        inputs: list[Any],
+        fn: Callable[..., Any],
+        *args: Any,
+        output_is_file: bool = False,
+    ) -> Any:
+        """Runs fn(*args) unless this stage already completed with these inputs.
+
+        Args:
+            name: Stage name used as the manifest key
+            inputs: JSON-serializable values the stage output depends on
+            fn: The stage function
+            args: Arguments passed to fn
+            output_is_file: Whether the output is a path that must still exist
+                for the checkpoint to be reused
+        """
+        with stage_span(name) as span:
+            inputs_hash = hash_inputs(*inputs)
+            outputs = self.stage(name, inputs_hash)
+            span.set_attribute(REUSED, outputs is not None)
+            if outputs is not None:
+                print(f"Skipping {name}: already completed in run {self.run_id}")
+                return outputs
+            outputs = fn(*args)
+            if not (isinstance(outputs, dict) and "error" in outputs):
+                files = [outputs] if output_is_file and outputs else []
+                self.record_stage(name, inputs_hash, outputs, files)
+            return outputs
+
+    async def run_stage_async(
+        self,
+        name: str,
+        inputs: list[Any],
+        fn: Callable[..., Awaitable[Any]],
+        *args: Any,
+        output_is_file: bool = False,
+    ) -> Any:
+        """Like run_stage, for a coroutine function fn.
+
+        Checking and recording the checkpoint hashes files and rewrites the
+        manifest, so both run on a worker thread.
+        """
+        with stage_span(name) as span:
+            inputs_hash = hash_inputs(*inputs)
+            outputs = await asyncio.to_thread(self.stage, name, inputs_hash)
+            span.set_attribute(REUSED, outputs is not None)
+            if outputs is not None:
+                print(f"Skipping {name}: already completed in run {self.run_id}")
+                return outputs
+            outputs = await fn(*args)
+            if not (isinstance(outputs, dict) and "error" in outputs):
+                files = [outputs] if output_is_file and outputs else []
+                await asyncio.to_thread(self.record_stage, name, inputs_hash, outputs, files)
+            return outputs
+
+    @staticmethod
+    def _record(inputs_hash: str, outputs: Any, files: list[str]) -> dict[str, Any]:
+        return {
+            "inputs_hash": inputs_hash,
+            "outputs": outputs,
+            "files": {path: digest_file(path) for path in files},
+            "completed_at": datetime.datetime.now().isoformat(),
+        }
+
+    @staticmethod
+    def _reusable(record: dict[str, Any] | None, inputs_hash: str) -> Any | None:
+        if record is None or record["inputs_hash"] != inputs_hash:
+            return None
+        for path, file_digest in record["files"].items():
+            if not os.path.exists(path) or digest_file(path) != file_digest:
+                return None
+        return record["outputs"]
+
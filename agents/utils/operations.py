@@ -0,0 +1,220 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class PolledOperation:
+    """A finished long-running operation and how long it took."""
+
+    operation: Any
+    queue_seconds: float
+    render_seconds: float
+    polls: int
+
+
+async def poll_operation(
+    get_operation: Callable[[Any], Awaitable[Any]],
+    operation: Any,
+    queued_at: float | None = None,
+    initial_interval: float = 2.0,
+    max_interval: float = 10.0,
+    backoff: float = 1.5,
+    jitter: float = 0.2,
+) -> PolledOperation:
+    """Polls one long-running operation from a coroutine until it is done.
+
+    Follows the same growing, jittered schedule as OperationPoller, but
+    sleeps on the event loop between polls instead of on a thread.
+
+    Args:
+        get_operation: Refreshes an operation, e.g. `client.aio.operations.get`
+        operation: The operation returned by the submitting call
+        queued_at: `time.monotonic()` at which the work became ready to
+            submit; defaults to now, i.e. no queue time
+    """
+    submitted_at = time.monotonic()
+    interval = initial_interval
+    polls = 0
+    while not getattr(operation, "done", False):
+        await asyncio.sleep(interval * (1 + random.uniform(-jitter, jitter)))
+        interval = min(max_interval, interval * backoff)
+        operation = await get_operation(operation)
+        polls += 1
+    return PolledOperation(
+        operation=operation,
+        queue_seconds=submitted_at - (submitted_at if queued_at is None else queued_at),
+        render_seconds=time.monotonic() - submitted_at,
+        polls=polls,
+    )
+
+
+@dataclass
+class _Entry:
+    operation: Any
+    future: Future
+    queued_at: float
+    submitted_at: float
+    interval: float
+    polls: int = 0
+
+
+class OperationPoller:
+    """Polls many in-flight long-running operations from one background thread.
+
+    Each registered operation is polled on its own schedule: a short first
+    interval that grows by `backoff` up to `max_interval`, with random jitter
+    so that operations submitted together do not poll in lockstep. The future
+    returned by `register` resolves as soon as a poll sees the operation done.
+    """
+
+    def __init__(
+        self,
+        get_operation: Callable[[Any], Any],
+        initial_interval: float = 2.0,
+        max_interval: float = 10.0,
+        backoff: float = 1.5,
+        jitter: float = 0.2,
+    ) -> None:
+        """
+        Args:
+            get_operation: Refreshes an operation, e.g. `client.operations.get`
+            initial_interval: Seconds before the first poll of an operation
+            max_interval: Upper bound on the seconds between two polls
+            backoff: Factor the interval grows by after every poll
+            jitter: Fraction of the interval to randomly add or remove
+        """
+        self._get_operation = get_operation
+        self._initial_interval = initial_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._jitter = jitter
+        self._heap: list[tuple[float, int, _Entry]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    def __enter__(self) -> "OperationPoller":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def register(self, operation: Any, queued_at: float | None = None) -> Future:
+        """Starts tracking a submitted operation.
+
+        Args:
+            operation: The operation returned by the submitting call
+            queued_at: `time.monotonic()` at which the work became ready to
+                submit; defaults to now, i.e. no queue time
+
+        Returns:
+            Future resolving to a PolledOperation once the operation is done
+        """
+        now = time.monotonic()
+        entry = _Entry(
+            operation=operation,
+            future=Future(),
+            queued_at=now if queued_at is None else queued_at,
+            submitted_at=now,
+            interval=self._initial_interval,
+        )
+        if getattr(operation, "done", False):
+            self._resolve(entry, now)
+            return entry.future
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("OperationPoller is closed")
+            self._schedule(entry, now)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="operation-poller", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        return entry.future
+
+    def close(self) -> None:
+        """Stops the polling thread; unfinished futures are cancelled."""
+        with self._condition:
+            self._closed = True
+            entries = [entry for _, _, entry in self._heap]
+            self._heap.clear()
+            self._condition.notify()
+        for entry in entries:
+            entry.future.cancel()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _schedule(self, entry: _Entry, now: float) -> None:
+        delay = entry.interval * (1 + random.uniform(-self._jitter, self._jitter))
+        heapq.heappush(self._heap, (now + delay, next(self._counter), entry))
+        entry.interval = min(self._max_interval, entry.interval * self._backoff)
+
+    def _reschedule(self, entry: _Entry, now: float) -> bool:
+        with self._condition:
+            # close() may have been called while the operation was polled.
+            if self._closed:
+                return False
+            self._schedule(entry, now)
+            return True
+
+    def _resolve(self, entry: _Entry, now: float) -> None:
+        entry.future.set_result(
+            PolledOperation(
+                operation=entry.operation,
+                queue_seconds=entry.submitted_at - entry.queued_at,
+                render_seconds=now - entry.submitted_at,
+                polls=entry.polls,
+            )
+        )
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and (
+                    not self._heap or self._heap[0][0] > time.monotonic()
+                ):
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                _, _, entry = heapq.heappop(self._heap)
+
+            if entry.future.cancelled():
+                continue
+            try:
+                entry.operation = self._get_operation(entry.operation)
+            except Exception as e:
+                entry.future.set_exception(e)
+                continue
+            entry.polls += 1
+
+            now = time.monotonic()
+            if entry.operation.done:
+                self._resolve(entry, now)
+            elif not self._reschedule(entry, now):
+                entry.future.cancel()
+                return
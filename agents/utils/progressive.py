@@ -0,0 +1,147 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.utils.aio import run_sync
+from agents.utils.cache import atomic_write
+from agents.utils.ffmpeg import DEFAULT_TIMEOUT_SECONDS, FFMPEG, run_ffmpeg
+from agents.utils.stitching import probe_clip
+
+PLAYLIST_NAME = "playlist.m3u8"
+DEFAULT_SEGMENT_SECONDS = 8.0
+# Clips run slightly past their requested length, e.g. 8.02s for 8s.
+SEGMENT_SLACK_SECONDS = 1.0
+
+
+class HlsPlaylist:
+    """Publishes scene clips to an HLS event playlist as they finish.
+
+    Clips may be added in any order; each one is remuxed (without
+    re-encoding) into an MPEG-TS segment on a background thread, so add
+    returns at once, and the playlist is rewritten atomically whenever the
+    next scene in order is available, so players can start on scene 1 while
+    later scenes are still rendering. Scenes are joined with hard cuts, and
+    a discontinuity is signalled at every scene boundary so clips need not
+    share timestamps or encoder settings. Once closed, the playlist is final
+    and needs no further remux.
+
+    The target duration of an EVENT playlist must not change, so it is fixed
+    on creation from segment_seconds, the requested clip length, plus
+    SEGMENT_SLACK_SECONDS.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+    ) -> None:
+        self.output_dir = output_dir
+        self.timeout = timeout
+        self.target_duration = math.ceil(segment_seconds + SEGMENT_SLACK_SECONDS)
+        self.path = os.path.join(output_dir, PLAYLIST_NAME)
+        self._pending: dict[int, tuple[str, float] | None] = {}
+        self._next = 0
+        self._segments: list[tuple[str, float]] = []
+        self._errors: list[Exception] = []
+        self._closed = False
+        self._lock = threading.Lock()
+        # One thread, so remuxes never compete with each other for disk.
+        self._remuxer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hls-remux")
+        os.makedirs(output_dir, exist_ok=True)
+        self._write()
+
+    def add(self, index: int, clip_path: str | None) -> None:
+        """Hands over the clip of scene index, or None if the scene failed.
+
+        Returns without waiting for the remux. A failed scene is left out
+        rather than holding back the scenes after it.
+        """
+        self._remuxer.submit(self._publish, index, clip_path)
+
+    def close(self) -> str:
+        """Waits for pending remuxes, marks the playlist complete and returns its path.
+
+        Raises:
+            Exception: The first remux error, once the playlist is closed
+                without the scenes that failed
+        """
+        self._remuxer.shutdown(wait=True)
+        with self._lock:
+            self._closed = True
+            self._write()
+            if self._errors:
+                raise self._errors[0]
+        return self.path
+
+    def _publish(self, index: int, clip_path: str | None) -> None:
+        segment = None
+        if clip_path is not None:
+            try:
+                segment = self._segment(index, clip_path)
+            except Exception as e:
+                print(f"Failed to publish scene {index + 1} to {self.path}: {e}")
+                with self._lock:
+                    self._errors.append(e)
+        with self._lock:
+            self._pending[index] = segment
+            while self._next in self._pending:
+                segment = self._pending.pop(self._next)
+                if segment is not None:
+                    if segment[1] > self.target_duration:
+                        print(f"Scene {self._next + 1} lasts {segment[1]:.3f}s, longer than the playlist's target duration of {self.target_duration}s")
+                    self._segments.append(segment)
+                    self._write()
+                self._next += 1
+
+    def _segment(self, index: int, clip_path: str) -> tuple[str, float]:
+        name = f"scene_{index + 1}.ts"
+        segment_path = os.path.join(self.output_dir, name)
+        info = run_sync(lambda: probe_clip(clip_path, self.timeout))
+        run_sync(
+            lambda: run_ffmpeg(
+                [
+                    FFMPEG, "-v", "error", "-y",
+                    "-i", clip_path,
+                    "-c", "copy",
+                    "-f", "mpegts", segment_path,
+                ],
+                self.timeout,
+                encode=False,
+            )
+        )
+        return name, info.duration
+
+    def _write(self) -> None:
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for i, (name, duration) in enumerate(self._segments):
+            if i > 0:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines += [f"#EXTINF:{duration:.3f},", name]
+        if self._closed:
+            lines.append("#EXT-X-ENDLIST")
+        with atomic_write(self.path) as f:
+            f.write(("\n".join(lines) + "\n").encode())
+        # Playlists are served to players, unlike the private temp file.
+        os.chmod(self.path, 0o644)
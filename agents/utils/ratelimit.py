@@ -0,0 +1,305 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, TypeVar
+
+from opentelemetry import metrics
+
+T = TypeVar("T")
+
+DEFAULT_RPM = 60.0
+# Longest single sleep of an async waiter, so released concurrency slots are
+# noticed promptly without a cross-loop wakeup.
+MAX_ASYNC_POLL_SECONDS = 0.25
+
+
+class TokenBucket:
+    """Limits one model endpoint to a request rate and a number of calls in flight.
+
+    Tokens refill continuously at rpm / 60 per second up to burst. A call
+    needs a token and, if concurrency is set, a free slot; the slot is held
+    until the call returns. Calls in flight are counted even without a
+    concurrency limit, so one can be set or lifted while calls are running.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: float,
+        concurrency: int | None = None,
+        burst: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.rpm = rpm
+        self.concurrency = concurrency
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._in_use = 0
+        self._waiting: dict[int, float] = {}
+        self._ticket = 0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._condition = threading.Condition()
+
+    def reconfigure(self, rpm: float, concurrency: int | None, burst: float) -> None:
+        with self._condition:
+            self._refill()
+            self.rpm = rpm
+            self.concurrency = concurrency
+            self.burst = max(1.0, burst)
+            self._tokens = min(self._tokens, self.burst)
+            self._condition.notify_all()
+
+    def acquire(self) -> float:
+        """Blocks until a call may start; returns the seconds spent waiting."""
+        with self._condition:
+            ticket, started = self._enqueue()
+            try:
+                while (delay := self._try_take()) > 0:
+                    self._condition.wait(delay)
+            finally:
+                del self._waiting[ticket]
+            return self._record_wait(started)
+
+    async def acquire_async(self) -> float:
+        """Waits without blocking the event loop; returns the seconds spent waiting."""
+        with self._condition:
+            ticket, started = self._enqueue()
+        try:
+            while True:
+                with self._condition:
+                    delay = self._try_take()
+                    if delay == 0:
+                        return self._record_wait(started)
+                await asyncio.sleep(min(delay, MAX_ASYNC_POLL_SECONDS))
+        finally:
+            with self._condition:
+                del self._waiting[ticket]
+
+    def release(self) -> None:
+        """Frees the concurrency slot of a finished call."""
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify_all()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Returns the bucket's limits, current queue and cumulative waits."""
+        now = time.monotonic()
+        with self._condition:
+            self._refill()
+            return {
+                "rpm": self.rpm,
+                "concurrency": self.concurrency,
+                "tokens": round(self._tokens, 3),
+                "in_use": self._in_use,
+                "waiting": len(self._waiting),
+                "current_wait_seconds": round(
+                    max((now - t for t in self._waiting.values()), default=0.0), 3
+                ),
+                "acquired": self._acquired,
+                "total_wait_seconds": round(self._total_wait, 3),
+                "max_wait_seconds": round(self._max_wait, 3),
+            }
+
+    def _enqueue(self) -> tuple[int, float]:
+        self._ticket += 1
+        started = time.monotonic()
+        self._waiting[self._ticket] = started
+        return self._ticket, started
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rpm / 60)
+        self._refilled_at = now
+
+    def _try_take(self) -> float:
+        """Takes a token and a slot if both are free, else returns how long to wait."""
+        self._refill()
+        if self.concurrency is not None and self._in_use >= self.concurrency:
+            # Woken by release(); the timeout only bounds a missed wakeup.
+            return MAX_ASYNC_POLL_SECONDS
+        if self._tokens < 1:
+            return (1 - self._tokens) * 60 / self.rpm
+        self._tokens -= 1
+        self._in_use += 1
+        return 0.0
+
+    def _record_wait(self, started: float) -> float:
+        waited = time.monotonic() - started
+        self._acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        return waited
+
+
+def parse_overrides(value: str) -> dict[str, dict[str, Any]]:
+    """Parses MODEL_RATE_LIMITS, skipping and reporting the buckets it cannot use."""
+    try:
+        overrides = json.loads(value)
+    except json.JSONDecodeError as e:
+        print(f"Ignoring MODEL_RATE_LIMITS, which is not valid JSON: {e}")
+        return {}
+    if not isinstance(overrides, dict):
+        print(f"Ignoring MODEL_RATE_LIMITS: expected an object mapping bucket keys to limits, got {value!r}")
+        return {}
+    valid = {}
+    for key, limits in overrides.items():
+        error = _override_error(limits)
+        if error is None:
+            valid[key] = limits
+        else:
+            print(f"Ignoring MODEL_RATE_LIMITS for bucket {key!r}: {error}")
+    return valid
+
+
+def _override_error(limits: Any) -> str | None:
+    if not isinstance(limits, dict):
+        return f"expected an object, got {limits!r}"
+    unknown = set(limits) - {"rpm", "concurrency", "burst"}
+    if unknown:
+        return f"unknown settings {sorted(unknown)}"
+    for name in ("rpm", "burst"):
+        if name in limits and (not isinstance(limits[name], int | float) or isinstance(limits[name], bool) or limits[name] <= 0):
+            return f"{name} must be a positive number, got {limits[name]!r}"
+    concurrency = limits.get("concurrency")
+    if concurrency is not None and (not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1):
+        return f"concurrency must be a positive integer or null, got {concurrency!r}"
+    return None
+
+
+class RateLimiter:
+    """Process-wide registry of token buckets, one per model endpoint.
+
+    Buckets are keyed by "<model>:<endpoint>" and created on first use with
+    DEFAULT_RPM unless configured. Limits can be overridden without code
+    changes through the MODEL_RATE_LIMITS environment variable, a JSON
+    object mapping bucket keys to {"rpm": ..., "concurrency": ..., "burst": ...}.
+    """
+
+    def __init__(self, overrides: dict[str, dict[str, Any]] | None = None) -> None:
+        self._overrides = overrides or {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        meter = metrics.get_meter(__name__)
+        meter.create_observable_gauge(
+            "model_rate_limit.current_wait_seconds",
+            callbacks=[self._observe("current_wait_seconds")],
+            unit="s",
+            description="Age of the oldest call waiting on a model rate limit",
+        )
+        meter.create_observable_gauge(
+            "model_rate_limit.waiting",
+            callbacks=[self._observe("waiting")],
+            description="Calls waiting on a model rate limit",
+        )
+
+    @classmethod
+    def from_environment(cls) -> "RateLimiter":
+        """Returns a limiter with the overrides in MODEL_RATE_LIMITS.
+
+        Invalid overrides are reported and ignored, so a typo in the
+        variable never prevents startup.
+        """
+        return cls(parse_overrides(os.environ.get("MODEL_RATE_LIMITS") or "{}"))
+
+    def configure(
+        self, key: str, rpm: float, concurrency: int | None = None, burst: float = 1.0
+    ) -> TokenBucket:
+        """Sets the default limits of a bucket; MODEL_RATE_LIMITS takes precedence."""
+        override = self._overrides.get(key, {})
+        rpm = override.get("rpm", rpm)
+        concurrency = override.get("concurrency", concurrency)
+        burst = override.get("burst", burst)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(key, rpm, concurrency, burst)
+                return bucket
+        bucket.reconfigure(rpm, concurrency, burst)
+        return bucket
+
+    def bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+        return bucket if bucket is not None else self.configure(key, DEFAULT_RPM)
+
+    @contextmanager
+    def limit(self, key: str) -> Iterator[float]:
+        """Holds a call slot of bucket key for the duration of the block.
+
+        Yields the seconds spent waiting for it.
+        """
+        bucket = self.bucket(key)
+        waited = bucket.acquire()
+        try:
+            yield waited
+        finally:
+            bucket.release()
+
+    @asynccontextmanager
+    async def limit_async(self, key: str) -> AsyncIterator[float]:
+        """Like limit, but waits without blocking the event loop."""
+        bucket = self.bucket(key)
+        waited = await bucket.acquire_async()
+        try:
+            yield waited
+        finally:
+            bucket.release()
+
+    def wrap(self, key: str, fn: Callable[..., T]) -> Callable[..., T]:
+        """Returns fn with every call routed through bucket key."""
+
+        def limited(*args: Any, **kwargs: Any) -> T:
+            with self.limit(key):
+                return fn(*args, **kwargs)
+
+        return limited
+
+    def wrap_async(
+        self, key: str, fn: Callable[..., Awaitable[T]]
+    ) -> Callable[..., Awaitable[T]]:
+        """Returns coroutine function fn with every call routed through bucket key."""
+
+        async def limited(*args: Any, **kwargs: Any) -> T:
+            async with self.limit_async(key):
+                return await fn(*args, **kwargs)
+
+        return limited
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Returns the current state and wait times of every bucket."""
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {bucket.name: bucket.snapshot() for bucket in buckets}
+
+    def _observe(self, field: str) -> Callable[[Any], list[metrics.Observation]]:
+        def callback(options: Any) -> list[metrics.Observation]:
+            return [
+                metrics.Observation(state[field], {"bucket": key})
+                for key, state in self.snapshot().items()
+            ]
+
+        return callback
+
+
+rate_limiter = RateLimiter.from_environment()
@@ -0,0 +1,97 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from agents.utils.aio import run_sync
+from agents.utils.artifacts import ArtifactStore
+from agents.utils.cache import ContentCache, cache_key, digest
+from agents.utils.ffmpeg import FFMPEG, FFmpegError, run_ffmpeg
+
+# Gemini bills an image up to 768x768 as a single tile, and the models see
+# no more detail in a larger reference than in one of that size.
+REFERENCE_MAX_EDGE = 768
+# mjpeg quantizer scale, from 2 (best) to 31.
+REFERENCE_QUALITY = 4
+REFERENCE_TIMEOUT_SECONDS = 60.0
+REFERENCE_CACHE_DIR = "/usr/local/google/home/mlad/adk-demo/cache/references"
+REFERENCE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+reference_cache = ContentCache(REFERENCE_CACHE_DIR, REFERENCE_CACHE_MAX_BYTES)
+
+
+def reference_cache_key(data: bytes, max_edge: int) -> str:
+    """Content address of the compact copy of an image: its bytes and encoding settings."""
+    return cache_key("reference", digest(data), str(max_edge), str(REFERENCE_QUALITY))
+
+
+async def downsize_image(
+    data: bytes,
+    max_edge: int = REFERENCE_MAX_EDGE,
+    timeout: float = REFERENCE_TIMEOUT_SECONDS,
+) -> bytes:
+    """Scales an image of any format ffmpeg decodes to fit max_edge and re-encodes it as JPEG.
+
+    Images already within max_edge are only re-encoded, never upscaled.
+
+    Raises:
+        FFmpegError: If the image cannot be decoded
+    """
+    with tempfile.TemporaryDirectory(prefix="reference-") as work_dir:
+        source_path = os.path.join(work_dir, "source")
+        output_path = os.path.join(work_dir, "reference.jpg")
+        with open(source_path, "wb") as f:
+            f.write(data)
+        await run_ffmpeg(
+            [
+                FFMPEG, "-v", "error", "-y",
+                "-i", source_path,
+                "-vf", f"scale=w='min(iw,{max_edge})':h='min(ih,{max_edge})':force_original_aspect_ratio=decrease",
+                "-frames:v", "1",
+                "-pix_fmt", "yuvj420p",
+                "-q:v", str(REFERENCE_QUALITY),
+                output_path,
+            ],
+            timeout,
+        )
+        with open(output_path, "rb") as f:
+            return f.read()
+
+
+def prepare_reference(artifacts: ArtifactStore, handle: str, max_edge: int = REFERENCE_MAX_EDGE) -> str:
+    """Returns the handle of the copy of a reference image to send to a model.
+
+    The copy is downsized to max_edge and re-encoded as JPEG once per
+    store, and cached on disk by the original's content hash so later runs
+    and processes skip the encode. Images that ffmpeg cannot decode, or
+    that would not get any smaller, are sent unchanged.
+    """
+    return artifacts.derive(handle, f"reference:{max_edge}", lambda data: _compact(data, max_edge))
+
+
+def _compact(data: bytes, max_edge: int) -> bytes:
+    key = reference_cache_key(data, max_edge)
+    cached = reference_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        compact = run_sync(lambda: downsize_image(data, max_edge))
+    except FFmpegError as e:
+        print(f"Sending reference image unchanged: {e}")
+        return data
+    if len(compact) >= len(data):
+        compact = data
+    reference_cache.put(key, compact)
+    return compact
@@ -0,0 +1,227 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from typing import TypeVar
+
+import httpx
+from google.genai import errors
+from opentelemetry import trace
+
+from agents.utils.telemetry import RETRIES
+
+T = TypeVar("T")
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_INITIAL_DELAY_SECONDS = 2.0
+DEFAULT_MAX_DELAY_SECONDS = 30.0
+# Consecutive failures after which a breaker opens, and how long it stays open.
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_SECONDS = 60.0
+
+
+class CircuitOpenError(Exception):
+    """A call was refused because its model's circuit breaker is open."""
+
+
+def is_outage(error: BaseException) -> bool:
+    """Whether error suggests the model is unavailable, not that one request was bad.
+
+    Connection failures, timeouts and 5xx responses count; rejected
+    requests (4xx, including rate limiting) and unusable responses do not.
+    """
+    return isinstance(error, (errors.ServerError, httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class CircuitBreaker:
+    """Stops calls to a model that keeps failing.
+
+    After failure_threshold consecutive failures the breaker opens and
+    refuses calls for reset_seconds. Then a single trial call is let
+    through: its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_seconds: float = DEFAULT_RESET_SECONDS) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return "open"
+            return "half_open"
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError unless a call may be made now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            failures = self._failures
+        raise CircuitOpenError(f"{self.name} failed {failures} times in a row; not calling it for now")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def record_abandoned(self) -> None:
+        """Records a call that ended without an outcome about the model's health.
+
+        For example one that was cancelled, or failed for reasons of its own.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class CircuitBreakers:
+    """Process-wide registry of circuit breakers, one per model.
+
+    A breaker is shared by every run in the process, so once it opens all
+    of them stop calling its model for reset_seconds. That is why retry
+    only counts outages (see is_outage) towards it: requests that fail on
+    their own, like a prompt yielding no usable image, never block others.
+    """
+
+    def __init__(self) -> None:
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(model)
+            return breaker
+
+
+circuit_breakers = CircuitBreakers()
+
+
+def backoff_delays(
+    attempts: int,
+    initial_delay: float = DEFAULT_INITIAL_DELAY_SECONDS,
+    max_delay: float = DEFAULT_MAX_DELAY_SECONDS,
+    jitter: float = 0.2,
+) -> Iterator[float]:
+    """Yields the delays before each of attempts - 1 retries, doubling up to max_delay."""
+    delay = initial_delay
+    for _ in range(attempts - 1):
+        yield min(max_delay, delay) * random.uniform(1 - jitter, 1 + jitter)
+        delay *= 2
+
+
+def retry(
+    call: Callable[[], T],
+    breaker: CircuitBreaker,
+    attempts: int = DEFAULT_ATTEMPTS,
+    initial_delay: float = DEFAULT_INITIAL_DELAY_SECONDS,
+    counts_as_failure: Callable[[BaseException], bool] = is_outage,
+) -> T:
+    """Calls call() until it succeeds, backing off exponentially between attempts.
+
+    Every failed attempt is retried, but only those for which
+    counts_as_failure is true are reported to breaker as failures; no
+    attempt is made while it is open. The number of retries is set on the
+    current span.
+
+    Raises:
+        ValueError: If attempts is less than 1
+        CircuitOpenError: If breaker refuses an attempt
+        Exception: The last attempt's error once attempts are used up
+    """
+    delays = _delays(attempts, initial_delay)
+    for retries, delay in enumerate(delays):
+        trace.get_current_span().set_attribute(RETRIES, retries)
+        breaker.before_call()
+        try:
+            result = call()
+        except Exception as e:
+            _record_error(breaker, e, counts_as_failure)
+            if delay is None:
+                raise
+            print(f"Attempt {retries + 1} of {len(delays)} failed, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            continue
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+        breaker.record_success()
+        return result
+    raise AssertionError("unreachable: the last attempt returns or raises")
+
+
+async def retry_async(
+    call: Callable[[], Awaitable[T]],
+    breaker: CircuitBreaker,
+    attempts: int = DEFAULT_ATTEMPTS,
+    initial_delay: float = DEFAULT_INITIAL_DELAY_SECONDS,
+    counts_as_failure: Callable[[BaseException], bool] = is_outage,
+) -> T:
+    """Like retry, but awaits call() and sleeps without blocking the event loop."""
+    delays = _delays(attempts, initial_delay)
+    for retries, delay in enumerate(delays):
+        trace.get_current_span().set_attribute(RETRIES, retries)
+        breaker.before_call()
+        try:
+            result = await call()
+        except Exception as e:
+            _record_error(breaker, e, counts_as_failure)
+            if delay is None:
+                raise
+            print(f"Attempt {retries + 1} of {len(delays)} failed, retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+        breaker.record_success()
+        return result
+    raise AssertionError("unreachable: the last attempt returns or raises")
+
+
+def _delays(attempts: int, initial_delay: float) -> list[float | None]:
+    if attempts < 1:
+        raise ValueError(f"attempts must be at least 1, got {attempts}")
+    # The last attempt has no delay after it.
+    return [*backoff_delays(attempts, initial_delay), None]
+
+
+def _record_error(breaker: CircuitBreaker, error: Exception, counts_as_failure: Callable[[BaseException], bool]) -> None:
+    if counts_as_failure(error):
+        breaker.record_failure()
+    else:
+        breaker.record_abandoned()
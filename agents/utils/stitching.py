@@ -0,0 +1,584 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import itertools
+import json
+import os
+from collections import Counter
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Any
+
+from agents.utils.ffmpeg import (
+    DEFAULT_TIMEOUT_SECONDS,
+    FFMPEG,
+    FFPROBE,
+    FFmpegProgress,
+    run_ffmpeg,
+)
+
+# Encoders used to re-encode transition windows in the codec of the source.
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+X264_PROFILES = {"baseline", "main", "high"}
+
+
+ProgressCallback = Callable[[FFmpegProgress], None]
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """One output of the rendition ladder."""
+
+    name: str
+    height: int
+    video_bitrate: str
+    audio_bitrate: str = "128k"
+
+
+DEFAULT_LADDER = (
+    Rendition("1080p", 1080, "5000k", "192k"),
+    Rendition("720p", 720, "2800k"),
+    Rendition("480p", 480, "1200k", "96k"),
+)
+
+
+@dataclass
+class ClipInfo:
+    """The stream layout and keyframe positions of one clip."""
+
+    path: str
+    duration: float
+    keyframes: list[float]
+    video: dict[str, Any]
+    audio: dict[str, Any] | None
+
+    def stream_signature(self) -> tuple[Any, ...]:
+        """The stream parameters that must match for clips to be concatenated by copy."""
+        video = self.video
+        video_signature = (
+            video.get("codec_name"),
+            (video.get("profile") or "").lower(),
+            video.get("level"),
+            video.get("width"),
+            video.get("height"),
+            video.get("pix_fmt"),
+            Fraction(video.get("r_frame_rate") or "0/1"),
+        )
+        if self.audio is None:
+            return (*video_signature, None)
+        audio = self.audio
+        return (
+            *video_signature,
+            (
+                audio.get("codec_name"),
+                str(audio.get("sample_rate")),
+                audio.get("channels"),
+                audio.get("channel_layout"),
+            ),
+        )
+
+
+async def probe_clip(path: str, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> ClipInfo:
+    """Reads the duration, stream parameters and keyframe times of a clip."""
+    info_json, packets_json = await asyncio.gather(
+        run_ffmpeg(
+            [
+                FFPROBE, "-v", "error",
+                "-show_entries",
+                "format=duration:stream=index,codec_type,codec_name,profile,level,width,height,pix_fmt,r_frame_rate,sample_rate,channels,channel_layout",
+                "-of", "json",
+                path,
+            ],
+            timeout,
+            encode=False,
+        ),
+        run_ffmpeg(
+            [
+                FFPROBE, "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "packet=pts_time,flags",
+                "-of", "json",
+                path,
+            ],
+            timeout,
+            encode=False,
+        ),
+    )
+    info = json.loads(info_json)
+    packets = json.loads(packets_json)
+    streams = info.get("streams", [])
+    video = next(s for s in streams if s["codec_type"] == "video")
+    audio = next((s for s in streams if s["codec_type"] == "audio"), None)
+    keyframes = sorted(
+        float(p["pts_time"])
+        for p in packets.get("packets", [])
+        if "K" in p.get("flags", "") and p.get("pts_time") not in (None, "N/A")
+    )
+    return ClipInfo(
+        path=path,
+        duration=float(info["format"]["duration"]),
+        keyframes=keyframes,
+        video=video,
+        audio=audio,
+    )
+
+
+def find_outliers(infos: list[ClipInfo]) -> tuple[ClipInfo, list[int]]:
+    """Picks the shared target profile and the clips that do not match it.
+
+    The target is the stream signature shared by most clips (the earliest
+    clip wins ties), so the fewest clips have to be re-encoded.
+
+    Returns:
+        The first clip with the target signature and the indices of the
+        clips whose signature differs from it
+    """
+    signatures = [info.stream_signature() for info in infos]
+    counts = Counter(signatures)
+    target = max(signatures, key=lambda signature: counts[signature])
+    reference = infos[signatures.index(target)]
+    return reference, [i for i, signature in enumerate(signatures) if signature != target]
+
+
+async def normalize_clips(
+    clips: list[str],
+    work_dir: str,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    on_progress: ProgressCallback | None = None,
+) -> list[ClipInfo]:
+    """Probes clips in parallel and re-encodes the outliers to a shared profile.
+
+    Clips that already match the profile shared by most of them are left
+    untouched, so the stream-copy concat stays the common path; only the
+    others are re-encoded, concurrently, into work_dir.
+
+    Returns:
+        The probed clips in order, with outliers replaced by their
+        normalized copies
+    """
+    infos = await asyncio.gather(*(probe_clip(clip, timeout) for clip in clips))
+    reference, outliers = find_outliers(infos)
+    if not outliers:
+        return infos
+
+    os.makedirs(work_dir, exist_ok=True)
+    normalized = [os.path.join(work_dir, f"normalized_{i}.mp4") for i in outliers]
+    await asyncio.gather(
+        *(
+            _normalize_clip(infos[i], reference, path, timeout, on_progress)
+            for i, path in zip(outliers, normalized, strict=True)
+        )
+    )
+    probed = await asyncio.gather(*(probe_clip(path, timeout) for path in normalized))
+    for i, info in zip(outliers, probed, strict=True):
+        infos[i] = info
+    return infos
+
+
+async def concat_clips(
+    clips: list[str],
+    output_path: str,
+    work_dir: str,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    on_progress: ProgressCallback | None = None,
+) -> str:
+    """Joins clips with hard cuts, stream-copying all but mismatched clips."""
+    infos = await normalize_clips(clips, work_dir, timeout, on_progress)
+    await _concat_copy([info.path for info in infos], output_path, work_dir, timeout)
+    return output_path
+
+
+async def crossfade_clips(
+    clips: list[str],
+    output_path: str,
+    work_dir: str,
+    transition_seconds: float = 1.0,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    on_progress: ProgressCallback | None = None,
+) -> str:
+    """Joins clips with crossfades, re-encoding only the transition windows.
+
+    Each boundary is cut at keyframes around the last `transition_seconds` of
+    the outgoing clip and the first `transition_seconds` of the incoming one.
+    Only those windows are decoded and blended with xfade/acrossfade; the body
+    of every clip between the windows is stream-copied. The pieces are joined
+    through MPEG-TS so the re-encoded windows carry their own parameter sets,
+    then remuxed into the output without another encode.
+
+    The windows are encoded with the profile and level of the clips. When a
+    clip's keyframes are too sparse to leave a copyable body, or the encoded
+    windows still differ from the clips in any stream parameter, the whole
+    film is re-encoded with a chained xfade instead.
+
+    Clips whose stream parameters differ from the rest are first normalized
+    to the shared profile (see normalize_clips). Probes, body copies and
+    transition encodes run concurrently; encodes are capped by the
+    process-wide encode limit. Every job is killed if it runs longer than
+    timeout seconds, and on_progress receives the progress reports of the
+    encodes.
+    """
+    infos = await normalize_clips(clips, work_dir, timeout, on_progress)
+    windows = _transition_windows(infos, transition_seconds)
+    if windows is None:
+        return await _crossfade_reencode(
+            infos, output_path, transition_seconds, timeout, on_progress
+        )
+
+    os.makedirs(work_dir, exist_ok=True)
+    segments = []
+    transitions = []
+    jobs = []
+    for i, info in enumerate(infos):
+        start = windows[i - 1][1] if i > 0 else 0.0
+        end = windows[i][0] if i < len(infos) - 1 else info.duration
+        body = os.path.join(work_dir, f"body_{i}.ts")
+        jobs.append(_copy_body(info, start, end, body, timeout))
+        segments.append(body)
+        if i < len(infos) - 1:
+            transition = os.path.join(work_dir, f"transition_{i}.ts")
+            jobs.append(
+                _encode_transition(
+                    info, infos[i + 1], windows[i], transition_seconds, transition,
+                    timeout, on_progress,
+                )
+            )
+            segments.append(transition)
+            transitions.append(transition)
+    await asyncio.gather(*jobs)
+
+    # The windows are spliced between stream-copied bodies, so they must come
+    # out of the encoder with the same stream parameters as the clips.
+    encoded = await asyncio.gather(*(probe_clip(path, timeout) for path in transitions))
+    signature = infos[0].stream_signature()
+    if any(info.stream_signature() != signature for info in encoded):
+        for segment in segments:
+            os.remove(segment)
+        return await _crossfade_reencode(
+            infos, output_path, transition_seconds, timeout, on_progress
+        )
+
+    await _concat_copy(segments, output_path, work_dir, timeout)
+    for segment in segments:
+        os.remove(segment)
+    return output_path
+
+
+async def encode_ladder(
+    input_path: str,
+    output_dir: str,
+    ladder: Sequence[Rendition] = DEFAULT_LADDER,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    on_progress: ProgressCallback | None = None,
+) -> dict[str, str]:
+    """Transcodes a video into every rendition of ladder in one ffmpeg run.
+
+    The source is decoded once and fanned out with the split filter to one
+    scaler and encoder per rendition, instead of decoding it again for each
+    output. Renditions taller than the source are skipped rather than
+    upscaled.
+
+    Returns:
+        The output path of each rendition, by rendition name
+    """
+    info = await probe_clip(input_path, timeout)
+    renditions = [r for r in ladder if r.height <= info.video["height"]]
+    if not renditions:
+        return {}
+
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    outputs = {r.name: os.path.join(output_dir, f"{stem}_{r.name}.mp4") for r in renditions}
+    split = "".join(f"[s{i}]" for i in range(len(renditions)))
+    filters = [f"[0:v]split={len(renditions)}{split}"] + [
+        f"[s{i}]scale=-2:{r.height}[v{i}]" for i, r in enumerate(renditions)
+    ]
+    output_args = []
+    for i, rendition in enumerate(renditions):
+        output_args += _rendition_args(rendition, f"[v{i}]", info, outputs[rendition.name])
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            "-i", input_path,
+            "-filter_complex", ";".join(filters),
+            *output_args,
+        ],
+        timeout,
+        on_progress,
+    )
+    return outputs
+
+
+async def encode_rendition(
+    input_path: str,
+    output_path: str,
+    rendition: Rendition,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    on_progress: ProgressCallback | None = None,
+) -> str:
+    """Transcodes a video into a single rendition."""
+    info = await probe_clip(input_path, timeout)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            "-i", input_path,
+            "-filter_complex", f"[0:v]scale=-2:{rendition.height}[v]",
+            *_rendition_args(rendition, "[v]", info, output_path),
+        ],
+        timeout,
+        on_progress,
+    )
+    return output_path
+
+
+def _rendition_args(
+    rendition: Rendition, video_label: str, source: ClipInfo, output_path: str
+) -> list[str]:
+    args = [
+        "-map", video_label,
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", rendition.video_bitrate,
+        "-maxrate", rendition.video_bitrate,
+        "-bufsize", _double(rendition.video_bitrate),
+        "-pix_fmt", "yuv420p",
+    ]
+    if source.audio:
+        args += ["-map", "0:a:0", "-c:a", "aac", "-b:a", rendition.audio_bitrate]
+    return [*args, "-movflags", "+faststart", output_path]
+
+
+def _double(bitrate: str) -> str:
+    """Doubles an ffmpeg bitrate such as "2800k", for the VBV buffer size."""
+    number = bitrate.rstrip("kKmM")
+    return f"{int(float(number) * 2)}{bitrate[len(number):]}"
+
+
+def _transition_windows(
+    infos: list[ClipInfo], transition_seconds: float
+) -> list[tuple[float, float]] | None:
+    """Finds keyframe-aligned (tail start, head end) cut points per boundary.
+
+    Returns None if some clip would be left without a body to stream-copy.
+    """
+    windows = []
+    for outgoing, incoming in itertools.pairwise(infos):
+        tail_start = max(
+            (t for t in outgoing.keyframes if t <= outgoing.duration - transition_seconds),
+            default=0.0,
+        )
+        head_end = min(
+            (t for t in incoming.keyframes if t >= transition_seconds),
+            default=incoming.duration,
+        )
+        windows.append((tail_start, head_end))
+    for i in range(1, len(infos) - 1):
+        if windows[i][0] <= windows[i - 1][1]:
+            return None
+    if windows and (windows[0][0] <= 0 or windows[-1][1] >= infos[-1].duration):
+        return None
+    return windows
+
+
+async def _copy_body(
+    info: ClipInfo, start: float, end: float, output_path: str, timeout: float
+) -> None:
+    """Stream-copies the part of a clip between two keyframes.
+
+    The segment muxer splits exactly at keyframes, unlike `-ss`/`-to` with
+    stream copy, which keeps reordered frames from past the cut.
+    """
+    cut_times = [t for t in (start, end) if 0 < t < info.duration]
+    prefix = f"{os.path.splitext(output_path)[0]}_part"
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            "-i", info.path,
+            "-map", "0:v:0", *(["-map", "0:a:0"] if info.audio else []),
+            "-c", "copy",
+            "-f", "segment", "-segment_format", "mpegts",
+            *(["-segment_times", ",".join(f"{t:.6f}" for t in cut_times)] if cut_times else []),
+            "-reset_timestamps", "1",
+            f"{prefix}%d.ts",
+        ],
+        timeout,
+        encode=False,
+    )
+    body_index = 1 if start > 0 else 0
+    for index in range(len(cut_times) + 1):
+        part = f"{prefix}{index}.ts"
+        if index == body_index:
+            os.replace(part, output_path)
+        elif os.path.exists(part):
+            os.remove(part)
+
+
+async def _encode_transition(
+    outgoing: ClipInfo,
+    incoming: ClipInfo,
+    window: tuple[float, float],
+    transition_seconds: float,
+    output_path: str,
+    timeout: float,
+    on_progress: ProgressCallback | None,
+) -> None:
+    tail_start, head_end = window
+    offset = outgoing.duration - tail_start - transition_seconds
+    filters = [
+        f"[0:v][1:v]xfade=transition=fade:duration={transition_seconds}:offset={offset:.6f}[v]"
+    ]
+    maps = ["-map", "[v]"]
+    if outgoing.audio and incoming.audio:
+        filters.append(f"[0:a][1:a]acrossfade=d={transition_seconds}[a]")
+        maps += ["-map", "[a]"]
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            "-ss", f"{tail_start:.6f}", "-i", outgoing.path,
+            "-t", f"{head_end:.6f}", "-i", incoming.path,
+            "-filter_complex", ";".join(filters),
+            *maps,
+            *_encoder_args(outgoing),
+            "-f", "mpegts", output_path,
+        ],
+        timeout,
+        on_progress,
+    )
+
+
+async def _crossfade_reencode(
+    infos: list[ClipInfo],
+    output_path: str,
+    transition_seconds: float,
+    timeout: float,
+    on_progress: ProgressCallback | None,
+) -> str:
+    inputs = []
+    for info in infos:
+        inputs += ["-i", info.path]
+    has_audio = all(info.audio for info in infos)
+    filters = []
+    video, audio = "[0:v]", "[0:a]"
+    offset = 0.0
+    for i in range(1, len(infos)):
+        offset += infos[i - 1].duration - transition_seconds
+        filters.append(
+            f"{video}[{i}:v]xfade=transition=fade:duration={transition_seconds}:offset={offset:.6f}[v{i}]"
+        )
+        video = f"[v{i}]"
+        if has_audio:
+            filters.append(f"{audio}[{i}:a]acrossfade=d={transition_seconds}[a{i}]")
+            audio = f"[a{i}]"
+    maps = ["-map", video] + (["-map", audio] if has_audio else [])
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            *inputs,
+            "-filter_complex", ";".join(filters),
+            *maps,
+            *_encoder_args(infos[0]),
+            "-movflags", "+faststart",
+            output_path,
+        ],
+        timeout,
+        on_progress,
+    )
+    return output_path
+
+
+async def _normalize_clip(
+    info: ClipInfo,
+    target: ClipInfo,
+    output_path: str,
+    timeout: float,
+    on_progress: ProgressCallback | None,
+) -> None:
+    """Re-encodes a clip to the resolution, rate and codecs of target."""
+    width, height = target.video["width"], target.video["height"]
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+    )
+    inputs = ["-i", info.path]
+    maps = ["-map", "0:v:0"]
+    if target.audio and info.audio:
+        maps += ["-map", "0:a:0"]
+    elif target.audio:
+        # Concat needs every clip to carry the same streams; pad with silence.
+        layout = target.audio.get("channel_layout") or "stereo"
+        sample_rate = target.audio.get("sample_rate", 48000)
+        inputs += ["-f", "lavfi", "-i", f"anullsrc=channel_layout={layout}:sample_rate={sample_rate}"]
+        maps += ["-map", "1:a:0", "-shortest"]
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            *inputs,
+            "-vf", video_filter,
+            *maps,
+            *_encoder_args(target),
+            "-movflags", "+faststart",
+            output_path,
+        ],
+        timeout,
+        on_progress,
+    )
+
+
+def _encoder_args(info: ClipInfo) -> list[str]:
+    """Encoder settings that match the source clip closely enough to concat."""
+    video = info.video
+    encoder = VIDEO_ENCODERS.get(video["codec_name"], "libx264")
+    args = [
+        "-c:v", encoder,
+        "-preset", "veryfast", "-crf", "18",
+        "-pix_fmt", video.get("pix_fmt", "yuv420p"),
+        "-r", video.get("r_frame_rate", "24/1"),
+    ]
+    profile = (video.get("profile") or "").lower().replace("constrained ", "")
+    if encoder == "libx264" and profile in X264_PROFILES:
+        args += ["-profile:v", profile]
+    # ffprobe reports H.264 levels as ten times the level number.
+    if encoder == "libx264" and (video.get("level") or 0) > 0:
+        args += ["-level:v", f"{video['level'] / 10:.1f}"]
+    if info.audio:
+        args += [
+            "-c:a", "aac",
+            "-ar", str(info.audio.get("sample_rate", 48000)),
+            "-ac", str(info.audio.get("channels", 2)),
+        ]
+    return args
+
+
+async def _concat_copy(
+    inputs: list[str], output_path: str, work_dir: str, timeout: float
+) -> None:
+    os.makedirs(work_dir, exist_ok=True)
+    file_list_path = os.path.join(work_dir, "file_list.txt")
+    with open(file_list_path, "w") as f:
+        for path in inputs:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            "-f", "concat", "-safe", "0", "-i", file_list_path,
+            "-c", "copy",
+            "-movflags", "+faststart",
+            output_path,
+        ],
+        timeout,
+        encode=False,
+    )
+    os.remove(file_list_path)
+
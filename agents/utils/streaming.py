@@ -0,0 +1,118 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import resource
+import sys
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import google.cloud.storage as storage
+from google.api_core.exceptions import NotFound
+
+from agents.utils.cache import atomic_write
+from agents.utils.clients import get_storage_client
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+class MemoryHighWaterMark:
+    """Tracks how many payload bytes are buffered at once across threads."""
+
+    def __init__(self) -> None:
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, size: int) -> Iterator[None]:
+        """Accounts for size bytes being buffered for the duration of the block."""
+        with self._lock:
+            self.current += size
+            self.peak = max(self.peak, self.current)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.current -= size
+
+    def snapshot(self) -> dict[str, int]:
+        """Returns the buffered-bytes high-water mark and the process peak RSS."""
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+        peak_rss_bytes = max_rss if sys.platform == "darwin" else max_rss * 1024
+        with self._lock:
+            return {
+                "buffered_bytes": self.current,
+                "peak_buffered_bytes": self.peak,
+                "peak_rss_bytes": peak_rss_bytes,
+            }
+
+
+def iter_bytes(data: bytes, buffer_size: int = DEFAULT_BUFFER_SIZE) -> Iterator[memoryview]:
+    """Yields zero-copy chunks of an in-memory payload."""
+    view = memoryview(data)
+    for start in range(0, len(view), buffer_size):
+        yield view[start : start + buffer_size]
+
+
+def iter_gcs_object(
+    uri: str,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    storage_client: storage.Client | None = None,
+) -> Iterator[bytes]:
+    """Streams a gs:// object in chunks of at most buffer_size bytes.
+
+    Uses the shared storage client unless storage_client is given.
+    """
+    with _blob(uri, storage_client).open("rb", chunk_size=buffer_size) as reader:
+        while chunk := reader.read(buffer_size):
+            yield chunk
+
+
+def delete_gcs_object(uri: str, storage_client: storage.Client | None = None) -> None:
+    """Deletes a gs:// object, e.g. once it has been streamed to disk.
+
+    An object that is already gone is ignored.
+    """
+    try:
+        _blob(uri, storage_client).delete()
+    except NotFound:
+        pass
+
+
+def _blob(uri: str, storage_client: storage.Client | None) -> storage.Blob:
+    bucket_name, _, blob_name = uri.removeprefix("gs://").partition("/")
+    storage_client = storage_client or get_storage_client()
+    return storage_client.bucket(bucket_name).blob(blob_name)
+
+
+def stream_to_file(
+    chunks: Iterator[bytes | memoryview],
+    path: str,
+    meter: MemoryHighWaterMark | None = None,
+) -> int:
+    """Writes chunks to path atomically and returns the number of bytes written.
+
+    Only one chunk is accounted for (and, for streamed sources, held) at a
+    time, so peak memory per file is bounded by the chunk size.
+    """
+    meter = meter or MemoryHighWaterMark()
+    written = 0
+    with atomic_write(path) as f:
+        for chunk in chunks:
+            with meter.hold(len(chunk)):
+                f.write(chunk)
+            written += len(chunk)
+    return written
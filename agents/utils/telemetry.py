@@ -0,0 +1,140 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from opentelemetry import context, metrics, trace
+
+T = TypeVar("T")
+
+# Span attribute keys shared by every stage and scene span.
+FAMILY = "pipeline.family"
+RUN_ID = "pipeline.run_id"
+STAGE = "pipeline.stage"
+SCENE = "pipeline.scene"
+IMAGE = "pipeline.image"
+MODEL = "gen_ai.request.model"
+BYTES_IN = "pipeline.bytes_in"
+BYTES_OUT = "pipeline.bytes_out"
+RETRIES = "pipeline.retries"
+QUEUE_WAIT_SECONDS = "pipeline.queue_wait_seconds"
+RENDER_SECONDS = "pipeline.render_seconds"
+POLLS = "pipeline.polls"
+CACHE_HIT = "pipeline.cache_hit"
+REUSED = "pipeline.reused"
+HEDGED = "pipeline.hedged"
+
+tracer = trace.get_tracer(__name__)
+_meter = metrics.get_meter(__name__)
+stage_duration = _meter.create_histogram(
+    "pipeline.stage.duration",
+    unit="s",
+    description="Wall-clock time of a pipeline stage, including the whole run",
+)
+scene_duration = _meter.create_histogram(
+    "pipeline.scene.duration",
+    unit="s",
+    description="Wall-clock time of one scene's image or video generation",
+)
+
+
+class SceneSpan:
+    """A span for one scene of a stage, recorded in pipeline.scene.duration.
+
+    Unlike the context managers below it is not made current, so scenes
+    that overlap within one thread (e.g. Veo operations polled together)
+    can each be started and ended independently.
+    """
+
+    def __init__(self, stage: str, scene_number: int, **attributes: Any) -> None:
+        self.stage = stage
+        self.span = tracer.start_span(
+            f"{stage} scene {scene_number}",
+            attributes={STAGE: stage, SCENE: scene_number, **attributes},
+        )
+        self._started = time.perf_counter()
+        self._failed = False
+        self._ended = False
+
+    def set(self, key: str, value: Any) -> None:
+        self.span.set_attribute(key, value)
+
+    def fail(self, message: str) -> None:
+        """Marks the scene failed without an exception, e.g. a failed operation."""
+        self._failed = True
+        self.span.set_status(trace.Status(trace.StatusCode.ERROR, message))
+
+    def end(self, error: BaseException | None = None) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        if error is not None:
+            self.span.record_exception(error)
+            self.fail(str(error))
+        self.span.end()
+        scene_duration.record(
+            time.perf_counter() - self._started,
+            {STAGE: self.stage, "status": "error" if self._failed else "ok"},
+        )
+
+
+@contextmanager
+def stage_span(stage: str, **attributes: Any) -> Iterator[trace.Span]:
+    """Makes a span for stage current and records its latency by stage name."""
+    started = time.perf_counter()
+    status = "ok"
+    with tracer.start_as_current_span(stage, attributes={STAGE: stage, **attributes}) as span:
+        try:
+            yield span
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            stage_duration.record(time.perf_counter() - started, {STAGE: stage, "status": status})
+
+
+@contextmanager
+def scene_span(stage: str, scene_number: int, **attributes: Any) -> Iterator[SceneSpan]:
+    """Makes a SceneSpan current for the duration of the block."""
+    scene = SceneSpan(stage, scene_number, **attributes)
+    try:
+        with trace.use_span(scene.span, end_on_exit=False, record_exception=False, set_status_on_exception=False):
+            yield scene
+    except BaseException as e:
+        scene.end(e)
+        raise
+    scene.end()
+
+
+def bind_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """Returns fn running under the caller's trace context in any thread.
+
+    Executor threads do not inherit the submitting thread's context, so
+    spans they start would otherwise become new root traces.
+    """
+    captured = context.get_current()
+
+    @functools.wraps(fn)
+    def bound(*args: Any, **kwargs: Any) -> T:
+        token = context.attach(captured)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            context.detach(token)
+
+    return bound
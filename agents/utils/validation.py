@@ -0,0 +1,148 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+
+from agents.utils.aio import run_sync
+from agents.utils.artifacts import sniff_mime_type
+from agents.utils.cache import digest
+from agents.utils.ffmpeg import FFMPEG, FFmpegError, run_ffmpeg
+
+# Smallest width and height accepted for a scene image.
+MIN_IMAGE_EDGE = 256
+VALIDATE_TIMEOUT_SECONDS = 60.0
+# Digests of images already decoded successfully, most recent last.
+MAX_VALIDATED = 4096
+
+_validated: OrderedDict[tuple[str, int], tuple[int, int]] = OrderedDict()
+_validated_lock = threading.Lock()
+
+
+class InvalidImageError(ValueError):
+    """Image bytes that are not a decodable image of at least the minimum size."""
+
+
+def image_dimensions(data: bytes) -> tuple[int, int]:
+    """Returns the width and height in the header of a PNG, JPEG, GIF or WebP image.
+
+    Raises:
+        InvalidImageError: If data is not one of these formats or its
+            header is truncated
+    """
+    mime_type = sniff_mime_type(data)
+    try:
+        if mime_type == "image/png" and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])
+        if mime_type == "image/gif":
+            return struct.unpack("<HH", data[6:10])
+        if mime_type == "image/webp":
+            return _webp_dimensions(data)
+        if mime_type == "image/jpeg":
+            return _jpeg_dimensions(data)
+    except struct.error:
+        pass
+    raise InvalidImageError(f"not an image ({mime_type}, {len(data)} bytes, starting {data[:16]!r})")
+
+
+def _webp_dimensions(data: bytes) -> tuple[int, int]:
+    chunk = data[12:16]
+    if chunk == b"VP8X":
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8L":
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    raise struct.error(f"unknown WebP chunk {chunk!r}")
+
+
+def _jpeg_dimensions(data: bytes) -> tuple[int, int]:
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            break
+        marker = data[offset + 1]
+        # Start-of-frame markers, excluding DHT, JPG and DAC.
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        (length,) = struct.unpack(">H", data[offset + 2:offset + 4])
+        offset += 2 + length
+    raise struct.error("no JPEG frame header")
+
+
+async def validate_image_async(data: bytes, min_edge: int = MIN_IMAGE_EDGE, timeout: float = VALIDATE_TIMEOUT_SECONDS) -> tuple[int, int]:
+    """Checks that data is a complete image of at least min_edge on both sides.
+
+    The format and size are read from the header; the image is then fully
+    decoded with ffmpeg, which rejects truncated or corrupt data. Images
+    that passed before are remembered by digest and not decoded again.
+
+    Returns:
+        The image's width and height
+
+    Raises:
+        InvalidImageError: If any check fails
+    """
+    key, dimensions = _check_header(data, min_edge)
+    if dimensions is not None:
+        return dimensions
+
+    width, height = image_dimensions(data)
+    with tempfile.TemporaryDirectory(prefix="validate-") as work_dir:
+        path = os.path.join(work_dir, "image")
+        with open(path, "wb") as f:
+            f.write(data)
+        try:
+            await run_ffmpeg(
+                [FFMPEG, "-v", "error", "-err_detect", "explode", "-xerror", "-i", path, "-f", "null", "-"],
+                timeout,
+                encode=False,
+            )
+        except FFmpegError as e:
+            raise InvalidImageError(f"image does not decode: {e.stderr.strip()[-500:]}") from e
+
+    with _validated_lock:
+        _validated[key] = (width, height)
+        while len(_validated) > MAX_VALIDATED:
+            _validated.popitem(last=False)
+    return width, height
+
+
+def validate_image(data: bytes, min_edge: int = MIN_IMAGE_EDGE, timeout: float = VALIDATE_TIMEOUT_SECONDS) -> tuple[int, int]:
+    """Sync counterpart of validate_image_async."""
+    _, dimensions = _check_header(data, min_edge)
+    if dimensions is not None:
+        return dimensions
+    return run_sync(lambda: validate_image_async(data, min_edge, timeout))
+
+
+def _check_header(data: bytes, min_edge: int) -> tuple[tuple[str, int], tuple[int, int] | None]:
+    """Checks format and size; returns the validation key and the dimensions if already decoded."""
+    width, height = image_dimensions(data)
+    if min(width, height) < min_edge:
+        raise InvalidImageError(f"image is {width}x{height}, smaller than {min_edge}px")
+    key = (digest(data), min_edge)
+    with _validated_lock:
+        if key in _validated:
+            _validated.move_to_end(key)
+            return key, _validated[key]
+    return key, None
@@ -0,0 +1,215 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fcntl
+import os
+import shutil
+import time
+import uuid
+from typing import Any, TextIO
+
+WORKSPACES_DIR = "/usr/local/google/home/mlad/adk-demo/workspaces"
+# Workspaces unused for this long are removed by collect_garbage.
+MAX_WORKSPACE_AGE_SECONDS = 7 * 24 * 60 * 60
+# Beyond this total, the least recently used idle workspaces are removed.
+MAX_WORKSPACES_BYTES = 50 * 1024 * 1024 * 1024
+LOCK_NAME = ".lock"
+
+
+class Workspace:
+    """Image and video directories private to one run.
+
+    Every run writes its scene files into its own workspace, so runs for
+    any number of families (or the same family) can proceed in parallel on
+    one host without overwriting each other. An open workspace holds a
+    shared lock on its lock file, which keeps collect_garbage away from it
+    and is released by the OS if the process dies.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.images_dir = os.path.join(path, "images")
+        self.videos_dir = os.path.join(path, "videos")
+        # Where the run's ArtifactStore spills; created on first spill.
+        self.artifacts_dir = os.path.join(path, "artifacts")
+        self._lock_file: TextIO | None = None
+
+    @classmethod
+    def open(cls, name: str | None = None, root: str | None = None, create: bool = True) -> "Workspace":
+        """Creates (or reopens, e.g. to resume a run) and locks a workspace.
+
+        Args:
+            name: Directory name, usually the run id; a fresh unique name
+                is used if omitted
+            root: Directory holding the workspaces; defaults to WORKSPACES_DIR
+            create: Whether to create the workspace if it does not exist,
+                rather than raise FileNotFoundError
+
+        Raises:
+            FileNotFoundError: If create is False and the workspace is gone
+        """
+        workspace = cls(os.path.join(root or WORKSPACES_DIR, name or uuid.uuid4().hex))
+        lock_path = os.path.join(workspace.path, LOCK_NAME)
+        while True:
+            if create:
+                os.makedirs(workspace.images_dir, exist_ok=True)
+                os.makedirs(workspace.videos_dir, exist_ok=True)
+            elif not os.path.exists(lock_path):
+                raise FileNotFoundError(f"No workspace at {workspace.path}")
+            lock_file = open(lock_path, "a")
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            # collect_garbage may have moved the directory away while we
+            # waited for the lock; start over with a fresh one if so.
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+        workspace._lock_file = lock_file
+        # The lock file's mtime marks when the workspace was last used.
+        os.utime(lock_path)
+        return workspace
+
+    def close(self) -> None:
+        """Releases the lock; the files stay until garbage-collected."""
+        if self._lock_file is not None:
+            os.utime(self._lock_file.name)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def link_file(source: str, destination: str) -> str:
+    """Makes destination a copy of source, hard-linking it when possible.
+
+    Lets a run adopt a file of an earlier run's workspace, so it stays
+    available after that workspace is garbage-collected. Returns destination.
+    """
+    if os.path.abspath(source) == os.path.abspath(destination):
+        return destination
+    temp_path = f"{destination}.{uuid.uuid4().hex[:6]}.tmp"
+    try:
+        os.link(source, temp_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Across file systems, or where hard links are not supported.
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+    return destination
+
+
+def collect_garbage(
+    root: str | None = None,
+    max_age_seconds: float = MAX_WORKSPACE_AGE_SECONDS,
+    max_bytes: int = MAX_WORKSPACES_BYTES,
+) -> dict[str, Any]:
+    """Removes idle workspaces that are too old or exceed the size quota.
+
+    Workspaces last used more than max_age_seconds ago are removed first;
+    then, while the total size is above max_bytes, the least recently used
+    of the remaining ones. Workspaces held open by any process are never
+    removed, but count towards the total.
+
+    Returns:
+        The removed workspace paths, the bytes freed and the bytes kept
+    """
+    root = root or WORKSPACES_DIR
+    now = time.time()
+    idle = []
+    total = 0
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        path = os.path.join(root, name)
+        if not os.path.isdir(path):
+            continue
+        size = _tree_size(path)
+        total += size
+        if not _in_use(path):
+            idle.append((_last_used(path), size, path))
+
+    removed = []
+    freed = 0
+    for last_used, size, path in sorted(idle):
+        if now - last_used <= max_age_seconds and total <= max_bytes:
+            break
+        if not _remove_if_idle(path):
+            continue
+        removed.append(path)
+        freed += size
+        total -= size
+    return {"removed": removed, "freed_bytes": freed, "kept_bytes": total}
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(directory, name)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def _last_used(path: str) -> float:
+    try:
+        return os.stat(os.path.join(path, LOCK_NAME)).st_mtime
+    except FileNotFoundError:
+        return os.stat(path).st_mtime
+
+
+def _in_use(path: str) -> bool:
+    try:
+        fd = os.open(os.path.join(path, LOCK_NAME), os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+def _remove_if_idle(path: str) -> bool:
+    # Rename first, so a run reopening the workspace by name gets a fresh
+    # directory instead of one being deleted underneath it.
+    doomed = f"{path}.deleting-{uuid.uuid4().hex[:6]}"
+    try:
+        fd = os.open(os.path.join(path, LOCK_NAME), os.O_RDONLY)
+    except FileNotFoundError:
+        fd = None
+    try:
+        if fd is not None:
+            # Re-check under the exclusive lock, in case a run just
+            # reopened the workspace.
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        os.rename(path, doomed)
+    except FileNotFoundError:
+        return False
+    finally:
+        if fd is not None:
+            os.close(fd)
+    shutil.rmtree(doomed, ignore_errors=True)
+    return True
@@ -1,99 +1,495 @@
 from google.adk import Agent
+import asyncio
 import os
+import shutil
+import threading
 import time
+from collections.abc import Awaitable, Callable, Sequence
 from google import genai
-from google.genai.types import Image, GenerateVideosConfig
-import subprocess
+from google.genai.types import Image, GenerateVideosConfig, Video
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from agents.utils.aio import cancel_and_wait, run_sync
+from agents.utils.artifacts import ArtifactStore
+from agents.utils.cache import ContentCache, atomic_output, cache_key, digest
+from agents.utils.clients import get_async_client, get_client
+from agents.utils.ffmpeg import FFmpegProgress
+from agents.utils.manifest import RunManifest
+from agents.utils.operations import OperationPoller, PolledOperation, poll_operation
+from agents.utils.progressive import HlsPlaylist
+from agents.utils.ratelimit import rate_limiter
+from agents.utils.stitching import DEFAULT_LADDER, Rendition, concat_clips, crossfade_clips, encode_ladder
+from agents.utils.streaming import MemoryHighWaterMark, delete_gcs_object, iter_bytes, iter_gcs_object, stream_to_file
+from agents.utils.telemetry import BYTES_IN, BYTES_OUT, CACHE_HIT, MODEL, POLLS, QUEUE_WAIT_SECONDS, RENDER_SECONDS, REUSED, SceneSpan, scene_span
+from agents.utils.validation import InvalidImageError, validate_image
+from agents.utils.workspace import Workspace, link_file
 
-def create_video(story: dict, script: dict, images: dict) -> str:
-    """Creates a video from a storyboard, script, and images by generating a video for each scene and stitching them together with fade transitions."""
-    print("Creating video...")
-    videos_dir = "/usr/local/google/home/mlad/adk-demo/videos"
+PROJECT_ID = "mlad-argo"
+VEO_MODEL = "veo-3.1-fast-generate-preview"
+VIDEO_CLIENT_KEY = (PROJECT_ID, "us-central1", True)
+MAX_CONCURRENT_OPERATIONS = 4
+CLIP_SECONDS = 8
+VEO_RPM = 10
+VEO_POLL_RPM = 600
+VEO_BUCKET = f"{VEO_MODEL}:generate_videos"
+VEO_POLL_BUCKET = f"{VEO_MODEL}:operations.get"
+CLIP_CACHE_DIR = "/usr/local/google/home/mlad/adk-demo/cache/videos"
+CLIP_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024
+CLIP_BUFFER_SIZE = 1024 * 1024
+# How often a render waiting for a shared operation slot checks for one.
+SLOT_POLL_SECONDS = 1.0
+# Length of the crossfade between scenes; 0 joins them with hard cuts.
+TRANSITION_SECONDS = 1.0
+# Each ffmpeg job of the stitch is killed after this many seconds.
+STITCH_TIMEOUT_SECONDS = 600.0
+# "mp4" stitches final_video.mp4 once every scene is rendered; "hls" publishes
+# scenes to a playlist as they finish.
+OUTPUT_MODES = ("mp4", "hls")
+# Renditions published alongside final_video.mp4 when requested.
+RENDITION_LADDER = DEFAULT_LADDER
+# When set, Veo writes clips to this gs:// prefix and they are streamed to
+# disk in CLIP_BUFFER_SIZE chunks, then deleted from GCS. Streaming needs
+# it: without it Veo returns every clip inline, held whole in memory.
+VIDEO_OUTPUT_GCS_URI = os.environ.get("VIDEO_OUTPUT_GCS_URI")
+
+clip_cache = ContentCache(CLIP_CACHE_DIR, CLIP_CACHE_MAX_BYTES)
+# Let a full batch of scenes submit at once, then pace further submissions.
+rate_limiter.configure(VEO_BUCKET, rpm=VEO_RPM, burst=MAX_CONCURRENT_OPERATIONS)
+rate_limiter.configure(VEO_POLL_BUCKET, rpm=VEO_POLL_RPM, burst=MAX_CONCURRENT_OPERATIONS)
+
+def _scene_prompt(i: int, scene: dict) -> str:
+    """Builds the Veo prompt for the scene at index i."""
+    prompt = scene["description"]
+    if i == 0:
+        # Add panning for the first scene
+        prompt += " The camera pans from left to center on the first person, then from right to center on the second person."
+    return prompt
+
+def _video_config() -> GenerateVideosConfig:
+    return GenerateVideosConfig(
+        aspect_ratio="16:9",
+        number_of_videos=1,
+        duration_seconds=CLIP_SECONDS,
+        resolution="1080p",
+        person_generation="allow_adult",
+        enhance_prompt=True,
+        generate_audio=True,
+        output_gcs_uri=VIDEO_OUTPUT_GCS_URI,
+    )
+
+def clip_cache_key(prompt: str, image: Image, config: GenerateVideosConfig) -> str:
+    """Content address of a Veo request: model, prompt, start image and config."""
+    if image.image_bytes is None:
+        raise ValueError("clip_cache_key needs an image with inline bytes")
+    return cache_key(VEO_MODEL, prompt, digest(image.image_bytes), config.model_dump_json(exclude_none=True, exclude={"output_gcs_uri"}))
+
+def _write_clip(video: Video, clip_path: str, meter: MemoryHighWaterMark) -> int:
+    """Writes a generated clip to clip_path, streaming it from GCS when possible."""
+    if video.uri and video.uri.startswith("gs://"):
+        written = stream_to_file(iter_gcs_object(video.uri, CLIP_BUFFER_SIZE), clip_path, meter)
+        # The local copy (and the clip cache) supersede the object Veo wrote.
+        delete_gcs_object(video.uri)
+        return written
+    if video.video_bytes is None:
+        raise ValueError(f"Veo returned neither a URI nor bytes for {clip_path}")
+    # Inline payloads are already resident, so account for all of it.
+    with meter.hold(len(video.video_bytes)):
+        return stream_to_file(iter_bytes(video.video_bytes, CLIP_BUFFER_SIZE), clip_path)
+
+def video_client() -> genai.Client:
+    return get_client(*VIDEO_CLIENT_KEY)
+
+async def video_client_async() -> genai.Client:
+    return await get_async_client(*VIDEO_CLIENT_KEY)
+
+def _checkpoint_clip(manifest: RunManifest | None, i: int, key: str, clip_path: str) -> None:
+    if manifest is not None:
+        manifest.record_scene("create_video", i+1, key, {"clip_path": clip_path}, files=[clip_path])
+
+def _adopt_clip(manifest: RunManifest, i: int, key: str, recorded_path: str, clip_path: str) -> bool:
+    """Links a recorded clip, e.g. from the run this one builds on, to clip_path and checkpoints it.
+
+    Returns False if the recorded clip has vanished.
+    """
+    try:
+        link_file(recorded_path, clip_path)
+    except FileNotFoundError:
+        return False
+    _checkpoint_clip(manifest, i, key, clip_path)
+    return True
+
+def _note_scene(manifest: RunManifest | None, i: int, reused: bool) -> None:
+    if manifest is not None:
+        manifest.note_scene("create_video", i+1, reused=reused, model_calls=1)
+
+def render_scenes(client: genai.Client, script: dict, start_images: list[Future], videos_dir: str, max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS, manifest: RunManifest | None = None, on_clip: Callable[[int, str | None], None] | None = None, operation_slots: threading.Semaphore | None = None, artifacts: ArtifactStore | None = None) -> list[str]:
+    """Renders one clip per scene and returns the clip paths in scene order.
+
+    start_images[i] resolves to the image entry of scene i. Each scene's Veo
+    operation is submitted as soon as its start image is ready (up to the
+    concurrency cap), so rendering can overlap with image generation for
+    later scenes. Scenes whose prompt, start image and config match an
+    earlier clip are served from the clip cache and never submitted to Veo.
+    With a manifest, scenes whose prompt, start image and config are unchanged
+    since they were last completed are skipped, and new clips are
+    checkpointed. on_clip(i, clip_path) is called as soon as scene i's clip
+    is available, or with None if the scene failed. operation_slots, when
+    given, is a semaphore shared with other concurrent renders that caps the
+    Veo operations in flight across all of them. Start images are taken
+    from artifacts by the handles in their entries when possible, and only
+    read from disk otherwise. Scenes without a valid start image are
+    reported as failed and never submitted to Veo.
+    """
     if not os.path.exists(videos_dir):
         os.makedirs(videos_dir)
 
-    PROJECT_ID = "mlad-argo"
-    client = genai.Client(vertexai=True, project=PROJECT_ID, location="us-central1")
-
-    video_clips = []
-    for i, scene in enumerate(script["script"]):
-        print(f"Generating video for scene {i+1}...")
-        prompt = scene["description"]
-        starting_image_path = images["images"][i]["start_image_path"]
-        ending_image_path = images["images"][i]["end_image_path"]
-
-        if i == 0:
-            # Add panning for the first scene
-            prompt += " The camera pans from left to center on the first person, then from right to center on the second person."
-
-        operation = client.models.generate_videos(
-            model="veo-3.1-fast-generate-preview",
-            prompt=prompt,
-            image=Image.from_file(location=starting_image_path),
-            config=GenerateVideosConfig(
-                aspect_ratio="16:9",
-                number_of_videos=1,
-                duration_seconds=8,
-                resolution="1080p",
-                person_generation="allow_adult",
-                enhance_prompt=True,
-                generate_audio=True,
-            ),
-        )
-
-        while not operation.done:
-            time.sleep(15)
-            operation = client.operations.get(operation)
-
-        if operation.response:
-            video_data = operation.result.generated_videos[0].video.video_bytes
-            clip_path = os.path.join(videos_dir, f"scene_{i+1}.mp4")
-            with open(clip_path, "wb") as f:
-                f.write(video_data)
-            video_clips.append(clip_path)
-        else:
+    scenes = script["script"]
+    config = _video_config()
+    waiting = {future: i for i, future in enumerate(start_images)}
+    ready: list[int] = []
+    requests: dict[int, tuple[str, Image, str, float]] = {}
+    video_clips = {}
+    in_flight: dict[Future, int] = {}
+    scene_spans = {}
+    meter = MemoryHighWaterMark()
+    with OperationPoller(rate_limiter.wrap(VEO_POLL_BUCKET, client.operations.get)) as poller:
+        try:
+            while waiting or ready or in_flight:
+                while ready and len(in_flight) < max(1, max_concurrent_operations):
+                    # Leave the scene queued while other renders hold every
+                    # shared slot; the wait below then polls for a free one.
+                    if operation_slots is not None and not operation_slots.acquire(blocking=False):
+                        break
+                    i = ready.pop(0)
+                    prompt, image, _, ready_at = requests[i]
+                    print(f"Generating video for scene {i+1}...")
+                    try:
+                        with rate_limiter.limit(VEO_BUCKET):
+                            operation = client.models.generate_videos(
+                                model=VEO_MODEL,
+                                prompt=prompt,
+                                image=image,
+                                config=config,
+                            )
+                    except BaseException:
+                        if operation_slots is not None:
+                            operation_slots.release()
+                        raise
+                    in_flight[poller.register(operation, queued_at=ready_at)] = i
+
+                starved = bool(ready) and len(in_flight) < max(1, max_concurrent_operations)
+                if starved and not waiting and not in_flight:
+                    # Nothing of ours to wait on; just retry for a slot.
+                    time.sleep(SLOT_POLL_SECONDS)
+                    continue
+                done, _ = wait([*waiting, *in_flight], timeout=SLOT_POLL_SECONDS if starved else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in waiting:
+                        i = waiting.pop(future)
+                        prompt = _scene_prompt(i, scenes[i])
+                        try:
+                            image, image_bytes = _start_image(future.result(), artifacts)
+                        except InvalidImageError as e:
+                            _skip_scene(i, e)
+                            if on_clip is not None:
+                                on_clip(i, None)
+                            continue
+                        key = clip_cache_key(prompt, image, config)
+                        clip_path = os.path.join(videos_dir, f"scene_{i+1}.mp4")
+                        span = SceneSpan("create_video", i+1, **{MODEL: VEO_MODEL, BYTES_IN: len(image_bytes)})
+                        recorded = manifest.scene("create_video", i+1, key) if manifest is not None else None
+                        if manifest is not None and recorded is not None and _adopt_clip(manifest, i, key, recorded["clip_path"], clip_path):
+                            print(f"Skipping video for scene {i+1}: inputs unchanged")
+                            video_clips[i] = clip_path
+                            _note_scene(manifest, i, reused=True)
+                            span.set(REUSED, True)
+                            span.end()
+                            if on_clip is not None:
+                                on_clip(i, video_clips[i])
+                        elif clip_cache.get_file(key, clip_path):
+                            print(f"Reusing cached video for scene {i+1}")
+                            video_clips[i] = clip_path
+                            _checkpoint_clip(manifest, i, key, clip_path)
+                            _note_scene(manifest, i, reused=True)
+                            span.set(CACHE_HIT, True)
+                            span.end()
+                            if on_clip is not None:
+                                on_clip(i, clip_path)
+                        else:
+                            _note_scene(manifest, i, reused=False)
+                            scene_spans[i] = span
+                            requests[i] = (prompt, image, key, time.monotonic())
+                            ready.append(i)
+                            ready.sort()
+                        continue
+
+                    i = in_flight.pop(future)
+                    if operation_slots is not None:
+                        operation_slots.release()
+                    polled = future.result()
+                    print(f"Scene {i+1} finished: queued {polled.queue_seconds:.1f}s, rendered {polled.render_seconds:.1f}s ({polled.polls} polls)")
+                    span = scene_spans.pop(i)
+                    _trace_polled(span, polled)
+                    operation = polled.operation
+                    # Write each clip as soon as it is ready rather than after the
+                    # whole batch, so finished payloads do not pile up in memory.
+                    if operation.response:
+                        clip_path = os.path.join(videos_dir, f"scene_{i+1}.mp4")
+                        span.set(BYTES_OUT, _write_clip(operation.result.generated_videos[0].video, clip_path, meter))
+                        clip_cache.put_file(requests[i][2], clip_path)
+                        video_clips[i] = clip_path
+                        _checkpoint_clip(manifest, i, requests[i][2], clip_path)
+                    else:
+                        print(f"Failed to generate video for scene {i+1}")
+                        print(f"Operation details: {operation}")
+                        span.fail("video generation failed")
+                    span.end()
+                    if on_clip is not None:
+                        on_clip(i, video_clips.get(i))
+        except BaseException as e:
+            for span in scene_spans.values():
+                span.end(e)
+            raise
+        finally:
+            # Hand back the shared slots of operations abandoned by an error.
+            if operation_slots is not None:
+                for _ in in_flight:
+                    operation_slots.release()
+
+    memory = meter.snapshot()
+    print(f"Clip buffer high-water mark: {memory['peak_buffered_bytes']} bytes (peak RSS {memory['peak_rss_bytes'] // (1024 * 1024)} MiB)")
+
+    # Keep the clips in scene order, regardless of the order they finished in.
+    return [video_clips[i] for i in sorted(video_clips)]
+
+async def render_scenes_async(client: genai.Client, script: dict, start_images: Sequence[Awaitable[dict]], videos_dir: str, max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS, manifest: RunManifest | None = None, on_clip: Callable[[int, str | None], None] | None = None, artifacts: ArtifactStore | None = None) -> list[str]:
+    """Async counterpart of render_scenes, built on client.aio.
+
+    start_images[i] is awaited for the image entry of scene i. Operations
+    are polled from the event loop, and file, cache and manifest I/O as well
+    as on_clip run on worker threads, so the loop is never blocked.
+    """
+    await asyncio.to_thread(os.makedirs, videos_dir, exist_ok=True)
+
+    scenes = script["script"]
+    config = _video_config()
+    slots = asyncio.Semaphore(max(1, max_concurrent_operations))
+    get_operation = rate_limiter.wrap_async(VEO_POLL_BUCKET, client.aio.operations.get)
+    meter = MemoryHighWaterMark()
+
+    async def render(i: int, start_image: Awaitable[dict]) -> str | None:
+        clip_path = await _render_scene_async(client, i, scenes[i], await start_image, videos_dir, config, slots, get_operation, meter, manifest, artifacts)
+        if on_clip is not None:
+            await asyncio.to_thread(on_clip, i, clip_path)
+        return clip_path
+
+    renders = [asyncio.ensure_future(render(i, start_image)) for i, start_image in enumerate(start_images)]
+    try:
+        results = await asyncio.gather(*renders)
+    finally:
+        # If one scene fails, stop the others rather than leave them running.
+        await cancel_and_wait(renders)
+
+    memory = meter.snapshot()
+    print(f"Clip buffer high-water mark: {memory['peak_buffered_bytes']} bytes (peak RSS {memory['peak_rss_bytes'] // (1024 * 1024)} MiB)")
+
+    return [clip_path for clip_path in results if clip_path is not None]
+
+async def _render_scene_async(client: genai.Client, i: int, scene: dict, entry: dict, videos_dir: str, config: GenerateVideosConfig, slots: asyncio.Semaphore, get_operation: Callable[..., Awaitable], meter: MemoryHighWaterMark, manifest: RunManifest | None, artifacts: ArtifactStore | None) -> str | None:
+    prompt = _scene_prompt(i, scene)
+    try:
+        image, image_bytes = await asyncio.to_thread(_start_image, entry, artifacts)
+    except InvalidImageError as e:
+        _skip_scene(i, e)
+        return None
+    with scene_span("create_video", i+1, **{MODEL: VEO_MODEL, BYTES_IN: len(image_bytes)}) as span:
+        key = clip_cache_key(prompt, image, config)
+        clip_path = os.path.join(videos_dir, f"scene_{i+1}.mp4")
+        # Checking a recorded clip hashes it, and every note rewrites the manifest.
+        recorded = await asyncio.to_thread(manifest.scene, "create_video", i+1, key) if manifest is not None else None
+        if manifest is not None and recorded is not None and await asyncio.to_thread(_adopt_clip, manifest, i, key, recorded["clip_path"], clip_path):
+            print(f"Skipping video for scene {i+1}: inputs unchanged")
+            await asyncio.to_thread(_note_scene, manifest, i, reused=True)
+            span.set(REUSED, True)
+            return clip_path
+        if await asyncio.to_thread(clip_cache.get_file, key, clip_path):
+            print(f"Reusing cached video for scene {i+1}")
+            await asyncio.to_thread(_checkpoint_clip, manifest, i, key, clip_path)
+            await asyncio.to_thread(_note_scene, manifest, i, reused=True)
+            span.set(CACHE_HIT, True)
+            return clip_path
+        await asyncio.to_thread(_note_scene, manifest, i, reused=False)
+
+        ready_at = time.monotonic()
+        async with slots:
+            print(f"Generating video for scene {i+1}...")
+            async with rate_limiter.limit_async(VEO_BUCKET):
+                operation = await client.aio.models.generate_videos(
+                    model=VEO_MODEL,
+                    prompt=prompt,
+                    image=image,
+                    config=config,
+                )
+            polled = await poll_operation(get_operation, operation, queued_at=ready_at)
+        print(f"Scene {i+1} finished: queued {polled.queue_seconds:.1f}s, rendered {polled.render_seconds:.1f}s ({polled.polls} polls)")
+        _trace_polled(span, polled)
+        operation = polled.operation
+        if not operation.response:
             print(f"Failed to generate video for scene {i+1}")
             print(f"Operation details: {operation}")
+            span.fail("video generation failed")
+            return None
+        span.set(BYTES_OUT, await asyncio.to_thread(_write_clip, operation.result.generated_videos[0].video, clip_path, meter))
+        await asyncio.to_thread(clip_cache.put_file, key, clip_path)
+        await asyncio.to_thread(_checkpoint_clip, manifest, i, key, clip_path)
+        return clip_path
+
+def _start_image(entry: dict, artifacts: ArtifactStore | None) -> tuple[Image, bytes]:
+    """Returns a scene's start image and its bytes, raising InvalidImageError unless Veo can use it."""
+    try:
+        if artifacts is None:
+            image = Image.from_file(location=entry["start_image_path"])
+        else:
+            image = artifacts.image(entry.get("start_image"), entry["start_image_path"])
+    except FileNotFoundError as e:
+        raise InvalidImageError(f"no start image at {entry['start_image_path']}") from e
+    if image.image_bytes is None:
+        raise InvalidImageError(f"no image data for {entry['start_image_path']}")
+    validate_image(image.image_bytes)
+    return image, image.image_bytes
+
+def _skip_scene(i: int, error: InvalidImageError) -> None:
+    print(f"Not generating video for scene {i+1}: {error}")
+    span = SceneSpan("create_video", i+1, **{MODEL: VEO_MODEL})
+    span.fail(f"invalid start image: {error}")
+    span.end()
+
+def _trace_polled(span: SceneSpan, polled: PolledOperation) -> None:
+    span.set(QUEUE_WAIT_SECONDS, polled.queue_seconds)
+    span.set(RENDER_SECONDS, polled.render_seconds)
+    span.set(POLLS, polled.polls)
 
+def _print_encode_progress(progress: FFmpegProgress) -> None:
+    if progress.done:
+        print(f"Encoded {progress.frame} frames at {progress.speed}")
+
+def stitch_clips(video_clips: list[str], videos_dir: str, ladder: Sequence[Rendition] = ()) -> str:
+    """Stitches the scene clips into the final video and returns its path.
+
+    With a ladder, the final video is also transcoded into every rendition
+    of it in a single ffmpeg run, written next to it in videos_dir.
+    """
+    return run_sync(lambda: stitch_clips_async(video_clips, videos_dir, ladder))
+
+async def stitch_clips_async(video_clips: list[str], videos_dir: str, ladder: Sequence[Rendition] = ()) -> str:
+    """Like stitch_clips, awaiting the ffmpeg jobs on the running loop."""
     # Stitch the video clips together with fade transitions using ffmpeg
     if len(video_clips) > 1:
         print("Stitching video clips together with fade transitions...")
-        # Create a complex filtergraph for ffmpeg to chain fade transitions
-        filter_complex = ""
-        for i in range(len(video_clips) - 1):
-            filter_complex += f"[{i+1}:v]format=pix_fmts=yuva420p,fade=type=in:st=0:d=1,fade=type=out:st=7:d=1[v{i+1}];"
-        
-        inputs = "".join([f"-i {clip} " for clip in video_clips])
-        
-        video_chain = ""
-        for i in range(len(video_clips)):
-            video_chain += f"[v{i}]"
-
         final_video_path = os.path.join(videos_dir, "final_video.mp4")
-        # A more robust ffmpeg command for fade transitions would be needed.
-        # This is a simplified example and might not work as expected.
-        # For now, we will stick to the simple concatenation.
-        file_list_path = os.path.join(videos_dir, "file_list.txt")
-        with open(file_list_path, "w") as f:
-            for clip_path in video_clips:
-                f.write(f"file '{clip_path}'\n")
-
-        ffmpeg_command = f"ffmpeg -f concat -safe 0 -i {file_list_path} -c copy {final_video_path} -y"
-        subprocess.run(ffmpeg_command, shell=True, check=True)
-
-        # Clean up the individual clips and the file list
-        for clip_path in video_clips:
-            os.remove(clip_path)
-        os.remove(file_list_path)
+        work_dir = os.path.join(videos_dir, "stitch")
+        # Publish the final video only once it is complete.
+        with atomic_output(final_video_path) as partial_path:
+            if TRANSITION_SECONDS > 0:
+                # Only the transition windows are re-encoded; the rest of each
+                # clip is stream-copied.
+                await crossfade_clips(video_clips, partial_path, work_dir, TRANSITION_SECONDS, STITCH_TIMEOUT_SECONDS, _print_encode_progress)
+            else:
+                await concat_clips(video_clips, partial_path, work_dir, STITCH_TIMEOUT_SECONDS)
+
+        # The clips themselves stay in the workspace, where the manifest
+        # records them for resumed and incremental runs, until it is
+        # garbage-collected.
+        await asyncio.to_thread(shutil.rmtree, work_dir, ignore_errors=True)
 
     elif len(video_clips) == 1:
         final_video_path = video_clips[0]
     else:
         final_video_path = ""
 
+    if final_video_path and ladder:
+        print(f"Encoding renditions {', '.join(r.name for r in ladder)}...")
+        ladder_dir = os.path.join(videos_dir, "ladder")
+        renditions = await encode_ladder(final_video_path, ladder_dir, ladder, STITCH_TIMEOUT_SECONDS, _print_encode_progress)
+        for name, path in renditions.items():
+            # Renditions are written in a scratch directory and moved into
+            # place whole.
+            published = os.path.join(videos_dir, os.path.basename(path))
+            os.replace(path, published)
+            print(f"Rendition {name}: {published}")
+        shutil.rmtree(ladder_dir, ignore_errors=True)
+
     return final_video_path
 
+def render_progressive(client: genai.Client, script: dict, start_images: list[Future], videos_dir: str, max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS, manifest: RunManifest | None = None, operation_slots: threading.Semaphore | None = None, artifacts: ArtifactStore | None = None) -> str:
+    """Renders the scenes into an HLS playlist that grows while they render.
+
+    Each clip is appended to videos_dir/hls/playlist.m3u8 as soon as it and
+    every earlier scene are done, so the first scene is playable about one
+    Veo latency after rendering starts. Scenes are joined with hard cuts and
+    the closed playlist is the final output; nothing is stitched afterwards.
+    """
+    playlist = HlsPlaylist(os.path.join(videos_dir, "hls"), STITCH_TIMEOUT_SECONDS, CLIP_SECONDS)
+    print(f"Publishing scenes to {playlist.path} as they finish...")
+    render_scenes(client, script, start_images, videos_dir, max_concurrent_operations, manifest=manifest, on_clip=playlist.add, operation_slots=operation_slots, artifacts=artifacts)
+    playlist.close()
+    return playlist.path
+
+async def render_progressive_async(client: genai.Client, script: dict, start_images: Sequence[Awaitable[dict]], videos_dir: str, max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS, manifest: RunManifest | None = None, artifacts: ArtifactStore | None = None) -> str:
+    """Async counterpart of render_progressive."""
+    playlist = await asyncio.to_thread(HlsPlaylist, os.path.join(videos_dir, "hls"), STITCH_TIMEOUT_SECONDS, CLIP_SECONDS)
+    print(f"Publishing scenes to {playlist.path} as they finish...")
+    await render_scenes_async(client, script, start_images, videos_dir, max_concurrent_operations, manifest=manifest, on_clip=playlist.add, artifacts=artifacts)
+    await asyncio.to_thread(playlist.close)
+    return playlist.path
+
+def create_video(story: dict, script: dict, images: dict, max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS, output_mode: str = "mp4", renditions: bool = False) -> str:
+    """Creates a video from a storyboard, script, and images by generating a video for each scene and stitching them together with fade transitions.
+
+    With output_mode "hls", scenes are instead published to an HLS playlist
+    as they finish rendering, and the playlist path is returned. With
+    renditions, the stitched video is also encoded into RENDITION_LADDER.
+
+    Clips are only streamed to disk in bounded chunks when
+    VIDEO_OUTPUT_GCS_URI is set, and the objects Veo wrote there are deleted
+    once downloaded. Otherwise Veo returns each clip inline, so
+    every operation in flight holds a whole clip in memory until it is
+    written.
+    """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {output_mode!r}; expected one of {OUTPUT_MODES}")
+    print("Creating video...")
+    start_images = []
+    for entry in images["images"]:
+        future: Future[dict] = Future()
+        future.set_result(entry)
+        start_images.append(future)
+
+    with Workspace.open() as workspace:
+        if output_mode == "hls":
+            return render_progressive(video_client(), script, start_images, workspace.videos_dir, max_concurrent_operations)
+        video_clips = render_scenes(video_client(), script, start_images, workspace.videos_dir, max_concurrent_operations)
+        return stitch_clips(video_clips, workspace.videos_dir, RENDITION_LADDER if renditions else ())
+
+async def create_video_async(story: dict, script: dict, images: dict, max_concurrent_operations: int = MAX_CONCURRENT_OPERATIONS, output_mode: str = "mp4", renditions: bool = False) -> str:
+    """Like create_video, but renders and stitches on the event loop."""
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {output_mode!r}; expected one of {OUTPUT_MODES}")
+    print("Creating video...")
+    start_images = [_resolved(entry) for entry in images["images"]]
+
+    workspace = await asyncio.to_thread(Workspace.open)
+    try:
+        if output_mode == "hls":
+            return await render_progressive_async(await video_client_async(), script, start_images, workspace.videos_dir, max_concurrent_operations)
+        video_clips = await render_scenes_async(await video_client_async(), script, start_images, workspace.videos_dir, max_concurrent_operations)
+        return await stitch_clips_async(video_clips, workspace.videos_dir, RENDITION_LADDER if renditions else ())
+    finally:
+        workspace.close()
+
+async def _resolved(entry: dict) -> dict:
+    return entry
+
 video_agent = Agent(
     name="VideoAgent",
-    tools=[create_video],
+    tools=[create_video_async],
 )
\ No newline at end of file
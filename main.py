@@ -1,22 +1,51 @@
 import subprocess
 import time
-from agents.agent import generate_family_story_video
+import click
+from agents.agent import generate_family_story_video, warm_up_clients
+from agents.batch import MAX_CONCURRENT_FAMILIES, read_family_names, run_batch
+from agents.utils.stitching import DEFAULT_LADDER
+from agents.video_agent import OUTPUT_MODES
 
-def main():
-    # Start the MCP server in the background
+@click.command()
+@click.option("--family-name", "family_names", multiple=True, help="Family to generate the story video for; repeat for several families (default: Doe)")
+@click.option("--families-file", default=None, type=click.Path(exists=True, dir_okay=False), help="Text or JSON Lines file of family names to generate videos for in one batch")
+@click.option("--max-families", default=MAX_CONCURRENT_FAMILIES, help="Families generated concurrently in batch mode")
+@click.option("--summary", "summary_path", default="batch_summary.json", help="Where batch mode writes per-family results and latencies")
+@click.option("--resume", "run_id", default=None, help="Id of an earlier run to resume; completed stages and scenes are skipped")
+@click.option("--incremental/--full-rebuild", default=True, help="Only re-render scenes whose inputs changed since the family's last run")
+@click.option("--output-mode", type=click.Choice(OUTPUT_MODES), default="mp4", help="Stitch final_video.mp4 at the end, or publish scenes to an HLS playlist as they finish")
+@click.option("--rendition", "renditions", multiple=True, type=click.Choice([r.name for r in DEFAULT_LADDER]), help="Also encode the final video at this rendition of the ladder; repeat for several")
+def main(family_names: tuple[str, ...], families_file: str | None, max_families: int, summary_path: str, run_id: str | None, incremental: bool, output_mode: str, renditions: tuple[str, ...]) -> None:
+    names: list[str] = list(family_names)
+    if families_file:
+        names += [name for name in read_family_names(families_file) if name not in names]
+    names = names or ["Doe"]
+    batch = len(names) > 1 or families_file is not None
+    if batch and run_id:
+        raise click.UsageError("--resume applies to a single family run")
+    if renditions and output_mode == "hls":
+        raise click.UsageError("--rendition applies to the stitched mp4 output")
+    ladder = tuple(r for r in DEFAULT_LADDER if r.name in renditions)
+
+    # Start the MCP server in the background; batch runs share this one server
     mcp_server_process = subprocess.Popen(["python", "/usr/local/google/home/mlad/adk-demo/mcp_server.py"])
+    # Create the shared clients while the server starts, instead of on the
+    # first model call
+    warm_up_clients()
     time.sleep(2)  # Give the server a moment to start
 
-    family_name = "Doe"
-
     # Run the main agent
-    video_path = generate_family_story_video(family_name)
-
-    print(f"Video created: {video_path}")
-
-    # Stop the MCP server
-    mcp_server_process.terminate()
+    try:
+        if batch:
+            summary = run_batch(names, summary_path, max_families, incremental, output_mode, ladder=ladder)
+            print(f"Batch finished: {summary['succeeded']} succeeded, {summary['failed']} failed in {summary['wall_seconds']:.1f}s; summary written to {summary_path}")
+        else:
+            video_path = generate_family_story_video(names[0], run_id=run_id, incremental=incremental, output_mode=output_mode, ladder=ladder)
+            print(f"Video created: {video_path}")
+    finally:
+        # Stop the MCP server
+        mcp_server_process.terminate()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,12 +2,23 @@ import http.server
 import socketserver
 import json
 from urllib.parse import urlparse, parse_qs
-from google import genai
-from google.genai.types import Part
-import os
+from agents.utils.artifacts import ArtifactStore
+from agents.utils.clients import clients, get_client
+from agents.utils.ratelimit import rate_limiter
+from agents.utils.references import prepare_reference
 
 PORT = 8000
 PROJECT_ID = "mlad-argo"
+VISION_MODEL = "gemini-2.5-flash"
+VISION_BUCKET = f"{VISION_MODEL}:generate_content"
+
+# The server runs in its own process, so it has its own limiter buckets.
+rate_limiter.configure(VISION_BUCKET, rpm=60, concurrency=4)
+
+# Character images are read and downsized once, then served from memory to
+# every request for the family.
+IMAGE_MEMORY_BYTES = 64 * 1024 * 1024
+character_images = ArtifactStore(max_memory_bytes=IMAGE_MEMORY_BYTES)
 
 class MCPServer(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
@@ -18,27 +29,26 @@ class MCPServer(http.server.SimpleHTTPRequestHandler):
             if family_name:
                 with open('/usr/local/google/home/mlad/adk-demo/mcp_data.json', 'r') as f:
                     data = json.load(f)
-                
+
                 if family_name in data:
-                    client = genai.Client(vertexai=True, project=PROJECT_ID, location="global")
-                    
+                    client = get_client(PROJECT_ID, "global")
+
                     response_data = []
                     for character_data in data[family_name]:
-                        image_path = urlparse(character_data["image_url"]).path
-                        with open(image_path, "rb") as f:
-                            image_bytes = f.read()
-                        
+                        image = prepare_reference(character_images, character_images.load(urlparse(character_data["image_url"]).path))
+
                         # Analyze the image with Gemini
-                        response = client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=[
-                                Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
-                                "Extract the name and birth place of the person in this image. "
-                                "Return the data in JSON format with keys 'name' and 'birth_place'. "
-                                "If you can't determine the information, use 'Unknown'."
-                            ]
-                        )
-                        
+                        with rate_limiter.limit(VISION_BUCKET):
+                            response = client.models.generate_content(
+                                model=VISION_MODEL,
+                                contents=[
+                                    character_images.part(image),
+                                    "Extract the name and birth place of the person in this image. "
+                                    "Return the data in JSON format with keys 'name' and 'birth_place'. "
+                                    "If you can't determine the information, use 'Unknown'."
+                                ]
+                            )
+
                         metadata = {"name": "Unknown", "birth_place": "Unknown"}
                         if response.candidates and response.candidates[0].content.parts:
                             try:
@@ -71,6 +81,14 @@ class MCPServer(http.server.SimpleHTTPRequestHandler):
         else:
             super().do_GET()
 
-with socketserver.TCPServer(("", PORT), MCPServer) as httpd:
+class ThreadingServer(socketserver.ThreadingTCPServer):
+    # Serve requests on their own threads, so concurrent family runs sharing
+    # this server do not queue behind each other's vision calls.
+    daemon_threads = True
+
+# Create the shared client before the first request arrives.
+clients.warm_up([(PROJECT_ID, "global", True)])
+
+with ThreadingServer(("", PORT), MCPServer) as httpd:
     print("serving at port", PORT)
     httpd.serve_forever()
@@ -0,0 +1,108 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the per-call overhead of fresh genai clients versus the registry.
+
+Runs a local stub of the generateContent endpoint, then issues the same
+request N times with a client constructed per call (as the tools used to)
+and with the shared client from a ClientRegistry, and prints latency
+percentiles as JSON:
+
+    uv run python -m tests.load_test.client_benchmark --calls 200
+"""
+
+import http.server
+import json
+import statistics
+import threading
+import time
+from collections.abc import Callable
+
+import click
+from google import genai
+from google.genai.types import HttpOptions
+
+from agents.utils.clients import ClientRegistry
+
+RESPONSE = json.dumps(
+    {"candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}}]}
+).encode()
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def measure(calls: int, call: Callable[[], None]) -> dict[str, float]:
+    call()  # Exclude one-time import and first-connection costs
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+    }
+
+
+@click.command()
+@click.option("--calls", default=200, help="Requests per variant")
+def main(calls: int) -> None:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    http_options = HttpOptions(base_url=f"http://127.0.0.1:{server.server_port}")
+
+    def make_client(**_: object) -> genai.Client:
+        return genai.Client(api_key="benchmark", http_options=http_options)
+
+    def fresh_client_call() -> None:
+        client = make_client()
+        client.models.generate_content(model="gemini-2.5-flash", contents="ping")
+        client.close()
+
+    registry = ClientRegistry(factory=make_client)
+
+    def registry_call() -> None:
+        registry.get("benchmark", "global").models.generate_content(
+            model="gemini-2.5-flash", contents="ping"
+        )
+
+    results = {
+        "calls": calls,
+        "fresh_client_per_call": measure(calls, fresh_client_call),
+        "shared_registry_client": measure(calls, registry_call),
+    }
+    results["overhead_saved_ms"] = round(
+        results["fresh_client_per_call"]["mean_ms"] - results["shared_registry_client"]["mean_ms"], 3
+    )
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the single-decode rendition ladder against sequential transcodes.
+
+Generates a synthetic 1080p source with ffmpeg's testsrc, then encodes the
+default ladder once with encode_ladder (one decode, split filter) and once
+with one encode_rendition run per rendition, and prints the wall-clock
+times as JSON:
+
+    uv run python -m tests.load_test.ladder_benchmark --duration 24 --repeats 3
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import click
+
+from agents.utils.ffmpeg import FFMPEG, run_ffmpeg
+from agents.utils.stitching import DEFAULT_LADDER, encode_ladder, encode_rendition
+
+
+async def make_source(path: str, duration: float) -> None:
+    await run_ffmpeg(
+        [
+            FFMPEG, "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=24:duration={duration}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac",
+            path,
+        ]
+    )
+
+
+async def sequential(source: str, output_dir: str) -> None:
+    stem = os.path.splitext(os.path.basename(source))[0]
+    for rendition in DEFAULT_LADDER:
+        output = os.path.join(output_dir, f"{stem}_{rendition.name}.mp4")
+        await encode_rendition(source, output, rendition)
+
+
+async def benchmark(duration: float, repeats: int) -> dict:
+    timings: dict[str, list[float]] = {"ladder": [], "sequential": []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, "source.mp4")
+        await make_source(source, duration)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            await encode_ladder(source, os.path.join(work_dir, "ladder"))
+            timings["ladder"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await sequential(source, os.path.join(work_dir, "sequential"))
+            timings["sequential"].append(time.perf_counter() - start)
+
+    ladder = statistics.median(timings["ladder"])
+    sequential_seconds = statistics.median(timings["sequential"])
+    return {
+        "source_seconds": duration,
+        "renditions": [r.name for r in DEFAULT_LADDER],
+        "ladder_seconds": round(ladder, 3),
+        "sequential_seconds": round(sequential_seconds, 3),
+        "speedup": round(sequential_seconds / ladder, 2),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+@click.command()
+@click.option("--duration", default=24.0, help="Length of the synthetic source in seconds")
+@click.option("--repeats", default=3, help="Runs per variant; the median is reported")
+def main(duration: float, repeats: int) -> None:
+    print(json.dumps(asyncio.run(benchmark(duration, repeats)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
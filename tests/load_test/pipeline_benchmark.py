@@ -0,0 +1,542 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the whole pipeline offline against a simulated genai backend.
+
+Swaps the shared genai clients for a local fake that answers image requests
+with synthetic PNGs and Veo requests with an ffmpeg testsrc clip, after
+latencies drawn from configurable distributions and with configurable
+failure rates. It then generates videos of N scenes for M families through
+one of the pipeline's entry points and prints wall-clock time, p50/p95/p99
+per stage and per scene step, and peak RSS as JSON:
+
+    uv run python -m tests.load_test.pipeline_benchmark --path batch --families 4 --scenes 6
+
+With --hedging compare, the same workload runs once without and once with
+hedged image requests, and the report includes the p99 image latency of
+both runs. The image cache is off in this mode, since a cached image never
+reaches the model and so cannot be hedged, and the workload needs enough
+scenes for a p99 to mean something:
+
+    uv run python -m tests.load_test.pipeline_benchmark --hedging compare --families 8 --scenes 12 --image-latency lognormal:0.8:0.8
+
+Latency distributions are given as "fixed:SECONDS", "uniform:LOW:HIGH" or
+"lognormal:MEDIAN:SIGMA". Nothing leaves the machine: caches, manifests and
+outputs go to a temporary directory, and the MCP server is not needed.
+"""
+
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any
+from unittest import mock
+
+import click
+from google.genai import types
+
+import agents.agent as agent
+import agents.batch as batch
+import agents.image_agent as image_agent
+import agents.utils.references as references
+import agents.utils.telemetry as telemetry
+import agents.video_agent as video_agent
+from agents.utils.cache import ContentCache
+from agents.utils.clients import clients
+from agents.utils.ffmpeg import FFMPEG, run_ffmpeg
+from agents.utils.hedging import HedgePolicy
+from agents.utils.ratelimit import rate_limiter
+from agents.utils.retry import CircuitBreakers
+
+PATHS = ("single", "async", "batch")
+HEDGING_MODES = ("off", "on", "compare")
+UNTHROTTLED_RPM = 1_000_000.0
+
+
+@dataclass(frozen=True)
+class Latency:
+    """A latency distribution in seconds, parsed from "kind:arg[:arg]"."""
+
+    kind: str
+    args: tuple[float, ...]
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, *args = spec.split(":")
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}.get(kind)
+        if expected is None or len(args) != expected:
+            raise click.BadParameter(
+                f"{spec!r}: expected fixed:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA"
+            )
+        return cls(kind, tuple(float(arg) for arg in args))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.args)
+        median, sigma = self.args
+        return rng.lognormvariate(math.log(median), sigma)
+
+
+@dataclass
+class Backend:
+    """Behaviour of the simulated model endpoints, shared by every fake client."""
+
+    image_latency: Latency
+    image_failure_rate: float
+    submit_latency: Latency
+    video_latency: Latency
+    video_failure_rate: float
+    png: bytes
+    clip: bytes
+    seed: int
+
+    def __post_init__(self) -> None:
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._operations: dict[str, tuple[float, bool]] = {}
+        self.calls = {"generate_content": 0, "generate_videos": 0, "operations.get": 0}
+        self.failures = {"generate_content": 0, "generate_videos": 0}
+
+    def draw(self, method: str, latency: Latency, failure_rate: float = 0.0) -> tuple[float, bool]:
+        """Counts a call and returns its latency and whether it fails."""
+        with self._lock:
+            self.calls[method] += 1
+            failed = self._rng.random() < failure_rate
+            if failed:
+                self.failures[method] += 1
+            return latency.sample(self._rng), failed
+
+    def submit_video(self) -> tuple[float, types.GenerateVideosOperation]:
+        """Counts a Veo submission; returns its latency and the new operation."""
+        submit_seconds, failed = self.draw("generate_videos", self.submit_latency, self.video_failure_rate)
+        with self._lock:
+            render_seconds = self.video_latency.sample(self._rng)
+            name = f"operations/benchmark-{self.calls['generate_videos']}"
+            self._operations[name] = (time.monotonic() + submit_seconds + render_seconds, failed)
+        return submit_seconds, types.GenerateVideosOperation(name=name, done=False)
+
+    def image_response(self) -> types.GenerateContentResponse:
+        # A tEXt chunk with a nonce makes every image distinct, as real
+        # generations are, without a decoder noticing.
+        with self._lock:
+            nonce = self._rng.getrandbits(64).to_bytes(8, "big")
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(
+                        role="model",
+                        parts=[types.Part.from_bytes(data=_with_text_chunk(self.png, nonce), mime_type="image/png")],
+                    )
+                )
+            ]
+        )
+
+    def refresh(self, operation: types.GenerateVideosOperation) -> types.GenerateVideosOperation:
+        with self._lock:
+            self.calls["operations.get"] += 1
+            ready_at, failed = self._operations[operation.name]
+        if time.monotonic() < ready_at:
+            return types.GenerateVideosOperation(name=operation.name, done=False)
+        if failed:
+            return types.GenerateVideosOperation(
+                name=operation.name, done=True, error={"code": 13, "message": "simulated failure"}
+            )
+        response = types.GenerateVideosResponse(
+            generated_videos=[types.GeneratedVideo(video=types.Video(video_bytes=self.clip, mime_type="video/mp4"))]
+        )
+        return types.GenerateVideosOperation(name=operation.name, done=True, response=response, result=response)
+
+
+class SimulatedError(ConnectionError):
+    """A transient failure injected by the simulated backend; counts as an outage."""
+
+
+class FakeModels:
+    def __init__(self, backend: Backend) -> None:
+        self._backend = backend
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        latency, failed = self._backend.draw(
+            "generate_content", self._backend.image_latency, self._backend.image_failure_rate
+        )
+        time.sleep(latency)
+        if failed:
+            raise SimulatedError("simulated image failure")
+        return self._backend.image_response()
+
+    def generate_videos(self, model: str, prompt: str, image: Any = None, config: Any = None) -> types.GenerateVideosOperation:
+        latency, operation = self._backend.submit_video()
+        time.sleep(latency)
+        return operation
+
+
+class FakeOperations:
+    def __init__(self, backend: Backend) -> None:
+        self._backend = backend
+
+    def get(self, operation: types.GenerateVideosOperation) -> types.GenerateVideosOperation:
+        return self._backend.refresh(operation)
+
+
+class FakeAsyncModels:
+    def __init__(self, backend: Backend) -> None:
+        self._backend = backend
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        latency, failed = self._backend.draw(
+            "generate_content", self._backend.image_latency, self._backend.image_failure_rate
+        )
+        await asyncio.sleep(latency)
+        if failed:
+            raise SimulatedError("simulated image failure")
+        return self._backend.image_response()
+
+    async def generate_videos(self, model: str, prompt: str, image: Any = None, config: Any = None) -> types.GenerateVideosOperation:
+        latency, operation = self._backend.submit_video()
+        await asyncio.sleep(latency)
+        return operation
+
+
+class FakeAsyncOperations:
+    def __init__(self, backend: Backend) -> None:
+        self._backend = backend
+
+    async def get(self, operation: types.GenerateVideosOperation) -> types.GenerateVideosOperation:
+        return self._backend.refresh(operation)
+
+
+class FakeClient:
+    """Stands in for genai.Client, with the sync and client.aio surfaces the pipeline uses."""
+
+    def __init__(self, backend: Backend) -> None:
+        self.models = FakeModels(backend)
+        self.operations = FakeOperations(backend)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(backend), operations=FakeAsyncOperations(backend))
+
+
+class Recorder:
+    """Collects histogram records in place of the OpenTelemetry instruments."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, amount: float, attributes: dict[str, Any]) -> None:
+        with self._lock:
+            self.samples.setdefault(attributes[telemetry.STAGE], []).append(amount)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {
+            stage: {
+                "count": len(samples),
+                "p50_seconds": round(_percentile(samples, 0.50), 3),
+                "p95_seconds": round(_percentile(samples, 0.95), 3),
+                "p99_seconds": round(_percentile(samples, 0.99), 3),
+                "max_seconds": round(max(samples), 3),
+            }
+            for stage, samples in sorted(self.samples.items())
+        }
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def _with_text_chunk(png: bytes, text: bytes) -> bytes:
+    chunk_type = b"tEXt"
+    data = b"nonce\x00" + text.hex().encode()
+    chunk = len(data).to_bytes(4, "big") + chunk_type + data + zlib.crc32(chunk_type + data).to_bytes(4, "big")
+    # Insert right after the IHDR chunk (8-byte signature + 25-byte IHDR).
+    return png[:33] + chunk + png[33:]
+
+
+async def make_media(work_dir: str, clip_seconds: float) -> tuple[bytes, bytes]:
+    """Renders the synthetic PNG and Veo clip every fake response reuses."""
+    png_path = os.path.join(work_dir, "synthetic.png")
+    clip_path = os.path.join(work_dir, "synthetic.mp4")
+    await asyncio.gather(
+        run_ffmpeg(
+            [
+                FFMPEG, "-v", "error", "-y",
+                "-f", "lavfi", "-i", "testsrc2=size=1024x1024",
+                "-frames:v", "1",
+                png_path,
+            ]
+        ),
+        run_ffmpeg(
+            [
+                FFMPEG, "-v", "error", "-y",
+                "-f", "lavfi", "-i", f"testsrc=size=1920x1080:rate=24:duration={clip_seconds}",
+                "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={clip_seconds}",
+                "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-shortest",
+                clip_path,
+            ]
+        ),
+    )
+    with open(png_path, "rb") as f:
+        png = f.read()
+    with open(clip_path, "rb") as f:
+        clip = f.read()
+    return png, clip
+
+
+def make_story(scenes: int):
+    """Returns a create_story replacement that tells a story of scenes scenes."""
+
+    def create_story(family_history: dict) -> dict:
+        records = family_history["records"]
+        story = [
+            {
+                "scene_number": 1,
+                "description": f"Narrator: Meet {records[0]['name']} and {records[1]['name']}.",
+            }
+        ]
+        for number in range(2, scenes + 1):
+            person = records[number % 2]
+            story.append(
+                {
+                    "scene_number": number,
+                    "description": f"Narrator: Chapter {number} in the life of {person['name']} of {person['birth_place']}.",
+                }
+            )
+        return {"scenes": story}
+
+    return create_story
+
+
+def make_characters(work_dir: str, png: bytes) -> dict:
+    characters = []
+    for name, birth_place in (("John Doe", "Springfield"), ("Jane Doe", "Shelbyville")):
+        path = os.path.join(work_dir, f"{name.lower().replace(' ', '_')}.png")
+        with open(path, "wb") as f:
+            f.write(png)
+        characters.append({"name": name, "birth_place": birth_place, "image_url": f"file://{path}"})
+    return {"characters": characters}
+
+
+@contextlib.contextmanager
+def simulated(
+    backend: Backend, work_dir: str, scenes: int, throttled: bool, hedging: HedgePolicy | None = None, image_cache: bool = True
+) -> Iterator[tuple[Recorder, Recorder]]:
+    """Points the pipeline at the fake backend and a scratch directory."""
+    characters = make_characters(work_dir, backend.png)
+    stages, scene_steps = Recorder(), Recorder()
+
+    async def get_character_images_async(family_name: str) -> dict:
+        return characters
+
+    patches = [
+        mock.patch.object(clients, "_factory", lambda **_: FakeClient(backend)),
+        mock.patch.object(agent, "get_character_images", lambda family_name: characters),
+        mock.patch.object(agent, "get_character_images_async", get_character_images_async),
+        mock.patch.object(agent, "create_story", make_story(scenes)),
+        mock.patch("agents.utils.workspace.WORKSPACES_DIR", os.path.join(work_dir, "workspaces")),
+        mock.patch("agents.utils.manifest.RUNS_DIR", os.path.join(work_dir, "runs")),
+        # A zero quota evicts every image as soon as it is written.
+        mock.patch.object(image_agent, "image_cache", ContentCache(os.path.join(work_dir, "cache", "images"), image_agent.IMAGE_CACHE_MAX_BYTES if image_cache else 0)),
+        mock.patch.object(references, "reference_cache", ContentCache(os.path.join(work_dir, "cache", "references"), references.REFERENCE_CACHE_MAX_BYTES)),
+        mock.patch.object(video_agent, "clip_cache", ContentCache(os.path.join(work_dir, "cache", "videos"), video_agent.CLIP_CACHE_MAX_BYTES)),
+        mock.patch.object(image_agent, "image_hedging", hedging),
+        mock.patch.object(image_agent, "circuit_breakers", CircuitBreakers()),
+        mock.patch.object(telemetry, "stage_duration", stages),
+        mock.patch.object(telemetry, "scene_duration", scene_steps),
+    ]
+    with contextlib.ExitStack() as stack:
+        clients.clear()
+        stack.callback(clients.clear)
+        for patch in patches:
+            stack.enter_context(patch)
+        for bucket in (image_agent.IMAGE_BUCKET, video_agent.VEO_BUCKET, video_agent.VEO_POLL_BUCKET):
+            limits = rate_limiter.bucket(bucket)
+            stack.callback(rate_limiter.configure, bucket, limits.rpm, limits.concurrency, limits.burst)
+            concurrency = limits.concurrency
+            if bucket == image_agent.IMAGE_BUCKET and concurrency is not None:
+                # Match the headroom image_agent leaves when hedging is enabled.
+                concurrency = image_agent.MAX_IMAGE_WORKERS + (hedging.max_in_flight if hedging else 0)
+            if throttled:
+                rate_limiter.configure(bucket, limits.rpm, concurrency, limits.burst)
+            else:
+                rate_limiter.configure(bucket, UNTHROTTLED_RPM, concurrency, UNTHROTTLED_RPM)
+        yield stages, scene_steps
+
+
+def run_path(path: str, families: list[str], output_mode: str, max_families: int, work_dir: str) -> list[dict]:
+    """Runs families through one entry point; returns per-family outcomes."""
+    if path == "batch":
+        summary = batch.run_batch(
+            families, os.path.join(work_dir, "summary.json"), max_families=max_families, incremental=False, output_mode=output_mode
+        )
+        return [{"family_name": r["family_name"], "status": r["status"], "seconds": r["seconds"]} for r in summary["families"]]
+
+    results = []
+    for family_name in families:
+        start = time.monotonic()
+        try:
+            if path == "async":
+                video_path = asyncio.run(agent.generate_family_story_video_async(family_name, incremental=False, output_mode=output_mode))
+            else:
+                video_path = agent.generate_family_story_video(family_name, incremental=False, output_mode=output_mode)
+            status = "succeeded" if video_path else "failed"
+        except Exception as e:
+            print(f"Video generation failed for the {family_name} family: {e}", file=sys.stderr)
+            status = "failed"
+        results.append({"family_name": family_name, "status": status, "seconds": round(time.monotonic() - start, 3)})
+    return results
+
+
+def peak_rss_bytes(who: int) -> int:
+    max_rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def benchmark(
+    path: str,
+    families: int,
+    scenes: int,
+    max_families: int,
+    output_mode: str,
+    backend: Backend,
+    transition_seconds: float,
+    throttled: bool,
+    hedging: HedgePolicy | None,
+    image_cache: bool,
+    work_dir: str,
+) -> dict[str, Any]:
+    """Runs one workload against backend and returns its report."""
+    family_names = [f"Benchmark {i + 1}" for i in range(families)]
+    os.makedirs(work_dir, exist_ok=True)
+    with simulated(backend, work_dir, scenes, throttled, hedging, image_cache) as (stages, scene_steps), \
+            mock.patch.object(video_agent, "TRANSITION_SECONDS", transition_seconds), \
+            contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        results = run_path(path, family_names, output_mode, max_families, work_dir)
+        wall_seconds = time.perf_counter() - start
+        image_cache_stats = image_agent.image_cache.stats()
+
+    return {
+        "path": path,
+        "families": families,
+        "scenes": scenes,
+        "output_mode": output_mode,
+        "wall_seconds": round(wall_seconds, 3),
+        "succeeded": sum(result["status"] == "succeeded" for result in results),
+        "failed": sum(result["status"] != "succeeded" for result in results),
+        "family_seconds": [result["seconds"] for result in results],
+        "stages": stages.summary(),
+        "scene_steps": scene_steps.summary(),
+        "model_calls": backend.calls,
+        "injected_failures": backend.failures,
+        "image_cache": image_cache_stats,
+        "hedging": hedging.stats() if hedging is not None else None,
+        "peak_rss_bytes": peak_rss_bytes(resource.RUSAGE_SELF),
+        "peak_child_rss_bytes": peak_rss_bytes(resource.RUSAGE_CHILDREN),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+@click.command()
+@click.option("--path", "path", type=click.Choice(PATHS), default="batch", help="Entry point to drive")
+@click.option("--families", default=2, help="Number of families (M)")
+@click.option("--scenes", default=4, help="Scenes per family (N)")
+@click.option("--max-families", default=batch.MAX_CONCURRENT_FAMILIES, help="Concurrent families on the batch path")
+@click.option("--output-mode", type=click.Choice(video_agent.OUTPUT_MODES), default="mp4")
+@click.option("--image-latency", default="lognormal:0.8:0.4", callback=lambda _, __, v: Latency.parse(v), help="Image generation latency")
+@click.option("--image-failure-rate", default=0.0, help="Fraction of image requests that fail")
+@click.option("--submit-latency", default="fixed:0.2", callback=lambda _, __, v: Latency.parse(v), help="Veo submission latency")
+@click.option("--video-latency", default="lognormal:6:0.3", callback=lambda _, __, v: Latency.parse(v), help="Veo render time")
+@click.option("--video-failure-rate", default=0.0, help="Fraction of Veo operations that fail")
+@click.option("--clip-seconds", default=8.0, help="Length of the synthetic Veo clip")
+@click.option("--transition-seconds", default=video_agent.TRANSITION_SECONDS, help="Crossfade length; 0 joins scenes with hard cuts")
+@click.option("--throttled/--unthrottled", default=False, help="Keep the production model rate limits")
+@click.option("--hedging", type=click.Choice(HEDGING_MODES), default="off", help="Hedge image requests, or compare runs without and with hedging")
+@click.option("--image-cache/--no-image-cache", default=None, help="Serve repeated image requests from the cache; off by default with --hedging compare")
+@click.option("--hedge-percentile", default=90.0, help="Latency percentile after which an image request is duplicated")
+@click.option("--hedge-budget", default=0.1, help="Duplicate requests allowed, as a fraction of image requests")
+@click.option("--hedge-min-samples", default=5, help="Image latencies observed before hedging starts")
+@click.option("--seed", default=0, help="Seed for latencies and injected failures")
+@click.option("--output", default=None, help="Also write the report to this JSON file")
+def main(
+    path: str,
+    families: int,
+    scenes: int,
+    max_families: int,
+    output_mode: str,
+    image_latency: Latency,
+    image_failure_rate: float,
+    submit_latency: Latency,
+    video_latency: Latency,
+    video_failure_rate: float,
+    clip_seconds: float,
+    transition_seconds: float,
+    throttled: bool,
+    hedging: str,
+    image_cache: bool | None,
+    hedge_percentile: float,
+    hedge_budget: float,
+    hedge_min_samples: int,
+    seed: int,
+    output: str | None,
+) -> None:
+    modes = {"off": [False], "on": [True], "compare": [False, True]}[hedging]
+    if image_cache is None:
+        image_cache = hedging != "compare"
+    reports = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        png, clip = asyncio.run(make_media(work_dir, clip_seconds))
+        for hedged in modes:
+            # Every run starts cold, with its own caches, and draws the same
+            # sequence of latencies and failures from the seed.
+            backend = Backend(
+                image_latency, image_failure_rate, submit_latency, video_latency, video_failure_rate, png, clip, seed
+            )
+            policy = HedgePolicy(hedge_percentile, hedge_budget, hedge_min_samples) if hedged else None
+            run_dir = os.path.join(work_dir, "hedged" if hedged else "baseline")
+            reports[hedged] = benchmark(
+                path, families, scenes, max_families, output_mode, backend, transition_seconds, throttled, policy, image_cache, run_dir
+            )
+
+    if hedging != "compare":
+        report = reports[hedging == "on"]
+    else:
+        baseline_p99 = reports[False]["scene_steps"]["create_images"]["p99_seconds"]
+        hedged_p99 = reports[True]["scene_steps"]["create_images"]["p99_seconds"]
+        report = {
+            "baseline": reports[False],
+            "hedged": reports[True],
+            "image_p99_seconds": {"baseline": baseline_p99, "hedged": hedged_p99},
+            "image_p99_change": round(hedged_p99 / baseline_p99 - 1, 3) if baseline_p99 else None,
+        }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
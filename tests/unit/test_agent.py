@@ -0,0 +1,109 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import shutil
+from pathlib import Path
+
+import pytest
+
+import agents.agent as agent
+import agents.video_agent as video_agent
+from agents.utils.stitching import Rendition, probe_clip
+from tests.load_test.pipeline_benchmark import Backend, Latency, make_media, simulated
+
+SCENES = 4
+CLIP_SECONDS = 1.0
+
+
+@pytest.fixture
+def backend(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Backend:
+    """A fast, failure-free simulated backend; scenes are joined with hard cuts."""
+    monkeypatch.setattr(video_agent, "TRANSITION_SECONDS", 0)
+    png, clip = asyncio.run(make_media(str(tmp_path), CLIP_SECONDS))
+    instant = Latency("fixed", (0.0,))
+    return Backend(instant, 0.0, instant, instant, 0.0, png, clip, seed=0)
+
+
+@pytest.mark.parametrize("path", ["sync", "async"])
+def test_incremental_run_keeps_every_reused_scene(tmp_path: Path, backend: Backend, path: str) -> None:
+    """A second incremental run reuses every scene and still renders all of them."""
+
+    def run() -> str:
+        if path == "async":
+            return asyncio.run(agent.generate_family_story_video_async("Doe", incremental=True))
+        return agent.generate_family_story_video("Doe", incremental=True)
+
+    with simulated(backend, str(tmp_path), SCENES, throttled=False):
+        first = run()
+        calls = dict(backend.calls)
+        second = run()
+        # Reused scenes must not depend on the workspace they came from.
+        shutil.rmtree(Path(first).parents[1])
+        third = run()
+
+    assert len({first, second, third}) == 3
+    assert backend.calls["generate_content"] == calls["generate_content"]
+    assert backend.calls["generate_videos"] == calls["generate_videos"]
+    for video_path in (second, third):
+        duration = asyncio.run(probe_clip(video_path)).duration
+        assert duration == pytest.approx(SCENES * CLIP_SECONDS, abs=0.2)
+
+
+def run_family(path: str, run_id: str | None = None) -> str:
+    if path == "async":
+        return asyncio.run(agent.generate_family_story_video_async("Doe", run_id=run_id, incremental=True))
+    return agent.generate_family_story_video("Doe", run_id=run_id, incremental=True)
+
+
+@pytest.mark.parametrize("path", ["sync", "async"])
+def test_resumed_run_reuses_its_clips_without_the_clip_cache(tmp_path: Path, backend: Backend, path: str) -> None:
+    """A completed run's checkpointed clips outlive the stitch, so resuming it submits nothing to Veo."""
+    with simulated(backend, str(tmp_path), SCENES, throttled=False):
+        first = run_family(path)
+        submitted = backend.calls["generate_videos"]
+        shutil.rmtree(tmp_path / "cache" / "videos")
+        resumed = run_family(path, Path(first).parents[1].name)
+
+    assert backend.calls["generate_videos"] == submitted
+    assert resumed == first
+    duration = asyncio.run(probe_clip(resumed)).duration
+    assert duration == pytest.approx(SCENES * CLIP_SECONDS, abs=0.2)
+
+
+@pytest.mark.parametrize("path", ["sync", "async"])
+def test_incremental_run_adopts_clips_without_the_clip_cache(tmp_path: Path, backend: Backend, path: str) -> None:
+    """Unchanged scenes are linked from the base run's workspace rather than rendered again."""
+    with simulated(backend, str(tmp_path), SCENES, throttled=False):
+        first = run_family(path)
+        submitted = backend.calls["generate_videos"]
+        shutil.rmtree(tmp_path / "cache" / "videos")
+        rebuilt = run_family(path)
+
+    assert backend.calls["generate_videos"] == submitted
+    assert Path(rebuilt).parents[1] != Path(first).parents[1]
+    for n in range(1, SCENES + 1):
+        assert (Path(rebuilt).parent / f"scene_{n}.mp4").exists()
+    duration = asyncio.run(probe_clip(rebuilt)).duration
+    assert duration == pytest.approx(SCENES * CLIP_SECONDS, abs=0.2)
+
+
+def test_run_encodes_the_requested_ladder(tmp_path: Path, backend: Backend) -> None:
+    """The stitch stage encodes the ladder it is given, and a different ladder re-runs it."""
+    ladder = (Rendition("240p", 240, "300k", "64k"),)
+    with simulated(backend, str(tmp_path), SCENES, throttled=False):
+        plain = agent.generate_family_story_video("Doe")
+        video_path = agent.generate_family_story_video("Doe", run_id=Path(plain).parents[1].name, ladder=ladder)
+
+    rendition = Path(video_path).parent / "final_video_240p.mp4"
+    assert asyncio.run(probe_clip(str(rendition))).video["height"] == 240
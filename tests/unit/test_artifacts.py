@@ -0,0 +1,72 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+from pathlib import Path
+
+from agents.utils.artifacts import ArtifactStore, sniff_mime_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 56
+JPEG = b"\xff\xd8\xff\xe0" + b"\1" * 60
+
+
+def test_sniff_mime_type() -> None:
+    assert sniff_mime_type(PNG) == "image/png"
+    assert sniff_mime_type(JPEG) == "image/jpeg"
+    assert sniff_mime_type(b"RIFF\0\0\0\0WEBPVP8 ") == "image/webp"
+    assert sniff_mime_type(b"Placeholder: Image generation failed.") == "application/octet-stream"
+
+
+def test_load_reads_each_file_once(tmp_path: Path) -> None:
+    """Repeated loads are served from memory until the file changes."""
+    path = tmp_path / "reference.jpg"
+    path.write_bytes(JPEG)
+    store = ArtifactStore()
+
+    handle = store.load(str(path))
+    assert store.load(str(path)) == handle
+    assert store.part(handle).inline_data.mime_type == "image/jpeg"
+    assert store.stats()["disk_reads"] == 1
+
+    path.write_bytes(PNG)
+    os.utime(path, ns=(0, 0))
+    changed = store.load(str(path))
+    assert changed != handle
+    assert store.image(changed, str(path)).mime_type == "image/png"
+    assert store.stats()["disk_reads"] == 2
+
+
+def test_put_spills_above_memory_budget(tmp_path: Path) -> None:
+    """Past the budget, artifacts without a file are spilled and read back."""
+    store = ArtifactStore(str(tmp_path / "spill"), max_memory_bytes=len(PNG))
+
+    kept = store.put(PNG)
+    spilled = store.put(JPEG)
+
+    assert store.stats() == {"artifacts": 2, "memory_bytes": len(PNG), "spilled": 1, "disk_reads": 0}
+    assert os.listdir(tmp_path / "spill") == [spilled]
+    assert store.get(kept) == PNG
+    assert store.get(spilled) == JPEG
+    assert store.put(JPEG) == spilled
+
+
+def test_image_falls_back_to_path_for_unknown_handles(tmp_path: Path) -> None:
+    """Handles recorded by an earlier run are resolved by reading the file."""
+    path = tmp_path / "scene_2_start.png"
+    path.write_bytes(PNG)
+    store = ArtifactStore()
+
+    image = store.image("0" * 64, str(path))
+
+    assert image.image_bytes == PNG
+    assert store.stats()["disk_reads"] == 1
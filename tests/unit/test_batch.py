@@ -0,0 +1,32 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from pathlib import Path
+
+import pytest
+
+from agents.batch import read_family_names
+
+
+def test_read_family_names_accepts_json_lines_and_plain_names(tmp_path: Path) -> None:
+    """Objects, JSON strings and bare names are read in order, once each."""
+    path = tmp_path / "families.jsonl"
+    path.write_text('{"family_name": "Doe"}\n"Smith"\n\nO\'Brien\n{"family_name": "Doe"}\n')
+    assert read_family_names(str(path)) == ["Doe", "Smith", "O'Brien"]
+
+
+def test_read_family_names_rejects_entries_without_a_name(tmp_path: Path) -> None:
+    path = tmp_path / "families.jsonl"
+    path.write_text('{"request_id": "user-001"}\n')
+    with pytest.raises(ValueError, match=r"families\.jsonl:1"):
+        read_family_names(str(path))
@@ -0,0 +1,53 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+from pathlib import Path
+
+from agents.utils.cache import ContentCache, cache_key
+
+
+def test_cache_key_is_unambiguous() -> None:
+    """Parts are length-prefixed, so different splits give different keys."""
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+    assert cache_key("a", b"b") == cache_key("a", "b")
+
+
+def test_cache_counts_hits_and_misses(tmp_path: Path) -> None:
+    """A stored entry is returned and counted as a hit."""
+    cache = ContentCache(str(tmp_path), max_bytes=1024)
+    key = cache_key("prompt")
+    assert cache.get(key) is None
+    cache.put(key, b"png")
+    assert cache.get(key) == b"png"
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Going over quota removes the entry that was read least recently."""
+    cache = ContentCache(str(tmp_path), max_bytes=10)
+    old, recent, new = cache_key("old"), cache_key("recent"), cache_key("new")
+    cache.put(old, b"x" * 4)
+    cache.put(recent, b"x" * 4)
+    past = time.time() - 60
+    os.utime(cache.path_for(old), (past, past))
+    os.utime(cache.path_for(recent), (past + 1, past + 1))
+    assert cache.get(recent) is not None
+
+    cache.put(new, b"x" * 4)
+
+    assert cache.get(old) is None
+    assert cache.get(recent) is not None
+    assert cache.get(new) is not None
@@ -0,0 +1,61 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from agents.utils.clients import ClientRegistry
+
+
+def test_registry_creates_one_client_per_key_across_threads() -> None:
+    """Concurrent first uses of a key share a single client."""
+    created: list[dict[str, Any]] = []
+
+    def factory(**kwargs: Any) -> object:
+        created.append(kwargs)
+        return object()
+
+    registry = ClientRegistry(factory)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: registry.get("project", "global"), range(32)))
+
+    assert len({id(client) for client in clients}) == 1
+    assert registry.get("project", "us-central1") is not clients[0]
+    assert created == [
+        {"vertexai": True, "project": "project", "location": "global"},
+        {"vertexai": True, "project": "project", "location": "us-central1"},
+    ]
+
+
+def test_warm_up_survives_failing_probes() -> None:
+    def probe(client: object) -> None:
+        raise ConnectionError("offline")
+
+    registry = ClientRegistry(lambda **kwargs: object())
+    timings = registry.warm_up([("project", "global", True)], probe)
+    assert list(timings) == [("project", "global", True)]
+
+
+def test_get_async_keeps_one_client_per_event_loop() -> None:
+    """The async surface is bound to a loop, so each loop gets its own client."""
+    registry = ClientRegistry(lambda **kwargs: object())
+
+    async def fetch() -> list[object]:
+        return list(await asyncio.gather(*(registry.get_async("project", "global") for _ in range(4))))
+
+    first, second = asyncio.run(fetch()), asyncio.run(fetch())
+
+    assert len({id(client) for client in first}) == 1
+    assert second[0] is not first[0]
+    assert registry.get("project", "global") not in (first[0], second[0])
@@ -0,0 +1,37 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import sys
+
+import pytest
+
+from agents.utils.ffmpeg import FFmpegError, FFmpegProgress, run_ffmpeg
+
+
+def test_progress_parses_ffmpeg_fields() -> None:
+    """A -progress block is converted into typed fields."""
+    progress = FFmpegProgress.from_fields(
+        {"frame": "48", "fps": "23.5", "out_time_us": "2000000", "speed": " 1.9x", "progress": "end"}
+    )
+    assert progress.frame == 48
+    assert progress.out_time_seconds == 2.0
+    assert progress.speed == "1.9x"
+    assert progress.done
+
+
+def test_run_ffmpeg_kills_jobs_past_their_deadline() -> None:
+    """A job that outlives its timeout is killed and reported as failed."""
+    argv = [sys.executable, "-c", "import time; time.sleep(30)"]
+    with pytest.raises(FFmpegError, match="timed out"):
+        asyncio.run(run_ffmpeg(argv, timeout=0.5, encode=False))
@@ -0,0 +1,127 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.utils.hedging import HedgePolicy, hedged, hedged_async
+
+
+def learned_policy(max_extra_fraction: float = 1.0) -> HedgePolicy:
+    policy = HedgePolicy(percentile=50, max_extra_fraction=max_extra_fraction, min_samples=1, min_delay_seconds=0.0)
+    policy.record(0.05)
+    return policy
+
+
+def test_hedged_async_takes_the_first_result_and_cancels_the_other() -> None:
+    """A call slower than the learned percentile is duplicated; the duplicate wins."""
+    policy = learned_policy()
+    cancelled = []
+
+    async def attempt() -> str:
+        if not cancelled:
+            cancelled.append(False)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled[0] = True
+                raise
+            return "slow"
+        return "fast"
+
+    assert asyncio.run(hedged_async(policy, attempt)) == "fast"
+    assert cancelled == [True]
+    assert policy.stats()["hedges"] == 1
+    assert policy.stats()["hedge_wins"] == 1
+
+
+def test_hedged_respects_the_budget() -> None:
+    """With the budget spent, slow calls are simply waited for."""
+    policy = learned_policy(max_extra_fraction=0.0)
+    calls = []
+
+    def attempt() -> int:
+        calls.append(threading.current_thread().name)
+        threading.Event().wait(0.2)
+        return len(calls)
+
+    assert hedged(policy, attempt) == 1
+    assert len(calls) == 1
+    assert policy.stats() == {"calls": 1, "hedges": 0, "hedge_wins": 0, "delay_seconds": 0.05}
+
+
+def test_hedged_waits_for_the_other_attempt_after_a_failure() -> None:
+    """A failed attempt does not fail the call while the other may still succeed."""
+    policy = learned_policy()
+    duplicate_started = threading.Event()
+    calls = []
+
+    def attempt() -> str:
+        calls.append(None)
+        if len(calls) == 1:
+            duplicate_started.wait(5)
+            raise RuntimeError("primary failed")
+        duplicate_started.set()
+        threading.Event().wait(0.2)
+        return "duplicate"
+
+    assert hedged(policy, attempt) == "duplicate"
+
+
+def test_hedged_counts_the_losing_attempt_until_it_finishes() -> None:
+    """A loser that cannot be interrupted still holds one of max_in_flight."""
+    policy = HedgePolicy(percentile=50, max_extra_fraction=1.0, min_samples=1, min_delay_seconds=0.0, max_in_flight=1)
+    policy.record(0.05)
+    release = threading.Event()
+    calls = []
+
+    def attempt() -> str:
+        calls.append(None)
+        if len(calls) == 1:
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    assert hedged(policy, attempt) == "fast"
+    policy.start_call()
+    assert not policy.try_hedge()
+    release.set()
+    deadline = time.monotonic() + 5
+    while not policy.try_hedge() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert policy.stats()["hedges"] == 2
+
+
+def test_from_environment_builds_the_configured_policy(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    """Unknown settings are reported and dropped; the rest configure the policy."""
+    monkeypatch.setenv("IMAGE_HEDGING", '{"percentile": 90, "min_samples": 5, "bogus": 1}')
+    policy = HedgePolicy.from_environment("IMAGE_HEDGING")
+
+    assert policy is not None
+    assert (policy.percentile, policy.min_samples) == (90, 5)
+    assert "['bogus']" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["p95", "[90]", '{"percentile": 150}', '{"percentile": "high"}', '{"max_extra_fraction": 2}', '{"min_samples": 0}', '{"window": 1.5}', '{"max_in_flight": true}'],
+)
+def test_from_environment_leaves_hedging_off_for_invalid_settings(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], value: str
+) -> None:
+    monkeypatch.setenv("IMAGE_HEDGING", value)
+    assert HedgePolicy.from_environment("IMAGE_HEDGING") is None
+    assert "Ignoring IMAGE_HEDGING" in capsys.readouterr().out
@@ -0,0 +1,186 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from google.genai import types
+
+import agents.image_agent as image_agent
+import agents.utils.references as references
+from agents.utils.artifacts import ArtifactStore
+from agents.utils.cache import ContentCache
+from agents.utils.ffmpeg import FFMPEG
+from agents.utils.manifest import RunManifest
+from agents.utils.ratelimit import RateLimiter
+from agents.utils.retry import CircuitBreakers
+
+SCRIPT = {
+    "script": [
+        {"scene_number": 1, "description": "Narrator: John meets Jane."},
+        {"scene_number": 2, "description": "Narrator: John walks alone."},
+        {"scene_number": 3, "description": "Narrator: Jane and John dance."},
+    ]
+}
+
+
+class FakeImageModel:
+    """Answers every image request with the same PNG, recording the prompts."""
+
+    def __init__(self, png: bytes, latency: float = 0.0) -> None:
+        self.png = png
+        self.latency = latency
+        self.prompts: list[str] = []
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+        self.client = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self.generate_content),
+            aio=SimpleNamespace(models=SimpleNamespace(generate_content=self.generate_content_async)),
+        )
+
+    def generate_content(self, model: str, contents: list, config: Any) -> types.GenerateContentResponse:
+        with self._lock:
+            self.prompts.append(contents[-1])
+        part = types.Part.from_bytes(data=self.png, mime_type="image/png")
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))])
+
+    async def generate_content_async(self, model: str, contents: list, config: Any) -> types.GenerateContentResponse:
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            return self.generate_content(model, contents, config)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def png(tmp_path: Path) -> bytes:
+    path = tmp_path / "generated.png"
+    subprocess.run([FFMPEG, "-v", "error", "-f", "lavfi", "-i", "color=c=blue:s=320x320", "-frames:v", "1", str(path)], check=True)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def character_images(tmp_path: Path, png: bytes) -> dict:
+    characters = []
+    for name in ("John", "Jane"):
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(png)
+        characters.append({"name": name, "image_url": f"file://{path}"})
+    return {"characters": characters}
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Runs without rate limits, into private caches and circuit breakers."""
+    limiter = RateLimiter()
+    limiter.configure(image_agent.IMAGE_BUCKET, rpm=1e6, burst=100)
+    monkeypatch.setattr(image_agent, "rate_limiter", limiter)
+    monkeypatch.setattr(image_agent, "image_cache", ContentCache(str(tmp_path / "images-cache"), 1 << 24))
+    monkeypatch.setattr(image_agent, "circuit_breakers", CircuitBreakers())
+    monkeypatch.setattr(image_agent, "image_hedging", None)
+    monkeypatch.setattr(references, "reference_cache", ContentCache(str(tmp_path / "references"), 1 << 24))
+
+
+def urlpath(character_images: dict, index: int) -> str:
+    return character_images["characters"][index]["image_url"].removeprefix("file://")
+
+
+def test_submit_scene_images_queues_start_images_first(tmp_path: Path, png: bytes, character_images: dict) -> None:
+    """Entries come back in scene order, with every start image requested before any ending image."""
+    model = FakeImageModel(png)
+    artifacts = ArtifactStore()
+    images_dir = str(tmp_path / "images")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futures, _ = image_agent.submit_scene_images(model.client, SCRIPT, character_images, images_dir, executor, artifacts=artifacts)
+    entries = [future.result() for future in futures]
+
+    assert [entry["scene_number"] for entry in entries] == [1, 2, 3]
+    assert entries[0]["start_image_path"] == urlpath(character_images, 0)
+    assert entries[2]["end_image_path"] == os.path.join(images_dir, "scene_3_end.png")
+    assert artifacts.get(entries[2]["end_image"]) == png
+    assert [prompt.split(":")[0] for prompt in model.prompts] == ["Before the action"] * 2 + ["After the action"] * 2
+
+
+def test_submit_scene_images_returns_the_jobs_writing_ending_images(tmp_path: Path, png: bytes, character_images: dict) -> None:
+    """Once the returned jobs are done, every ending image is written and checkpointed, even on a shared executor."""
+    model = FakeImageModel(png, latency=0.05)
+    manifest = RunManifest.create("Doe", runs_dir=str(tmp_path / "runs"))
+    images_dir = tmp_path / "images"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures, pending = image_agent.submit_scene_images(model.client, SCRIPT, character_images, str(images_dir), executor, manifest=manifest)
+        wait(futures)
+        wait(pending)
+        written = sorted(path.name for path in images_dir.glob("*_end.png"))
+        recorded = [manifest.scene("create_images", n, manifest.data["scenes"]["create_images"][str(n)]["inputs_hash"]) for n in (2, 3)]
+
+    assert written == ["scene_2_end.png", "scene_3_end.png"]
+    assert all(record is not None for record in recorded)
+
+
+def test_cancelled_start_images_cancel_their_scenes(tmp_path: Path, png: bytes, character_images: dict) -> None:
+    """Cancelling a queued start image job, as a failed run does, cancels its scene rather than leaving it pending."""
+    model = FakeImageModel(png)
+    blocker = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(blocker.wait)
+        futures, pending = image_agent.submit_scene_images(model.client, SCRIPT, character_images, str(tmp_path / "images"), executor)
+        for future in pending:
+            future.cancel()
+        blocker.set()
+
+    assert futures[0].result()["scene_number"] == 1
+    assert all(future.cancelled() for future in futures[1:])
+
+
+def test_submit_scene_images_serves_repeated_requests_from_the_image_cache(tmp_path: Path, png: bytes, character_images: dict) -> None:
+    model = FakeImageModel(png)
+    for run in ("first", "second"):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            image_agent.submit_scene_images(model.client, SCRIPT, character_images, str(tmp_path / run), executor)
+
+    assert len(model.prompts) == 4
+    assert (tmp_path / "second" / "scene_2_start.png").read_bytes() == png
+
+
+def test_scene_image_tasks_caps_requests_in_flight(tmp_path: Path, png: bytes, character_images: dict) -> None:
+    """No more than max_workers image requests run at once."""
+    model = FakeImageModel(png, latency=0.05)
+    script = {"script": [{"scene_number": n, "description": f"John in room {n}"} for n in range(1, 7)]}
+
+    async def run() -> list[dict]:
+        scene_tasks, pending = await image_agent.scene_image_tasks(
+            model.client, script, character_images, str(tmp_path / "images"), max_workers=2
+        )
+        entries = await asyncio.gather(*scene_tasks)
+        await asyncio.gather(*pending)
+        return entries
+
+    entries = asyncio.run(run())
+
+    assert [entry["scene_number"] for entry in entries] == list(range(1, 7))
+    assert len(model.prompts) == 10
+    assert model.peak_active == 2
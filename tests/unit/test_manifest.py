@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+
+from agents.utils.manifest import RunManifest, hash_inputs
+
+
+def test_run_stage_skips_completed_stages_on_resume(tmp_path: Path) -> None:
+    """A resumed run reuses stage outputs recorded with the same inputs."""
+    calls = []
+
+    def stage(value: int) -> dict:
+        calls.append(value)
+        return {"value": value}
+
+    manifest = RunManifest.create("Doe", runs_dir=str(tmp_path))
+    assert manifest.run_stage("stage", [1], stage, 1) == {"value": 1}
+
+    resumed = RunManifest.load(manifest.run_id, runs_dir=str(tmp_path))
+    assert resumed.family_name == "Doe"
+    assert resumed.run_stage("stage", [1], stage, 1) == {"value": 1}
+    assert resumed.run_stage("stage", [2], stage, 2) == {"value": 2}
+    assert calls == [1, 2]
+
+
+def test_scene_checkpoint_requires_unchanged_files(tmp_path: Path) -> None:
+    """A scene record is invalidated when one of its files changes."""
+    clip = tmp_path / "scene_1.mp4"
+    clip.write_bytes(b"clip")
+    manifest = RunManifest.create("Doe", runs_dir=str(tmp_path))
+    inputs_hash = hash_inputs("prompt")
+    manifest.record_scene("create_video", 1, inputs_hash, {"clip_path": str(clip)}, files=[str(clip)])
+
+    assert manifest.scene("create_video", 1, inputs_hash) == {"clip_path": str(clip)}
+    assert manifest.scene("create_video", 1, hash_inputs("other")) is None
+    clip.write_bytes(b"overwritten")
+    assert manifest.scene("create_video", 1, inputs_hash) is None
+
+
+def test_incremental_run_reuses_unchanged_scenes(tmp_path: Path) -> None:
+    """A run based on an earlier one only rebuilds scenes whose inputs changed."""
+    first = RunManifest.create("Doe", runs_dir=str(tmp_path))
+    first.record_scene("create_images", 2, hash_inputs("scene 2"), {"scene_number": 2})
+    first.record_scene("create_images", 3, hash_inputs("scene 3"), {"scene_number": 3})
+
+    base = RunManifest.latest("Doe", runs_dir=str(tmp_path))
+    assert base is not None and base.run_id == first.run_id
+    second = RunManifest.create("Doe", runs_dir=str(tmp_path), base=base)
+
+    assert second.scene("create_images", 2, hash_inputs("scene 2")) is not None
+    assert second.scene("create_images", 3, hash_inputs("edited scene 3")) is None
+    second.note_scene("create_images", 2, reused=True, model_calls=2)
+    second.note_scene("create_images", 3, reused=False, model_calls=2)
+    assert second.build_report() == {
+        "scenes_rebuilt": 1,
+        "scenes_reused": 1,
+        "model_calls": 2,
+        "model_calls_saved": 2,
+    }
@@ -0,0 +1,77 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import pytest
+
+from agents.utils.operations import OperationPoller, poll_operation
+
+
+class FakeOperation:
+    def __init__(self, name: str, polls_until_done: int) -> None:
+        self.name = name
+        self.remaining = polls_until_done
+        self.done = False
+
+
+def refresh(operation: FakeOperation) -> FakeOperation:
+    operation.remaining -= 1
+    operation.done = operation.remaining <= 0
+    return operation
+
+
+def test_poller_resolves_operations_as_they_finish() -> None:
+    """The fastest operation resolves first, with timing recorded."""
+    with OperationPoller(refresh, initial_interval=0.01, max_interval=0.02) as poller:
+        queued_at = time.monotonic()
+        slow = poller.register(FakeOperation("slow", 6), queued_at=queued_at)
+        fast = poller.register(FakeOperation("fast", 1), queued_at=queued_at)
+
+        done, _ = wait([slow, fast], return_when=FIRST_COMPLETED)
+        assert done == {fast}
+
+        result = slow.result(timeout=5)
+        assert result.operation.name == "slow"
+        assert result.polls == 6
+        assert result.render_seconds > 0
+        assert result.queue_seconds >= 0
+
+
+def test_poller_propagates_errors() -> None:
+    """A failing refresh fails only the affected future."""
+
+    def broken(operation: FakeOperation) -> FakeOperation:
+        raise ValueError("boom")
+
+    with OperationPoller(broken, initial_interval=0.01) as poller:
+        future = poller.register(FakeOperation("x", 1))
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+
+def test_poll_operation_awaits_until_done() -> None:
+    """The coroutine poller refreshes on the event loop until done."""
+
+    async def refresh_async(operation: FakeOperation) -> FakeOperation:
+        return refresh(operation)
+
+    result = asyncio.run(
+        poll_operation(refresh_async, FakeOperation("x", 3), initial_interval=0.01, max_interval=0.02)
+    )
+    assert result.operation.done
+    assert result.polls == 3
+    assert result.queue_seconds == 0
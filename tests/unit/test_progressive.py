@@ -0,0 +1,67 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+from pathlib import Path
+
+import pytest
+
+from agents.utils.progressive import HlsPlaylist
+
+
+def test_playlist_publishes_scenes_in_order(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Scenes appear only once every earlier scene is done; failures are skipped."""
+    monkeypatch.setattr(
+        HlsPlaylist, "_segment", lambda self, index, clip: (f"scene_{index + 1}.ts", 8.0)
+    )
+    playlist = HlsPlaylist(str(tmp_path))
+
+    playlist.add(1, "scene_2.mp4")
+    assert "scene_2.ts" not in Path(playlist.path).read_text()
+
+    playlist.add(0, "scene_1.mp4")
+    playlist.add(2, None)
+    text = Path(playlist.close()).read_text()
+    assert text.index("scene_1.ts") < text.index("scene_2.ts")
+    assert "scene_3.ts" not in text
+    assert text.endswith("#EXT-X-ENDLIST\n")
+
+
+def test_playlist_target_duration_is_fixed_when_created(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Clips that overrun their requested length leave the target duration unchanged."""
+    monkeypatch.setattr(
+        HlsPlaylist, "_segment", lambda self, index, clip: (f"scene_{index + 1}.ts", 8.02)
+    )
+    playlist = HlsPlaylist(str(tmp_path), segment_seconds=8)
+    assert "#EXT-X-TARGETDURATION:9\n" in Path(playlist.path).read_text()
+
+    playlist.add(0, "scene_1.mp4")
+    text = Path(playlist.close()).read_text()
+    assert "#EXT-X-TARGETDURATION:9\n" in text
+    assert "#EXTINF:8.020," in text
+
+
+def test_playlist_add_does_not_wait_for_the_remux(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    remuxing = threading.Event()
+
+    def segment(self: HlsPlaylist, index: int, clip: str) -> tuple[str, float]:
+        assert remuxing.wait(timeout=5)
+        return f"scene_{index + 1}.ts", 8.0
+
+    monkeypatch.setattr(HlsPlaylist, "_segment", segment)
+    playlist = HlsPlaylist(str(tmp_path))
+
+    playlist.add(0, "scene_1.mp4")
+    assert "scene_1.ts" not in Path(playlist.path).read_text()
+    remuxing.set()
+    assert "scene_1.ts" in Path(playlist.close()).read_text()
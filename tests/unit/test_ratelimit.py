@@ -0,0 +1,108 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.utils.ratelimit import RateLimiter, TokenBucket, parse_overrides
+
+
+def test_bucket_paces_calls_to_its_rate() -> None:
+    """After the burst is spent, calls start rpm / 60 per second."""
+    bucket = TokenBucket("model:endpoint", rpm=600, burst=2)
+    started = time.monotonic()
+    waits = []
+    for _ in range(4):
+        waits.append(bucket.acquire())
+        bucket.release()
+    assert max(waits[:2]) < 0.01
+    assert time.monotonic() - started >= 0.18
+    assert bucket.snapshot()["acquired"] == 4
+
+
+def test_bucket_caps_calls_in_flight_across_threads_and_loops() -> None:
+    """Sync and async callers share one concurrency limit."""
+    limiter = RateLimiter()
+    limiter.configure("model:endpoint", rpm=60_000, concurrency=2, burst=100)
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def enter() -> None:
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+
+    def leave() -> None:
+        with lock:
+            in_flight[0] -= 1
+
+    def sync_call() -> None:
+        with limiter.limit("model:endpoint"):
+            enter()
+            time.sleep(0.05)
+            leave()
+
+    async def async_call() -> None:
+        async with limiter.limit_async("model:endpoint"):
+            enter()
+            await asyncio.sleep(0.05)
+            leave()
+
+    async def async_calls() -> None:
+        await asyncio.gather(*(async_call() for _ in range(3)))
+
+    threads = [threading.Thread(target=sync_call) for _ in range(3)]
+    threads.append(threading.Thread(target=asyncio.run, args=(async_calls(),)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 2
+    state = limiter.snapshot()["model:endpoint"]
+    assert state["acquired"] == 6
+    assert state["in_use"] == state["waiting"] == 0
+    assert state["max_wait_seconds"] > 0
+
+
+def test_environment_overrides_take_precedence() -> None:
+    limiter = RateLimiter({"veo:generate_videos": {"rpm": 2, "concurrency": 1}})
+    bucket = limiter.configure("veo:generate_videos", rpm=10)
+    assert (bucket.rpm, bucket.concurrency) == (2, 1)
+
+
+def test_bucket_keeps_counting_calls_when_its_limit_changes() -> None:
+    """Setting or lifting the concurrency limit mid-call leaves the count right."""
+    bucket = TokenBucket("model:endpoint", rpm=60_000, burst=100)
+    bucket.acquire()
+    bucket.reconfigure(60_000, concurrency=1, burst=100)
+    assert bucket.snapshot()["in_use"] == 1
+    bucket.release()
+    bucket.acquire()
+    bucket.reconfigure(60_000, concurrency=None, burst=100)
+    bucket.release()
+    bucket.reconfigure(60_000, concurrency=1, burst=100)
+    assert bucket.snapshot()["in_use"] == 0
+    assert bucket.acquire() < 0.01
+
+
+def test_invalid_overrides_are_reported_by_bucket(capsys: pytest.CaptureFixture[str]) -> None:
+    overrides = parse_overrides('{"veo:generate_videos": {"rpm": "ten"}, "image:generate_content": {"rpm": 30}}')
+    assert overrides == {"image:generate_content": {"rpm": 30}}
+    assert "'veo:generate_videos'" in capsys.readouterr().out
+
+    assert parse_overrides("{rpm: 10}") == {}
+    assert "not valid JSON" in capsys.readouterr().out
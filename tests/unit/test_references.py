@@ -0,0 +1,67 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from pathlib import Path
+
+import pytest
+
+from agents.utils import references
+from agents.utils.artifacts import ArtifactStore
+from agents.utils.cache import ContentCache
+from agents.utils.ffmpeg import FFmpegError
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 1000
+JPEG = b"\xff\xd8\xff\xe0" + b"\1" * 100
+
+
+@pytest.fixture
+def downsized(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[bytes]:
+    """Replaces ffmpeg with a fake that shrinks every image to JPEG."""
+    calls: list[bytes] = []
+
+    async def downsize_image(data: bytes, max_edge: int) -> bytes:
+        calls.append(data)
+        return JPEG
+
+    monkeypatch.setattr(references, "downsize_image", downsize_image)
+    monkeypatch.setattr(references, "reference_cache", ContentCache(str(tmp_path / "cache"), 1 << 20))
+    return calls
+
+
+def test_prepare_reference_encodes_each_image_once(downsized: list[bytes]) -> None:
+    """Copies are shared within a store and across stores by content hash."""
+    first, second = ArtifactStore(), ArtifactStore()
+
+    handle = references.prepare_reference(first, first.put(PNG))
+    assert references.prepare_reference(first, first.put(PNG)) == handle
+    assert references.prepare_reference(second, second.put(PNG)) == handle
+
+    assert downsized == [PNG]
+    assert first.mime_type(handle) == "image/jpeg"
+
+
+def test_prepare_reference_keeps_images_that_do_not_shrink(downsized: list[bytes]) -> None:
+    store = ArtifactStore()
+    small = store.put(b"\xff\xd8\xff\xe0")
+    assert references.prepare_reference(store, small) == small
+
+
+def test_prepare_reference_sends_undecodable_images_unchanged(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    async def downsize_image(data: bytes, max_edge: int) -> bytes:
+        raise FFmpegError(["ffmpeg"], "exited with code 1")
+
+    monkeypatch.setattr(references, "downsize_image", downsize_image)
+    monkeypatch.setattr(references, "reference_cache", ContentCache(str(tmp_path / "cache"), 1 << 20))
+    store = ArtifactStore()
+    handle = store.put(PNG)
+    assert references.prepare_reference(store, handle) == handle
@@ -0,0 +1,80 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import time
+
+import pytest
+
+from agents.utils.retry import CircuitBreaker, CircuitOpenError, retry, retry_async
+from agents.utils.validation import InvalidImageError
+
+
+def test_retry_backs_off_until_success() -> None:
+    breaker = CircuitBreaker("model", failure_threshold=5)
+    outcomes = [RuntimeError("first"), RuntimeError("second"), "image"]
+
+    def call() -> str:
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert retry(call, breaker, attempts=3, initial_delay=0.01) == "image"
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_opens_then_lets_one_trial_through() -> None:
+    """Consecutive failures open the breaker; after the reset time one call may try again."""
+    breaker = CircuitBreaker("model", failure_threshold=2, reset_seconds=0.05)
+
+    def fail() -> None:
+        raise ConnectionError("model down")
+
+    with pytest.raises(ConnectionError):
+        retry(fail, breaker, attempts=2, initial_delay=0.01)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        retry(fail, breaker)
+
+    time.sleep(0.06)
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failures_of_a_request_do_not_open_the_breaker() -> None:
+    """Only outages count: a request that keeps failing on its own blocks no one else."""
+    breaker = CircuitBreaker("model", failure_threshold=2)
+
+    def unusable() -> None:
+        raise InvalidImageError("image is 16x16, smaller than 256px")
+
+    for _ in range(3):
+        with pytest.raises(InvalidImageError):
+            retry(unusable, breaker, attempts=2, initial_delay=0.01)
+    assert breaker.state == "closed"
+
+
+def test_retry_requires_an_attempt() -> None:
+    breaker = CircuitBreaker("model")
+
+    async def call() -> str:
+        return "image"
+
+    with pytest.raises(ValueError):
+        retry(lambda: "image", breaker, attempts=0)
+    with pytest.raises(ValueError):
+        asyncio.run(retry_async(call, breaker, attempts=0))
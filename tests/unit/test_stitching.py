@@ -0,0 +1,169 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import dataclasses
+import subprocess
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from agents.utils import stitching
+from agents.utils.ffmpeg import FFMPEG
+from agents.utils.stitching import (
+    ClipInfo,
+    _transition_windows,
+    crossfade_clips,
+    encode_ladder,
+    find_outliers,
+    probe_clip,
+)
+
+
+def clip(duration: float, keyframes: list[float]) -> ClipInfo:
+    return ClipInfo("clip.mp4", duration, keyframes, {"codec_name": "h264"}, None)
+
+
+def test_transition_windows_align_to_keyframes() -> None:
+    """Windows cover the last and first second, widened to keyframes."""
+    clips = [clip(8.0, [0.0, 2.0, 4.0, 6.0]), clip(8.0, [0.0, 1.5, 3.0, 6.5])]
+    assert _transition_windows(clips, 1.0) == [(6.0, 1.5)]
+
+
+def test_transition_windows_fall_back_without_copyable_body() -> None:
+    """A clip with a single keyframe leaves nothing to stream-copy."""
+    clips = [clip(8.0, [0.0]), clip(8.0, [0.0, 4.0]), clip(8.0, [0.0, 4.0])]
+    assert _transition_windows(clips, 1.0) is None
+
+
+def test_find_outliers_targets_the_majority_profile() -> None:
+    """Only the clip whose frame rate differs from the rest is re-encoded."""
+    video = {"codec_name": "h264", "width": 1280, "height": 720, "r_frame_rate": "24/1"}
+    clips = [
+        ClipInfo("a.mp4", 8.0, [0.0], {**video, "r_frame_rate": "30/1"}, None),
+        ClipInfo("b.mp4", 8.0, [0.0], video, None),
+        ClipInfo("c.mp4", 8.0, [0.0], {**video, "r_frame_rate": "48/2"}, None),
+    ]
+    reference, outliers = find_outliers(clips)
+    assert reference.path == "b.mp4"
+    assert outliers == [0]
+
+
+def test_encode_ladder_decodes_once_without_upscaling(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """One ffmpeg run splits a 720p source into the renditions up to 720p."""
+    calls: list[list[str]] = []
+
+    async def probe(path: str, timeout: float) -> ClipInfo:
+        return ClipInfo(path, 8.0, [0.0], {"codec_name": "h264", "height": 720}, None)
+
+    async def run(argv: list[str], *args: Any, **kwargs: Any) -> str:
+        calls.append(argv)
+        return ""
+
+    monkeypatch.setattr(stitching, "probe_clip", probe)
+    monkeypatch.setattr(stitching, "run_ffmpeg", run)
+    outputs = asyncio.run(encode_ladder(f"{tmp_path}/final_video.mp4", str(tmp_path)))
+
+    assert outputs == {
+        "720p": f"{tmp_path}/final_video_720p.mp4",
+        "480p": f"{tmp_path}/final_video_480p.mp4",
+    }
+    assert len(calls) == 1
+    assert "[0:v]split=2[s0][s1]" in calls[0][calls[0].index("-filter_complex") + 1]
+    assert "2800k" in calls[0] and "1200k" in calls[0]
+
+
+CLIP_SECONDS = 4.0
+FADE_SECONDS = 1.0
+
+
+@pytest.fixture
+def clips(tmp_path: Path) -> list[str]:
+    """Three synthetic Veo-like clips with a keyframe every second."""
+    paths = [str(tmp_path / f"scene_{n}.mp4") for n in range(1, 4)]
+    for n, path in enumerate(paths):
+        subprocess.run(
+            [
+                FFMPEG, "-v", "error", "-y",
+                "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=24:duration={CLIP_SECONDS}",
+                "-f", "lavfi", "-i", f"sine=frequency={440 * (n + 1)}:sample_rate=48000:duration={CLIP_SECONDS}",
+                "-c:v", "libx264", "-preset", "veryfast", "-g", "24", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-shortest",
+                path,
+            ],
+            check=True,
+        )
+    return paths
+
+
+def decode_errors(path: str) -> str:
+    """Decodes every frame of path and returns what ffmpeg reported."""
+    result = subprocess.run(
+        [FFMPEG, "-v", "error", "-xerror", "-i", path, "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    )
+    return result.stderr.strip() or ("" if result.returncode == 0 else f"exit code {result.returncode}")
+
+
+def test_crossfade_clips_splices_transitions_into_copied_bodies(
+    tmp_path: Path, clips: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Only the windows are re-encoded, and the result decodes cleanly at the expected length."""
+
+    async def no_reencode(*args: Any) -> str:
+        raise AssertionError("fell back to a full re-encode")
+
+    monkeypatch.setattr(stitching, "_crossfade_reencode", no_reencode)
+    output = str(tmp_path / "final_video.mp4")
+
+    asyncio.run(crossfade_clips(clips, output, str(tmp_path / "stitch"), FADE_SECONDS))
+
+    info = asyncio.run(probe_clip(output))
+    expected = len(clips) * CLIP_SECONDS - (len(clips) - 1) * FADE_SECONDS
+    assert info.duration == pytest.approx(expected, abs=0.2)
+    assert info.stream_signature() == asyncio.run(probe_clip(clips[0])).stream_signature()
+    assert decode_errors(output) == ""
+
+
+def test_crossfade_clips_reencodes_everything_when_windows_do_not_match(
+    tmp_path: Path, clips: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Windows encoded at another level are not spliced into the copied bodies."""
+    reencoded = []
+    encode_transition = stitching._encode_transition
+    crossfade_reencode = stitching._crossfade_reencode
+
+    async def other_level(outgoing: ClipInfo, *args: Any) -> None:
+        await encode_transition(dataclasses.replace(outgoing, video={**outgoing.video, "level": 40}), *args)
+
+    async def reencode(*args: Any) -> str:
+        reencoded.append(True)
+        return await crossfade_reencode(*args)
+
+    monkeypatch.setattr(stitching, "_encode_transition", other_level)
+    monkeypatch.setattr(stitching, "_crossfade_reencode", reencode)
+    output = str(tmp_path / "final_video.mp4")
+
+    asyncio.run(crossfade_clips(clips, output, str(tmp_path / "stitch"), FADE_SECONDS))
+
+    assert reencoded == [True]
+    assert not list((tmp_path / "stitch").glob("*.ts"))
+    info = asyncio.run(probe_clip(output))
+    expected = len(clips) * CLIP_SECONDS - (len(clips) - 1) * FADE_SECONDS
+    assert info.duration == pytest.approx(expected, abs=0.2)
+    assert decode_errors(output) == ""
@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+from pathlib import Path
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from agents.utils import clients
+from agents.utils.streaming import (
+    MemoryHighWaterMark,
+    delete_gcs_object,
+    iter_bytes,
+    iter_gcs_object,
+    stream_to_file,
+)
+
+
+def test_stream_to_file_bounds_buffered_bytes(tmp_path: Path) -> None:
+    """Only one chunk is accounted for at a time while writing."""
+    payload = bytes(range(256)) * 40
+    path = f"{tmp_path}/clip.mp4"
+    meter = MemoryHighWaterMark()
+
+    written = stream_to_file(iter_bytes(payload, buffer_size=1000), path, meter)
+
+    assert written == len(payload)
+    with open(path, "rb") as f:
+        assert f.read() == payload
+    snapshot = meter.snapshot()
+    assert snapshot["peak_buffered_bytes"] == 1000
+    assert snapshot["buffered_bytes"] == 0
+
+
+def test_iter_gcs_object_reuses_one_storage_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Downloads share the process-wide client instead of building one per clip."""
+    created = []
+
+    class FakeClient:
+        def __init__(self, project: str | None = None) -> None:
+            created.append(project)
+
+        def bucket(self, name: str) -> "FakeClient":
+            return self
+
+        def blob(self, name: str) -> "FakeClient":
+            return self
+
+        def open(self, mode: str, chunk_size: int) -> io.BytesIO:
+            return io.BytesIO(b"clip")
+
+    monkeypatch.setattr(clients, "_storage_clients", {})
+    monkeypatch.setattr(clients.storage, "Client", FakeClient)
+
+    for _ in range(3):
+        assert b"".join(iter_gcs_object("gs://bucket/clip.mp4")) == b"clip"
+    assert created == [None]
+
+
+def test_delete_gcs_object_ignores_missing_objects(monkeypatch: pytest.MonkeyPatch) -> None:
+    deleted = []
+
+    class FakeBlob:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def delete(self) -> None:
+            if self.name in deleted:
+                raise NotFound(self.name)
+            deleted.append(self.name)
+
+    class FakeClient:
+        def bucket(self, name: str) -> "FakeClient":
+            return self
+
+        def blob(self, name: str) -> FakeBlob:
+            return FakeBlob(name)
+
+    delete_gcs_object("gs://bucket/clips/1.mp4", FakeClient())
+    delete_gcs_object("gs://bucket/clips/1.mp4", FakeClient())
+
+    assert deleted == ["clips/1.mp4"]
@@ -0,0 +1,61 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from opentelemetry import trace
+
+from agents.utils import telemetry
+
+
+class FakeHistogram:
+    def __init__(self) -> None:
+        self.records: list[tuple[float, dict]] = []
+
+    def record(self, amount: float, attributes: dict) -> None:
+        self.records.append((amount, attributes))
+
+
+def test_stage_and_scene_latency_are_recorded(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Stages and scenes record their duration with an ok or error status."""
+    stages, scenes = FakeHistogram(), FakeHistogram()
+    monkeypatch.setattr(telemetry, "stage_duration", stages)
+    monkeypatch.setattr(telemetry, "scene_duration", scenes)
+
+    with telemetry.stage_span("render_scenes"):
+        with telemetry.scene_span("create_images", 2) as scene:
+            scene.fail("image generation failed")
+        with pytest.raises(ValueError):
+            with telemetry.scene_span("create_video", 2):
+                raise ValueError("boom")
+
+    assert [attributes for _, attributes in stages.records] == [
+        {telemetry.STAGE: "render_scenes", "status": "ok"}
+    ]
+    assert [attributes for _, attributes in scenes.records] == [
+        {telemetry.STAGE: "create_images", "status": "error"},
+        {telemetry.STAGE: "create_video", "status": "error"},
+    ]
+    assert all(amount >= 0 for amount, _ in stages.records + scenes.records)
+
+
+def test_bind_context_carries_the_current_span_into_threads() -> None:
+    """Spans started in executor threads keep the submitting span as parent."""
+    outer = trace.NonRecordingSpan(trace.SpanContext(1, 2, False))
+    with trace.use_span(outer), ThreadPoolExecutor(max_workers=1) as executor:
+        bound = executor.submit(telemetry.bind_context(trace.get_current_span))
+        unbound = executor.submit(trace.get_current_span)
+        assert bound.result() is outer
+        assert unbound.result() is not outer
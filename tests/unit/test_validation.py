@@ -0,0 +1,62 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import struct
+import zlib
+
+import pytest
+
+from agents.utils import validation
+from agents.utils.ffmpeg import FFmpegError
+from agents.utils.validation import (
+    InvalidImageError,
+    image_dimensions,
+    validate_image_async,
+)
+
+
+def png(width: int, height: int) -> bytes:
+    ihdr = struct.pack(">II", width, height) + bytes([8, 2, 0, 0, 0])
+    chunk = len(ihdr).to_bytes(4, "big") + b"IHDR" + ihdr + zlib.crc32(b"IHDR" + ihdr).to_bytes(4, "big")
+    return b"\x89PNG\r\n\x1a\n" + chunk
+
+
+def jpeg(width: int, height: int) -> bytes:
+    app0 = b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof0 = b"\xff\xc0\x00\x11\x08" + struct.pack(">HH", height, width) + b"\x03" + b"\x00" * 9
+    return b"\xff\xd8" + app0 + sof0
+
+
+def test_image_dimensions_reads_headers() -> None:
+    assert image_dimensions(png(1024, 768)) == (1024, 768)
+    assert image_dimensions(jpeg(640, 480)) == (640, 480)
+    with pytest.raises(InvalidImageError, match="not an image"):
+        image_dimensions(b"Placeholder: Image generation failed.")
+
+
+def test_validate_image_rejects_small_and_undecodable_images(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Images are checked for size before they are decoded."""
+    decoded = []
+
+    async def run_ffmpeg(argv: list[str], timeout: float, encode: bool) -> str:
+        decoded.append(argv)
+        raise FFmpegError(argv, "exited with code 183", "Invalid data found when processing input")
+
+    monkeypatch.setattr(validation, "run_ffmpeg", run_ffmpeg)
+    with pytest.raises(InvalidImageError, match="smaller than 256px"):
+        asyncio.run(validate_image_async(png(255, 1024)))
+    assert decoded == []
+    with pytest.raises(InvalidImageError, match="does not decode"):
+        asyncio.run(validate_image_async(png(512, 512)))
+    assert len(decoded) == 1
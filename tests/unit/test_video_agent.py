@@ -0,0 +1,213 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import subprocess
+import threading
+from concurrent.futures import Future
+from functools import partial
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from google.genai import types
+
+import agents.video_agent as video_agent
+from agents.utils.cache import ContentCache
+from agents.utils.ffmpeg import FFMPEG
+from agents.utils.operations import OperationPoller
+from agents.utils.ratelimit import RateLimiter
+from agents.utils.streaming import MemoryHighWaterMark
+
+
+class FakeVeo:
+    """Veo stand-in whose operation for scene n finishes after polls[n] polls."""
+
+    def __init__(self, polls: dict[int, int], failing: set[int] = frozenset()) -> None:
+        self.polls = polls
+        self.failing = failing
+        self.submitted: list[int] = []
+        self.active = 0
+        self.peak_active = 0
+        self._remaining: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.client = SimpleNamespace(
+            models=SimpleNamespace(generate_videos=self.generate_videos),
+            operations=SimpleNamespace(get=self.get),
+            aio=SimpleNamespace(operations=SimpleNamespace(get=self.get_async)),
+        )
+
+    def generate_videos(self, model: str, prompt: str, image: types.Image, config: Any) -> types.GenerateVideosOperation:
+        scene = int(prompt.removeprefix("scene "))
+        if scene in self.failing:
+            raise ConnectionError(f"scene {scene} rejected")
+        with self._lock:
+            self.submitted.append(scene)
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            self._remaining[prompt] = self.polls.get(scene, 1)
+        return types.GenerateVideosOperation(name=prompt, done=False)
+
+    def get(self, operation: types.GenerateVideosOperation) -> types.GenerateVideosOperation:
+        with self._lock:
+            self._remaining[operation.name] -= 1
+            if self._remaining[operation.name] > 0:
+                return operation
+            self.active -= 1
+        clip = types.Video(video_bytes=f"clip of {operation.name}".encode(), mime_type="video/mp4")
+        response = types.GenerateVideosResponse(generated_videos=[types.GeneratedVideo(video=clip)])
+        return types.GenerateVideosOperation(name=operation.name, done=True, response=response, result=response)
+
+    async def get_async(self, operation: types.GenerateVideosOperation) -> types.GenerateVideosOperation:
+        return self.get(operation)
+
+
+@pytest.fixture
+def start_image(tmp_path: Path) -> str:
+    path = str(tmp_path / "start.png")
+    subprocess.run([FFMPEG, "-v", "error", "-f", "lavfi", "-i", "color=c=red:s=320x320", "-frames:v", "1", path], check=True)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Polls quickly, without rate limits, into a private clip cache."""
+    limiter = RateLimiter()
+    limiter.configure(video_agent.VEO_BUCKET, rpm=1e6, burst=100)
+    limiter.configure(video_agent.VEO_POLL_BUCKET, rpm=1e6, burst=100)
+    monkeypatch.setattr(video_agent, "rate_limiter", limiter)
+    monkeypatch.setattr(video_agent, "OperationPoller", partial(OperationPoller, initial_interval=0.01, max_interval=0.02))
+    monkeypatch.setattr(video_agent, "clip_cache", ContentCache(str(tmp_path / "clips"), 1 << 20))
+    monkeypatch.setattr(video_agent, "_scene_prompt", lambda i, scene: scene["description"])
+
+
+def script(scenes: int) -> dict:
+    return {"script": [{"scene_number": n, "description": f"scene {n}"} for n in range(1, scenes + 1)]}
+
+
+def start_images(paths: list[str]) -> list[Future]:
+    futures = []
+    for n, path in enumerate(paths, 1):
+        future: Future = Future()
+        future.set_result({"scene_number": n, "start_image_path": path})
+        futures.append(future)
+    return futures
+
+
+def test_render_scenes_keeps_scene_order_and_caps_operations(tmp_path: Path, start_image: str) -> None:
+    """Later scenes finishing first changes neither the order nor the cap."""
+    veo = FakeVeo({1: 8, 2: 6, 3: 4, 4: 2, 5: 1})
+    finished: list[int] = []
+
+    clips = video_agent.render_scenes(
+        veo.client, script(5), start_images([start_image] * 5), str(tmp_path / "videos"),
+        max_concurrent_operations=2, on_clip=lambda i, clip_path: finished.append(i),
+    )
+
+    assert clips == [str(tmp_path / "videos" / f"scene_{n}.mp4") for n in range(1, 6)]
+    assert Path(clips[2]).read_bytes() == b"clip of scene 3"
+    assert veo.peak_active == 2
+    assert sorted(finished) == [0, 1, 2, 3, 4]
+    assert finished != sorted(finished)
+
+
+def test_render_scenes_serves_repeated_scenes_from_the_clip_cache(tmp_path: Path, start_image: str) -> None:
+    veo = FakeVeo({})
+    video_agent.render_scenes(veo.client, script(2), start_images([start_image] * 2), str(tmp_path / "first"))
+    clips = video_agent.render_scenes(veo.client, script(2), start_images([start_image] * 2), str(tmp_path / "second"))
+
+    assert veo.submitted.count(1) == 1 and veo.submitted.count(2) == 1
+    assert Path(clips[1]).read_bytes() == b"clip of scene 2"
+
+
+def test_clip_cache_key_ignores_where_the_clip_is_written() -> None:
+    """The GCS output prefix does not change the clip, so it does not change the key."""
+    image = types.Image(image_bytes=b"start image", mime_type="image/png")
+    config = video_agent._video_config()
+    key = video_agent.clip_cache_key("scene 1", image, config)
+
+    assert video_agent.clip_cache_key("scene 1", image, config.model_copy(update={"output_gcs_uri": "gs://bucket/clips"})) == key
+    assert video_agent.clip_cache_key("scene 2", image, config) != key
+    assert video_agent.clip_cache_key("scene 1", types.Image(image_bytes=b"other image", mime_type="image/png"), config) != key
+    assert video_agent.clip_cache_key("scene 1", image, config.model_copy(update={"resolution": "720p"})) != key
+
+
+def test_render_scenes_returns_shared_slots_on_failure(tmp_path: Path, start_image: str) -> None:
+    """Slots taken from a semaphore shared with other renders are handed back."""
+    veo = FakeVeo({1: 50}, failing={2})
+    slots = threading.Semaphore(3)
+
+    with pytest.raises(ConnectionError):
+        video_agent.render_scenes(
+            veo.client, script(2), start_images([start_image] * 2), str(tmp_path / "videos"), operation_slots=slots
+        )
+
+    assert all(slots.acquire(blocking=False) for _ in range(3))
+    assert not slots.acquire(blocking=False)
+
+
+def test_render_scenes_skips_scenes_without_a_start_image(tmp_path: Path, start_image: str) -> None:
+    """A scene whose start image is missing is reported failed and never submitted."""
+    veo = FakeVeo({})
+    finished: dict[int, str | None] = {}
+
+    clips = video_agent.render_scenes(
+        veo.client, script(3), start_images([start_image, str(tmp_path / "missing.png"), start_image]),
+        str(tmp_path / "videos"), on_clip=finished.__setitem__,
+    )
+
+    assert sorted(veo.submitted) == [1, 3]
+    assert clips == [str(tmp_path / "videos" / "scene_1.mp4"), str(tmp_path / "videos" / "scene_3.mp4")]
+    assert finished[1] is None
+
+
+def test_render_scenes_async_stops_other_scenes_when_one_fails(tmp_path: Path) -> None:
+    """No render is left running after the call that started it has failed."""
+    veo = FakeVeo({})
+    waiting = asyncio.Event()
+    cancelled = []
+
+    async def failed_image() -> dict:
+        await waiting.wait()
+        raise RuntimeError("image stage crashed")
+
+    async def slow_image() -> dict:
+        waiting.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return {}
+
+    async def run() -> None:
+        with pytest.raises(RuntimeError, match="crashed"):
+            await video_agent.render_scenes_async(veo.client, script(2), [failed_image(), slow_image()], str(tmp_path / "videos"))
+        assert cancelled == [True]
+        assert len(asyncio.all_tasks()) == 1
+
+    asyncio.run(run())
+
+
+def test_write_clip_deletes_the_gcs_object_once_streamed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    deleted = []
+    monkeypatch.setattr(video_agent, "iter_gcs_object", lambda uri, buffer_size: iter([b"clip ", b"bytes"]))
+    monkeypatch.setattr(video_agent, "delete_gcs_object", deleted.append)
+    clip_path = str(tmp_path / "scene_1.mp4")
+
+    written = video_agent._write_clip(types.Video(uri="gs://bucket/clips/1.mp4"), clip_path, MemoryHighWaterMark())
+
+    assert written == 10
+    assert Path(clip_path).read_bytes() == b"clip bytes"
+    assert deleted == ["gs://bucket/clips/1.mp4"]
@@ -0,0 +1,53 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+from pathlib import Path
+
+from agents.utils.workspace import LOCK_NAME, Workspace, collect_garbage
+
+
+def make_workspace(root: Path, name: str, size: int, age_seconds: float) -> str:
+    with Workspace.open(name, str(root)) as workspace:
+        with open(os.path.join(workspace.videos_dir, "clip.mp4"), "wb") as f:
+            f.write(b"\0" * size)
+    last_used = time.time() - age_seconds
+    os.utime(os.path.join(workspace.path, LOCK_NAME), (last_used, last_used))
+    return workspace.path
+
+
+def test_collect_garbage_applies_age_then_size_quota(tmp_path: Path) -> None:
+    """Stale workspaces go first, then the least recently used until under quota."""
+    stale = make_workspace(tmp_path, "stale", 100, age_seconds=3600)
+    older = make_workspace(tmp_path, "older", 100, age_seconds=60)
+    newer = make_workspace(tmp_path, "newer", 100, age_seconds=10)
+
+    result = collect_garbage(str(tmp_path), max_age_seconds=600, max_bytes=150)
+
+    assert result["removed"] == [stale, older]
+    assert result["kept_bytes"] == 100
+    assert sorted(os.listdir(tmp_path)) == ["newer"]
+    assert os.path.exists(os.path.join(newer, "videos", "clip.mp4"))
+
+
+def test_collect_garbage_skips_open_workspaces(tmp_path: Path) -> None:
+    """A workspace held open by a run is never removed, whatever its age."""
+    path = make_workspace(tmp_path, "run", 100, age_seconds=3600)
+    with Workspace.open("run", str(tmp_path)):
+        os.utime(os.path.join(path, LOCK_NAME), (0, 0))
+        result = collect_garbage(str(tmp_path), max_age_seconds=1, max_bytes=0)
+        assert result["removed"] == []
+        assert result["kept_bytes"] == 100
+    assert collect_garbage(str(tmp_path), max_age_seconds=1, max_bytes=0)["removed"] == [path]